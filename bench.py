@@ -0,0 +1,496 @@
+"""Banc d'essai des commandes du bot sur des catalogues synthétiques.
+
+Génère des catalogues de différentes tailles, appelle les commandes et les
+fonctions d'autocomplétion avec une fausse `discord.Interaction` (aucun
+accès réseau) et mesure pour chacune la latence (percentiles), la mémoire
+allouée par appel et le pic de mémoire du processus.
+
+Avec `--links N`, mesure aussi la vérification de N liens servis par des
+serveurs HTTP locaux simulés (liens valides, morts, instables, refusant HEAD).
+
+Avec `--metadata N`, mesure /enrich sur N films contre une API TMDB
+simulée en local : premier passage (tout est demandé) puis second passage
+(tout est dans le cache).
+
+Avec `--feed N`, mesure le flux de modifications sur un catalogue de N films :
+coût au chargement, premier chargement d'une copie (`CatalogReplica`) et
+rattrapage de la copie après 1 000 mutations publiées une à une.
+
+Exemples :
+    python bench.py
+    python bench.py --sizes 1000,10000,100000,1000000 --output bench_v2.json
+    python bench.py --compare bench_v1.json
+    python bench.py --sizes 1000 --links 50000
+    python bench.py --sizes 1000 --metadata 10000
+    python bench.py --sizes 1000 --feed 100000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Le catalogue de test est écrit dans un dossier temporaire, jamais dans celui du bot
+os.environ.setdefault("FILMS_DIR", tempfile.mkdtemp(prefix="bench_films_"))
+os.environ.setdefault("FILMS_STORAGE", "json")
+
+from aiohttp import web  # noqa: E402
+
+import bot  # noqa: E402
+
+# Répartition approximative des genres dans un catalogue réel (poids relatifs)
+GENRE_WEIGHTS = {
+    "Action": 14, "Animation": 6, "Aventure": 9, "Comédie": 16, "Crime": 7, "Documentaire": 4,
+    "Drame": 18, "Familial": 5, "Fantastique": 6, "Guerre": 2, "Histoire": 3, "Horreur": 7,
+    "Mystère": 4, "Romance": 8, "Science-fiction": 6, "Thriller": 9, "Western": 1,
+}
+WORDS = [
+    "amour", "guerre", "famille", "secret", "voyage", "enquête", "ville", "nuit", "retour",
+    "dernier", "monde", "vengeance", "espace", "trésor", "fantôme", "roi", "mission", "île",
+    "destin", "équipe", "ombre", "cœur", "frontière", "héritage", "rêve", "tempête", "loup",
+    "mémoire", "étoile", "chasse", "prison", "désert", "forêt", "miroir", "silence", "été",
+]
+
+
+def synthetic_catalog(size, seed=0):
+    """Retourne un catalogue {nom: infos} de `size` films au format actuel."""
+    rng = random.Random(seed)
+    genres, weights = zip(*GENRE_WEIGHTS.items())
+    films = {}
+    for i in range(size):
+        name = f"{' '.join(rng.choices(WORDS, k=rng.randint(1, 3))).capitalize()} {i}"
+        if rng.random() < 0.05:
+            film_genres = ["Non spécifié"]
+        else:
+            film_genres = list(dict.fromkeys(rng.choices(genres, weights, k=rng.choice((1, 1, 2, 2, 3)))))
+        if rng.random() < 0.6:
+            description = " ".join(rng.choices(WORDS, k=rng.randint(8, 25))).capitalize() + "."
+        else:
+            description = "Aucune description."
+        films[name] = {
+            "lien": f"https://example.org/films/{i}" if rng.random() < 0.7 else "N/A",
+            "genre": film_genres,
+            "description": description,
+        }
+    return films
+
+
+class FakeResponse:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, *args, **kwargs):
+        self.sent.append(kwargs)
+
+    async def defer(self, *args, **kwargs):
+        pass
+
+    async def edit_message(self, *args, **kwargs):
+        self.sent.append(kwargs)
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, *args, **kwargs):
+        self.sent.append(kwargs)
+
+
+class FakeInteraction:
+    """Remplace `discord.Interaction` : seuls les attributs utilisés par les commandes existent."""
+
+    def __init__(self, guild_id):
+        self.guild_id = guild_id
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+
+def misspell(name, rng):
+    """Inverse deux lettres voisines du premier mot d'un titre (faute de frappe)."""
+    words = name.split()
+    word = words[0]
+    if len(word) >= 4:
+        i = rng.randrange(len(word) - 1)
+        words[0] = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return " ".join(words)
+
+
+def command_cases(films, rng):
+    """Retourne {nom du cas: fabrique de coroutine(interaction)}."""
+    names = list(films)
+    genres = list(GENRE_WEIGHTS)
+    return {
+        "info": lambda i: bot.info_command.callback(i, rng.choice(names)),
+        "info_typo": lambda i: bot.info_command.callback(i, misspell(rng.choice(names), rng)),
+        "list": lambda i: bot.list_command.callback(i),
+        "list_genre": lambda i: bot.list_command.callback(i, rng.choice(genres)),
+        "random": lambda i: bot.random_command.callback(i),
+        "random_genres": lambda i: bot.random_command.callback(i, ", ".join(rng.sample(genres, 2))),
+        "random_weighted": lambda i: bot.random_command.callback(i, None, True),
+        "stats": lambda i: bot.stats_command.callback(i),
+        "stats_detail": lambda i: bot.stats_command.callback(i, True),
+        "search": lambda i: bot.search_command.callback(i, " ".join(rng.sample(WORDS, 2))),
+        "autocomplete_film": lambda i: bot.info_autocomplete_film_name(i, rng.choice(names)[:rng.randint(1, 6)]),
+        "autocomplete_genres": lambda i: bot.add_autocomplete_genres(i, f"Action, {rng.choice(genres)[:2]}"),
+    }
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "p50_ms": pick(0.50) * 1000,
+        "p90_ms": pick(0.90) * 1000,
+        "p99_ms": pick(0.99) * 1000,
+        "max_ms": ordered[-1] * 1000,
+        "mean_ms": statistics.fmean(ordered) * 1000,
+    }
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en kilo-octets sous Linux et en octets sous macOS
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+async def bench_size(size, iterations, alloc_iterations, only, seed):
+    films = synthetic_catalog(size, seed)
+    guild_id = size
+    film_catalog = bot.catalogs.get(guild_id)
+    bot.save_films(films, film_catalog.storage.path)
+
+    started = time.perf_counter()
+    await film_catalog.refresh_async()
+    result = {
+        "films": size,
+        "load_ms": (time.perf_counter() - started) * 1000,
+        "bytes_per_film": film_catalog.memory_per_film(sample=size),
+        "commands": {},
+    }
+    print(f"  chargement {result['load_ms']:.0f} ms, ~{result['bytes_per_film']:.0f} octets par film")
+
+    rng = random.Random(seed)
+    cases = command_cases(film_catalog.films, rng)
+    for case, make in cases.items():
+        if only and case not in only:
+            continue
+        # Un premier appel remplit les caches et construit les index paresseux
+        await make(FakeInteraction(guild_id))
+        samples = []
+        for _ in range(iterations):
+            interaction = FakeInteraction(guild_id)
+            t0 = time.perf_counter()
+            await make(interaction)
+            samples.append(time.perf_counter() - t0)
+
+        tracemalloc.start()
+        for _ in range(alloc_iterations):
+            await make(FakeInteraction(guild_id))
+        _, alloc_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        result["commands"][case] = {
+            **percentiles(samples),
+            "alloc_peak_kb": alloc_peak / 1024,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        print(f"  {case:<20} p50 {result['commands'][case]['p50_ms']:8.3f} ms"
+              f"  p99 {result['commands'][case]['p99_ms']:8.3f} ms"
+              f"  alloc {alloc_peak / 1024:9.1f} Ko")
+    await film_catalog.flush()
+    return result
+
+
+class StubLinkServer:
+    """Serveur HTTP local simulant des sites de streaming, pour `bench_links`.
+
+    Le chemin indique le comportement : /ok/<n> (ETag, 304 si inchangé),
+    /dead/<n> (404), /flaky/<n> (503 à la première requête) et
+    /nohead/<n> (405 en HEAD, 200 en GET).
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self._seen_flaky = set()
+        self._runner = None
+        self.port = None
+
+    async def handle(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        kind, n = request.match_info["kind"], request.match_info["n"]
+        if kind == "dead":
+            return web.Response(status=404)
+        if kind == "flaky" and n not in self._seen_flaky:
+            self._seen_flaky.add(n)
+            return web.Response(status=503)
+        if kind == "nohead" and request.method == "HEAD":
+            return web.Response(status=405)
+        etag = f'"{n}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304)
+        return web.Response(headers={"ETag": etag})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route("*", "/{kind}/{n}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+async def bench_links(count, hosts, latency, seed):
+    """Vérifie `count` liens répartis sur `hosts` serveurs locaux, deux fois (la seconde en conditionnel)."""
+    rng = random.Random(seed)
+    servers = [StubLinkServer(latency) for _ in range(hosts)]
+    for server in servers:
+        await server.start()
+    kinds = rng.choices(("ok", "dead", "flaky", "nohead"), (90, 5, 3, 2), k=count)
+    films = {
+        f"Film {i}": {
+            "lien": f"http://127.0.0.1:{servers[i % hosts].port}/{kind}/{i}",
+            "genre": ["Action"],
+            "description": "Aucune description.",
+        }
+        for i, kind in enumerate(kinds)
+    }
+    guild_id = f"links-{count}"
+    film_catalog = bot.catalogs.get(guild_id)
+    bot.save_films(films, film_catalog.storage.path)
+    await film_catalog.refresh_async()
+
+    # Délais de nouvelle tentative réduits : les serveurs simulés répondent immédiatement
+    checker = bot.LinkChecker(backoff=0.01)
+    result = {"links": count, "hosts": hosts, "latency_ms": latency * 1000, "passes": []}
+    try:
+        for label in ("premier passage", "passage conditionnel"):
+            requests_before = sum(server.requests for server in servers)
+            started = time.perf_counter()
+            checked, valid, dead = await film_catalog.check_links(checker)
+            elapsed = time.perf_counter() - started
+            requests = sum(server.requests for server in servers) - requests_before
+            result["passes"].append({
+                "seconds": elapsed, "links_per_second": checked / elapsed, "requests": requests,
+                "valid": valid, "dead": dead, "not_modified": sum(server.not_modified for server in servers),
+            })
+            print(f"  {label:<22} {elapsed:7.2f} s  {checked / elapsed:8.0f} liens/s"
+                  f"  {requests} requêtes, {valid} valides, {dead} morts")
+    finally:
+        for server in servers:
+            await server.stop()
+    return result
+
+
+class StubTmdbServer:
+    """Serveur HTTP local simulant la recherche de TMDB (/3/search/movie), pour `bench_metadata`.
+
+    Chaque titre est trouvé, sauf ceux dont le numéro est multiple de 10.
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.requests = 0
+        self._runner = None
+        self.port = None
+
+    async def handle(self, request):
+        self.requests += 1
+        await asyncio.sleep(self.latency)
+        query = request.query["query"]
+        if query.endswith("0"):
+            return web.json_response({"results": []})
+        genre_ids = list(bot.TmdbProvider.GENRE_IDS)
+        n = int(query.rsplit(" ", 1)[-1])
+        return web.json_response({"results": [{
+            "title": query,
+            "original_title": query,
+            "overview": f"Résumé du film {n}.",
+            "release_date": f"{1950 + n % 75}-01-01",
+            "poster_path": f"/{n}.jpg",
+            "genre_ids": [genre_ids[n % len(genre_ids)], genre_ids[n * 7 % len(genre_ids)]],
+        }]})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/3/search/movie", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+async def bench_metadata(count, latency, seed):
+    """Lance /enrich deux fois sur `count` films (le second passage est servi par le cache)."""
+    server = StubTmdbServer(latency)
+    await server.start()
+    guild_id = f"metadata-{count}"
+    film_catalog = bot.catalogs.get(guild_id)
+    bot.save_films(synthetic_catalog(count, seed), film_catalog.storage.path)
+    await film_catalog.refresh_async()
+
+    fetcher = bot.metadata_fetcher
+    fetcher.provider = bot.TmdbProvider("bench", base_url=f"http://127.0.0.1:{server.port}/3")
+    fetcher.cache = bot.MetadataCache(os.path.join(os.environ["FILMS_DIR"], "metadata.json"))
+    await fetcher.load()
+    result = {"films": count, "latency_ms": latency * 1000, "passes": []}
+    try:
+        for label in ("premier passage", "passage en cache"):
+            requests_before = server.requests
+            interaction = FakeInteraction(guild_id)
+            started = time.perf_counter()
+            await bot.enrich_command.callback(interaction)
+            elapsed = time.perf_counter() - started
+            summary = interaction.followup.sent[-1]["embed"].description
+            result["passes"].append({
+                "seconds": elapsed, "requests": server.requests - requests_before, "summary": summary,
+            })
+            print(f"  {label:<18} {elapsed:8.3f} s  {server.requests - requests_before:6} requêtes  {summary}")
+        await fetcher.cache.writer.flush()
+        print(f"  cache : {os.path.getsize(fetcher.cache.writer.storage.path) / 1024:.0f} Ko")
+    finally:
+        await server.stop()
+    await film_catalog.flush()
+    return result
+
+
+async def bench_feed(count, mutations, seed):
+    """Publie `mutations` versions sur un catalogue de `count` films et mesure une copie qui les suit."""
+    films = synthetic_catalog(count, seed)
+    path = os.path.join(os.environ["FILMS_DIR"], f"feed-{count}", bot.FILMS_FILE)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    bot.save_films(films, path)
+    result = {"films": count, "mutations": mutations}
+
+    for label, change_feed in (("load_without_feed", False), ("load_with_feed", True)):
+        film_catalog = bot.FilmCatalog(bot.make_storage(path), change_feed=change_feed)
+        started = time.perf_counter()
+        await film_catalog.refresh_async()
+        result[f"{label}_seconds"] = time.perf_counter() - started
+    await film_catalog.flush()
+    print(f"  chargement du catalogue   {result['load_without_feed_seconds']:7.3f} s sans flux,"
+          f" {result['load_with_feed_seconds']:7.3f} s avec")
+
+    replica = bot.CatalogReplica(path)
+    started = time.perf_counter()
+    replica.poll()
+    result["replica_snapshot_seconds"] = time.perf_counter() - started
+    print(f"  premier chargement copie  {result['replica_snapshot_seconds']:7.3f} s")
+
+    rng = random.Random(seed)
+    names = list(films)
+    for i in range(mutations):
+        name = rng.choice(names)
+        if i % 10 == 9:
+            film_catalog.apply([("delete", name)])
+        else:
+            film_catalog.apply([("put", name, {"lien": f"https://example.org/films/v{i}", "genre": ["Drame"]})])
+    await film_catalog.flush()
+    started = time.perf_counter()
+    replica.poll()
+    elapsed = time.perf_counter() - started
+    in_sync = replica.checksum == film_catalog.checksum and len(replica.films) == len(film_catalog.films)
+    result.update(replica_catch_up_seconds=elapsed, replica_in_sync=in_sync, replica_resyncs=replica.resyncs)
+    print(f"  rattrapage de {mutations} versions {elapsed * 1000:7.1f} ms"
+          f"  ({mutations / elapsed:,.0f} versions/s, copie {'à jour' if in_sync else 'DIVERGENTE'})")
+    replica.close()
+    film_catalog.close()
+    return result
+
+
+def compare(current, previous):
+    """Affiche le rapport p50 courant / p50 précédent pour chaque commande mesurée des deux côtés."""
+    before = {(r["films"], c): v for r in previous["results"] for c, v in r["commands"].items()}
+    print("\nComparaison avec la mesure précédente (p50, >1 = plus lent) :")
+    for r in current["results"]:
+        for case, values in r["commands"].items():
+            old = before.get((r["films"], case))
+            if old and old["p50_ms"] > 0:
+                ratio = values["p50_ms"] / old["p50_ms"]
+                flag = "  <-- régression" if ratio > 1.2 else ""
+                print(f"  {r['films']:>8} {case:<20} x{ratio:5.2f}{flag}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="tailles de catalogue séparées par des virgules (ex : 1000,10000,100000,1000000)")
+    parser.add_argument("--iterations", type=int, default=200, help="appels mesurés par commande")
+    parser.add_argument("--alloc-iterations", type=int, default=20,
+                        help="appels mesurés avec tracemalloc par commande")
+    parser.add_argument("--commands", default="", help="cas à mesurer, séparés par des virgules (tous par défaut)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--links", type=int, default=0,
+                        help="nombre de liens à vérifier contre des serveurs HTTP locaux (0 : pas de mesure)")
+    parser.add_argument("--link-hosts", type=int, default=8, help="nombre de serveurs locaux simulés")
+    parser.add_argument("--link-latency", type=float, default=0.02,
+                        help="latence simulée de chaque réponse, en secondes")
+    parser.add_argument("--metadata", type=int, default=0,
+                        help="nombre de films complétés par /enrich contre une API TMDB simulée (0 : pas de mesure)")
+    parser.add_argument("--metadata-latency", type=float, default=0.05,
+                        help="latence simulée de chaque recherche TMDB, en secondes")
+    parser.add_argument("--feed", type=int, default=0,
+                        help="taille du catalogue pour la mesure du flux de modifications (0 : pas de mesure)")
+    parser.add_argument("--output", default="bench_results.json", help="fichier JSON des résultats")
+    parser.add_argument("--compare", help="fichier JSON d'une mesure précédente à comparer")
+    args = parser.parse_args()
+
+    only = {c.strip() for c in args.commands.split(",") if c.strip()}
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [],
+    }
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"Catalogue de {size} films")
+        report["results"].append(
+            await bench_size(size, args.iterations, args.alloc_iterations, only, args.seed)
+        )
+
+    if args.links:
+        print(f"Vérification de {args.links} liens sur {args.link_hosts} serveurs locaux")
+        report["links"] = await bench_links(args.links, args.link_hosts, args.link_latency, args.seed)
+
+    if args.metadata:
+        print(f"/enrich de {args.metadata} films contre une API TMDB simulée")
+        report["metadata"] = await bench_metadata(args.metadata, args.metadata_latency, args.seed)
+
+    if args.feed:
+        print(f"Flux de modifications d'un catalogue de {args.feed} films")
+        report["feed"] = await bench_feed(args.feed, 1000, args.seed)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4)
+    print(f"\nRésultats enregistrés dans {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,9 +1,40 @@
 import discord
 from discord import app_commands
+import aiohttp
 from dotenv import load_dotenv
 import json
 import random
+import asyncio
+import csv
+import io
+import tempfile
+import math
+import re
+import zlib
+import marshal
+from array import array
 import os
+import sys
+import time
+import bisect
+import threading
+import sqlite3
+import heapq
+import shutil
+import itertools
+import unicodedata
+import contextlib
+import contextvars
+import concurrent.futures
+import functools
+import hashlib
+from collections import OrderedDict, deque
+
+try:
+    import numpy as np
+except ImportError:
+    # Optionnel : seule la commande /similar en a besoin
+    np = None
 
 # Charge les variables d'environnement depuis le fichier .env
 load_dotenv()
@@ -11,6 +42,83 @@ load_dotenv()
 # --- Configuration et variables ---
 DISCORD_BOT_TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 FILMS_FILE = 'films.json'
+# Version de la structure des films ; inscrite dans films.json pour ne migrer qu'une fois
+FILMS_SCHEMA_VERSION = 2
+# "json" : fichier réécrit à chaque mutation ; "journal" : mutations ajoutées à un journal compacté
+# en arrière-plan ; "sqlite" : base SQLite indexée (FILMS_DB)
+FILMS_STORAGE = os.getenv("FILMS_STORAGE", "json")
+JOURNAL_COMPACT_BYTES = int(os.getenv("JOURNAL_COMPACT_BYTES", 1_000_000))
+# Base utilisée quand FILMS_STORAGE vaut "sqlite"
+FILMS_DB = os.getenv("FILMS_DB", "films.db")
+# Chaque serveur a son propre catalogue dans FILMS_DIR/<id du serveur>/
+FILMS_DIR = os.getenv("FILMS_DIR", "guilds")
+# Serveur qui continue d'utiliser le catalogue historique (FILMS_FILE à la racine), optionnel
+LEGACY_GUILD_ID = os.getenv("LEGACY_GUILD_ID")
+# Nombre maximal de catalogues de serveurs gardés en mémoire
+MAX_LOADED_GUILDS = int(os.getenv("MAX_LOADED_GUILDS", 64))
+# Délai (en secondes) pendant lequel les mutations sont regroupées avant écriture
+WRITE_COALESCE_SECONDS = float(os.getenv("WRITE_COALESCE_SECONDS", 0.5))
+# Flux de modifications des catalogues, suivi par des copies en lecture seule dans d'autres processus
+# (tableau de bord, second processus de shards ; voir CatalogReplica et replica.py)
+CHANGE_FEED_ENABLED = os.getenv("CHANGE_FEED", "0") == "1"
+# Taille (en octets) du journal du flux au-delà de laquelle un instantané est écrit et le journal recommencé
+CHANGE_FEED_COMPACT_BYTES = int(os.getenv("CHANGE_FEED_COMPACT_BYTES", 1_000_000))
+# Délai (en secondes) après lequel une commande qui n'a pas encore répondu est différée
+# (Discord abandonne une interaction sans réponse au bout de 3 s) ; 0 pour désactiver
+COMMAND_DEFER_SECONDS = float(os.getenv("COMMAND_DEFER_SECONDS", 2))
+# Nombre de threads exécutant les calculs lourds des commandes (import, export)
+COMMAND_WORKERS = int(os.getenv("COMMAND_WORKERS", 4))
+
+# Mesure du temps passé dans chaque commande (/metrics) ; désactivée par défaut
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") == "1"
+# Port HTTP local optionnel exposant les métriques au format Prometheus
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Nombre de films affichés par page dans /list
+LIST_PAGE_SIZE = 20
+# Vérification des liens des films : intervalle (en heures) entre deux vérifications d'un même lien, 0 pour désactiver
+LINK_CHECK_INTERVAL_HOURS = float(os.getenv("LINK_CHECK_INTERVAL_HOURS", 24))
+# Nombre de requêtes simultanées au total et par site
+LINK_CHECK_WORKERS = int(os.getenv("LINK_CHECK_WORKERS", 64))
+LINK_CHECK_PER_HOST = int(os.getenv("LINK_CHECK_PER_HOST", 4))
+# Délai maximal d'une requête (en secondes) et nombre de nouvelles tentatives après une erreur temporaire
+LINK_CHECK_TIMEOUT = 10
+LINK_CHECK_RETRIES = 3
+# Nombre de vérifications échouées de suite (site injoignable) avant de considérer un lien comme mort
+LINK_CHECK_MAX_FAILURES = 3
+# Fournisseur des métadonnées des films (descriptions, années, affiches, genres) : "tmdb", "fixture"
+# (fichier local METADATA_FIXTURE_FILE, pour les tests et l'utilisation hors ligne) ou vide pour désactiver
+METADATA_PROVIDER = os.getenv("METADATA_PROVIDER", "")
+TMDB_API_KEY = os.getenv("TMDB_API_KEY")
+METADATA_FIXTURE_FILE = os.getenv("METADATA_FIXTURE_FILE", "exemple_metadata.json")
+# Cache disque des métadonnées, partagé par tous les serveurs, et durée de validité de ses entrées (en jours)
+METADATA_CACHE_FILE = os.getenv("METADATA_CACHE_FILE", "metadata.json")
+METADATA_TTL_DAYS = float(os.getenv("METADATA_TTL_DAYS", 30))
+# Durée (en jours) pendant laquelle un film introuvable chez le fournisseur n'est pas redemandé
+METADATA_MISS_TTL_DAYS = 7
+# Nombre de titres demandés au fournisseur par lot, et requêtes simultanées vers TMDB
+METADATA_BATCH_SIZE = 50
+METADATA_WORKERS = 8
+# Délai (en secondes) pendant lequel les nouvelles entrées du cache des métadonnées sont regroupées avant écriture
+METADATA_CACHE_FLUSH_SECONDS = 5
+# Nombre de films dont les rendus (embeds de /info et /random, lignes de /list) sont gardés en cache
+RENDER_CACHE_SIZE = 4096
+# Nombre de films validés à la fois lors d'un /import
+IMPORT_BATCH_SIZE = 500
+# Taille maximale (en octets) d'un fichier /import, et taille des morceaux décodés à la fois
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", 10 * 1024 * 1024))
+IMPORT_CHUNK_SIZE = 64 * 1024
+# Nombre de derniers films tirés par /random qui ne peuvent pas être tirés à nouveau
+RANDOM_NO_REPEAT = int(os.getenv("RANDOM_NO_REPEAT", 10))
+# Délai (en secondes) pendant lequel les votes de /poll et les listes des membres sont regroupés avant écriture
+MEMBER_DATA_FLUSH_SECONDS = float(os.getenv("MEMBER_DATA_FLUSH_SECONDS", 5))
+# Index des sondages /poll ouverts de tous les serveurs (boutons réenregistrés au démarrage)
+OPEN_POLLS_FILE = os.getenv("OPEN_POLLS_FILE", os.path.join(FILMS_DIR, "open_polls.json"))
+# Nombre maximal de films proposés par /poll (un bouton par film)
+POLL_MAX_CANDIDATES = 10
+# Intervalle minimal (en secondes) entre deux mises à jour du décompte affiché d'un sondage
+POLL_REFRESH_SECONDS = 3
 
 # Liste des genres disponibles (MAJ : Ajout de "Western")
 GENRES = [
@@ -18,6 +126,7 @@ GENRES = [
     "Drame", "Familial", "Fantastique", "Guerre", "Histoire", "Horreur",
     "Mystère", "Romance", "Science-fiction", "Thriller", "Western" 
 ]
+GENRES_BY_LOWER = {g.lower(): g for g in GENRES}
 
 # Initialiser le client Discord avec les intents nécessaires
 intents = discord.Intents.default()
@@ -25,160 +134,4305 @@ intents.message_content = True
 intents.members = True
 
 # Initialiser le client Discord et l'arborescence de commandes
-client = discord.Client(intents=intents)
-tree = discord.app_commands.CommandTree(client)
+client = discord.AutoShardedClient(intents=intents)
+# Chaque catalogue appartient à un serveur : aucune commande n'est proposée en messages privés
+tree = discord.app_commands.CommandTree(
+    client,
+    allowed_contexts=app_commands.AppCommandContext(guild=True, dm_channel=False, private_channel=False),
+)
+
+# --- Métriques ---
+
+class Histogram:
+    """Histogramme de durées (en secondes) à seuils fixes, comme les histogrammes Prometheus."""
+
+    BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(self.BOUNDS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Estime un quantile : seuil supérieur du premier intervalle qui l'atteint."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.BOUNDS, self.buckets):
+            seen += n
+            if seen >= target:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Durées des commandes, par commande et par phase.
+
+    Phases : "parse" (lecture des arguments), "storage_read" (chargement du
+    catalogue), "render" (mise en forme des pages), "send" (appels à
+    l'API Discord), "compute" (le reste) et "total". Les écritures du
+    stockage sont comptées sous la commande "writer". Quand les métriques
+    sont désactivées, `instrumented` ne modifie pas les commandes et
+    `span` ne mesure rien.
+    """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.histograms = {}
+        # Durées par phase de la commande en cours (None hors commande instrumentée)
+        self._phases = contextvars.ContextVar("metrics_phases", default=None)
+
+    def observe(self, command, phase, seconds):
+        histogram = self.histograms.get((command, phase))
+        if histogram is None:
+            histogram = self.histograms[(command, phase)] = Histogram()
+        histogram.observe(seconds)
+
+    @contextlib.contextmanager
+    def _timed_span(self, phase):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            phases = self._phases.get()
+            if phases is not None:
+                phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - started
+
+    def span(self, phase):
+        """Mesure un bloc de code comme une phase de la commande en cours."""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._timed_span(phase)
+
+    def instrumented(self, func):
+        """Décorateur mesurant une commande ou une autocomplétion (sans effet si désactivé)."""
+        if not self.enabled:
+            return func
+        command = func.__name__.removesuffix("_command")
+
+        @functools.wraps(func)
+        async def wrapper(interaction, *args, **kwargs):
+            phases = {}
+            token = self._phases.set(phases)
+            started = time.perf_counter()
+            try:
+                return await func(_TimedInteraction(interaction, self), *args, **kwargs)
+            finally:
+                total = time.perf_counter() - started
+                self._phases.reset(token)
+                for phase, seconds in phases.items():
+                    self.observe(command, phase, seconds)
+                self.observe(command, "compute", max(0.0, total - sum(phases.values())))
+                self.observe(command, "total", total)
+
+        return wrapper
+
+    def prometheus(self):
+        """Retourne les métriques au format texte de Prometheus."""
+        lines = [
+            "# HELP bot_command_duration_seconds Durée des commandes du bot par phase.",
+            "# TYPE bot_command_duration_seconds histogram",
+        ]
+        for (command, phase), histogram in sorted(self.histograms.items()):
+            labels = f'command="{command}",phase="{phase}"'
+            cumulative = 0
+            for bound, n in zip(Histogram.BOUNDS, histogram.buckets):
+                cumulative += n
+                lines.append(f'bot_command_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'bot_command_duration_seconds_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f"bot_command_duration_seconds_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"bot_command_duration_seconds_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+class _TimedProxy:
+    """Relaie les appels vers `target` en mesurant ceux de `methods` comme phase "send"."""
+
+    def __init__(self, target, metrics, methods):
+        self._target = target
+        self._metrics = metrics
+        self._methods = methods
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name not in self._methods:
+            return attr
+
+        async def timed(*args, **kwargs):
+            with self._metrics.span("send"):
+                return await attr(*args, **kwargs)
+
+        return timed
+
+
+class _TimedInteraction:
+    """Interaction dont les réponses (response, followup) sont chronométrées."""
+
+    def __init__(self, interaction, metrics):
+        self._interaction = interaction
+        self.response = _TimedProxy(interaction.response, metrics, {"send_message", "defer", "edit_message"})
+        self.followup = _TimedProxy(interaction.followup, metrics, {"send"})
+
+    def __getattr__(self, name):
+        return getattr(self._interaction, name)
+
+
+metrics = Metrics(METRICS_ENABLED)
+
+
+# --- Exécution des commandes ---
+
+class _DeferredResponse:
+    """`interaction.response` d'une commande qui peut être différée automatiquement.
+
+    Si la commande n'a pas encore répondu quand `auto_defer` est appelé, un
+    `defer` est envoyé à Discord ; la réponse envoyée ensuite par
+    `send_message` part alors en followup.
+    """
+
+    def __init__(self, interaction, ephemeral):
+        self._interaction = interaction
+        self._response = interaction.response
+        self._ephemeral = ephemeral
+        self._defer_task = None
+        self._answered = False
+        # Instant (perf_counter) de la première réponse envoyée à Discord
+        self.first_response = None
+
+    @property
+    def deferred(self):
+        return self._defer_task is not None
+
+    def _mark(self):
+        self._answered = True
+        if self.first_response is None:
+            self.first_response = time.perf_counter()
+
+    def auto_defer(self):
+        if self._answered:
+            return
+        self._mark()
+        self._defer_task = asyncio.create_task(
+            self._response.defer(ephemeral=self._ephemeral, thinking=True)
+        )
+
+    async def send_message(self, *args, **kwargs):
+        if not self.deferred:
+            self._mark()
+            return await self._response.send_message(*args, **kwargs)
+        await self._defer_task
+        # followup.send n'accepte pas None pour ses arguments optionnels (view, file…)
+        kwargs = {key: value for key, value in kwargs.items() if value is not None}
+        return await self._interaction.followup.send(*args, **kwargs)
+
+    async def defer(self, *args, **kwargs):
+        if not self.deferred:
+            self._mark()
+            return await self._response.defer(*args, **kwargs)
+        # Déjà différée automatiquement : la suite de la commande répond en followup
+        await self._defer_task
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class _DeferredInteraction:
+    """Interaction dont la réponse est différée si la commande dépasse son budget."""
+
+    def __init__(self, interaction, ephemeral):
+        self._interaction = interaction
+        self.response = _DeferredResponse(interaction, ephemeral)
+
+    def __getattr__(self, name):
+        return getattr(self._interaction, name)
+
+
+class CommandRunner:
+    """Exécution des commandes slash : réponse différée automatique et pool de calcul borné.
+
+    `auto_defer` envoie `interaction.response.defer` quand une commande n'a
+    pas répondu au bout de `budget` secondes ; sa réponse est alors envoyée
+    en followup. `run` exécute un calcul lourd dans un pool de `workers`
+    threads, pour que la boucle d'événements reste disponible. Compteurs :
+    commandes différées, réponses arrivées après le délai de Discord (la
+    commande a échoué côté utilisateur) et tâches en attente ou en cours
+    dans le pool.
+    """
+
+    # Délai (en secondes) accordé par Discord pour la première réponse à une interaction
+    DEADLINE = 3.0
+
+    def __init__(self, budget=COMMAND_DEFER_SECONDS, workers=COMMAND_WORKERS):
+        self.budget = budget
+        self.workers = workers
+        self._executor = None
+        self.deferred = 0
+        self.deadline_misses = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+
+    def auto_defer(self, func=None, *, ephemeral=True):
+        """Décorateur des commandes (`ephemeral` : visibilité du message « réfléchit… »)."""
+        if func is None:
+            return functools.partial(self.auto_defer, ephemeral=ephemeral)
+        if self.budget <= 0:
+            return func
+
+        @functools.wraps(func)
+        async def wrapper(interaction, *args, **kwargs):
+            started = time.perf_counter()
+            proxy = _DeferredInteraction(interaction, ephemeral)
+            timer = asyncio.get_running_loop().call_later(self.budget, proxy.response.auto_defer)
+            try:
+                return await func(proxy, *args, **kwargs)
+            finally:
+                timer.cancel()
+                response = proxy.response
+                if response.deferred:
+                    self.deferred += 1
+                if response.first_response is not None and response.first_response - started > self.DEADLINE:
+                    self.deadline_misses += 1
+
+        return wrapper
+
+    async def run(self, func, *args):
+        """Exécute `func(*args)` dans le pool de threads et retourne son résultat."""
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix="commande")
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            # Comme asyncio.to_thread : le contexte (métriques de la commande) suit le calcul
+            call = functools.partial(contextvars.copy_context().run, func, *args)
+            return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+        finally:
+            self.queue_depth -= 1
+
+    def prometheus(self):
+        """Retourne les compteurs au format texte de Prometheus."""
+        return "\n".join([
+            "# HELP bot_commands_deferred_total Commandes différées après dépassement du budget.",
+            "# TYPE bot_commands_deferred_total counter",
+            f"bot_commands_deferred_total {self.deferred}",
+            "# HELP bot_commands_deadline_missed_total Commandes ayant répondu après le délai de Discord.",
+            "# TYPE bot_commands_deadline_missed_total counter",
+            f"bot_commands_deadline_missed_total {self.deadline_misses}",
+            "# HELP bot_command_pool_queue_depth Tâches en attente ou en cours dans le pool de calcul.",
+            "# TYPE bot_command_pool_queue_depth gauge",
+            f"bot_command_pool_queue_depth {self.queue_depth}",
+            "# HELP bot_command_pool_queue_depth_max Plus grand nombre de tâches simultanées dans le pool.",
+            "# TYPE bot_command_pool_queue_depth_max gauge",
+            f"bot_command_pool_queue_depth_max {self.max_queue_depth}",
+        ]) + "\n"
+
+
+runner = CommandRunner()
+
+
+async def serve_prometheus(host, port):
+    """Sert les métriques en HTTP (GET /metrics) pour Prometheus, sur une adresse locale."""
+
+    async def handle(reader, writer):
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()).strip():
+                pass
+            if request_line.split()[1:2] == [b"/metrics"]:
+                body = (metrics.prometheus() + runner.prometheus() + metadata_fetcher.prometheus()).encode("utf-8")
+                status = "200 OK"
+            else:
+                body = b"Not found\n"
+                status = "404 Not Found"
+            writer.write(
+                f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    print(f"Métriques Prometheus disponibles sur http://{host}:{port}/metrics")
+    return server
+
 
 # --- Fonctions d'autocomplétion ---
 
+@metrics.instrumented
+async def film_name_choices(interaction, current):
+    """Retourne les 25 meilleurs titres correspondant à la saisie en cours."""
+    catalog = await get_catalog(interaction)
+    return [
+        app_commands.Choice(name=film_name, value=film_name)
+        for film_name in catalog.title_index.search(current, limit=25)
+    ]
+
+@metrics.instrumented
+async def genre_choices(interaction, current, multiple=True):
+    """Suggère des genres classés par fréquence dans le catalogue du serveur."""
+    catalog = await get_catalog(interaction)
+    return genre_completer.complete(current, catalog.stats.genre_counts, multiple=multiple)
+
 async def add_autocomplete_genres(
     interaction: discord.Interaction,
     current: str
 ) -> list[app_commands.Choice[str]]:
-    parts = [s.strip() for s in current.split(',')]
-    last_part = parts[-1] if parts else ""
-    
-    suggestions = []
-    for g in GENRES:
-        if last_part.lower() in g.lower():
-            if len(parts) > 1:
-                suggested_value = ", ".join(parts[:-1] + [g])
-            else:
-                suggested_value = g
-            suggestions.append(app_commands.Choice(name=suggested_value, value=suggested_value))
-    return suggestions[:25]
+    return await genre_choices(interaction, current)
 
 async def remove_autocomplete_film_name(
     interaction: discord.Interaction,
     current: str
 ) -> list[app_commands.Choice[str]]:
-    films = load_films()
-    matching_films = [
-        app_commands.Choice(name=film_name, value=film_name)
-        for film_name in films.keys()
-        if current.lower() in film_name.lower()
-    ]
-    return matching_films[:25]
+    return await film_name_choices(interaction, current)
 
 async def info_autocomplete_film_name(
     interaction: discord.Interaction,
     current: str
 ) -> list[app_commands.Choice[str]]:
-    films = load_films()
-    matching_films = [
-        app_commands.Choice(name=film_name, value=film_name)
-        for film_name in films.keys()
-        if current.lower() in film_name.lower()
-    ]
-    return matching_films[:25]
+    return await film_name_choices(interaction, current)
+
+async def random_autocomplete_genres(
+    interaction: discord.Interaction,
+    current: str
+) -> list[app_commands.Choice[str]]:
+    return await genre_choices(interaction, current)
+
+async def list_autocomplete_genres(
+    interaction: discord.Interaction,
+    current: str
+) -> list[app_commands.Choice[str]]:
+    return await genre_choices(interaction, current, multiple=False)
+
+async def edit_autocomplete_film_name(
+    interaction: discord.Interaction,
+    current: str
+) -> list[app_commands.Choice[str]]:
+    return await film_name_choices(interaction, current)
+
+async def similar_autocomplete_film_name(
+    interaction: discord.Interaction,
+    current: str
+) -> list[app_commands.Choice[str]]:
+    return await film_name_choices(interaction, current)
+
+async def watchlist_autocomplete_film_name(
+    interaction: discord.Interaction,
+    current: str
+) -> list[app_commands.Choice[str]]:
+    return await film_name_choices(interaction, current)
+
+async def edit_autocomplete_genres(
+    interaction: discord.Interaction,
+    current: str
+) -> list[app_commands.Choice[str]]:
+    return await genre_choices(interaction, current)
+
+
+# --- Status bot ---
+prometheus_server = None
+link_check_task = None
+
+
+async def check_links_periodically():
+    """Vérifie régulièrement les liens des catalogues chargés (LINK_CHECK_INTERVAL_HOURS)."""
+    checker = LinkChecker()
+    max_age = LINK_CHECK_INTERVAL_HOURS * 3600
+    while True:
+        for guild_id, film_catalog in catalogs.loaded():
+            if film_catalog.checking_links:
+                continue
+            started = time.perf_counter()
+            try:
+                checked, valid, dead = await film_catalog.check_links(checker, max_age)
+            except Exception as e:
+                # Un catalogue en erreur n'arrête pas la vérification des autres ni les passages suivants
+                print(f"Erreur lors de la vérification des liens du serveur {guild_id} ({type(e).__name__}) : {e}")
+                continue
+            if checked:
+                print(f"Liens du serveur {guild_id} : {checked} vérifié(s) en {time.perf_counter() - started:.0f} s, {valid} valide(s), {dead} mort(s).")
+        # Les liens sont revérifiés par lots : seuls ceux plus anciens que max_age sont repris
+        await asyncio.sleep(min(max_age, 3600))
+
+async def restore_poll_views():
+    """Réenregistre les boutons de tous les sondages ouverts, que le catalogue de leur serveur soit chargé ou non."""
+    await open_polls.load()
+    for poll_id, (guild_id, message_id, candidates) in open_polls.polls.items():
+        client.add_view(PollView(Poll(poll_id, candidates, None)), message_id=message_id)
+    if open_polls.polls:
+        print(f"Boutons de {len(open_polls.polls)} sondage(s) ouvert(s) réenregistrés.")
+
+@client.event
+async def on_ready():
+    print(f"Bot connecté en tant que {client.user}")
+    try:
+        synced = await tree.sync()
+        print(f"Commandes synchronisées : {len(synced)}")
+    except Exception as e:
+        print(f"Erreur lors de la synchronisation des commandes : {e}")
+
+    await client.change_presence(status=discord.Status.idle) # Statut 'inactif'
+    print("Statut du bot défini.")
+
+    global prometheus_server, link_check_task
+    if metrics.enabled and METRICS_PORT and prometheus_server is None:
+        # on_ready peut être appelé plusieurs fois (reconnexions) : un seul serveur
+        prometheus_server = await serve_prometheus(METRICS_HOST, int(METRICS_PORT))
+
+    await metadata_fetcher.load()
+    await restore_poll_views()
+
+    # Précharge les catalogues des serveurs pour que les premières commandes soient rapides
+    started = time.perf_counter()
+    guilds = client.guilds[:catalogs.maxsize]
+    for guild in guilds:
+        film_catalog = catalogs.get(guild.id)
+        await film_catalog.refresh_async()
+        print(f"Catalogue du serveur {guild.id} : {len(film_catalog.films)} film(s) chargé(s) en {film_catalog.load_seconds * 1000:.0f} ms.")
+    print(f"{len(guilds)} catalogue(s) chargé(s) en {(time.perf_counter() - started) * 1000:.0f} ms.")
+
+    if LINK_CHECK_INTERVAL_HOURS > 0 and link_check_task is None:
+        link_check_task = asyncio.create_task(check_links_periodically())
+
+# --- Fonctions utilitaires pour la gestion des films ---
+
+def migrate_films(data):
+    """Convertit les anciennes structures de films vers la structure actuelle.
+
+    Retourne True si au moins un film a été modifié.
+    """
+    migrated = False
+    for film_name, film_info in data.items():
+        if isinstance(film_info, str): 
+            data[film_name] = {"lien": film_info, "genre": ["Non spécifié"], "description": "Aucune description."}
+            migrated = True
+        else:
+            if "genre" not in film_info: 
+                film_info["genre"] = ["Non spécifié"]
+                migrated = True
+            elif isinstance(film_info["genre"], str):
+                genres_list = [g.strip() for g in film_info["genre"].split(',') if g.strip()]
+                film_info["genre"] = [g for g in genres_list if g in GENRES] or ["Non spécifié"]
+                migrated = True
+            
+            if "description" not in film_info: 
+                film_info["description"] = "Aucune description."
+                migrated = True
+    return migrated
+
+_GENRE_BITS = {g: i for i, g in enumerate(GENRES)}
+
+
+class FilmRecord:
+    """Représentation compacte d'un film en mémoire.
+
+    - les genres de GENRES sont un masque de bits (les autres, rares, sont
+      gardés à part dans `other_genres`) ; un masque vide vaut « Non spécifié » ;
+    - le lien est coupé après son dernier « / » et ce préfixe est internalisé,
+      donc partagé entre tous les films d'un même site ;
+    - les valeurs par défaut « N/A » et « Aucune description. » sont
+      représentées par None ;
+    - `link_state` est le résultat de la dernière vérification du lien
+      ("ok", "error", "dead" ou None), tenu à jour par le catalogue et
+      jamais enregistré avec le film.
+
+    Un FilmRecord se lit comme le dictionnaire {"lien", "genre", "description"}
+    qu'il remplace (`get`, `[]`, `copy` qui retourne un vrai dictionnaire).
+    """
+
+    __slots__ = ("mask", "link_prefix", "link_rest", "description", "other_genres", "link_state")
+
+    KEYS = ("lien", "genre", "description")
+
+    def __init__(self, mask=0, link=None, description=None, other_genres=None):
+        self.mask = mask
+        if link is None:
+            self.link_prefix = self.link_rest = None
+        else:
+            cut = link.rfind("/") + 1
+            self.link_prefix = sys.intern(link[:cut])
+            self.link_rest = link[cut:]
+        self.description = description
+        self.other_genres = other_genres
+        self.link_state = None
+
+    @classmethod
+    def from_dict(cls, film_info):
+        """Construit un FilmRecord à partir d'un dictionnaire de film (structure actuelle)."""
+        if isinstance(film_info, cls):
+            return film_info
+        mask = 0
+        other_genres = []
+        genres = film_info.get("genre", [])
+        if not isinstance(genres, list):
+            genres = [genres]
+        for g in genres:
+            bit = _GENRE_BITS.get(g)
+            if bit is not None:
+                mask |= 1 << bit
+            elif g != "Non spécifié" and g not in other_genres:
+                other_genres.append(g)
+        lien = film_info.get("lien", "N/A")
+        description = film_info.get("description", "Aucune description.")
+        return cls(
+            mask,
+            None if lien == "N/A" else lien,
+            None if description == "Aucune description." else description,
+            tuple(other_genres) or None,
+        )
+
+    @property
+    def genres(self):
+        genres = [g for i, g in enumerate(GENRES) if self.mask >> i & 1]
+        if self.other_genres:
+            genres.extend(self.other_genres)
+        return genres or ["Non spécifié"]
+
+    @property
+    def link(self):
+        return "N/A" if self.link_prefix is None else self.link_prefix + self.link_rest
+
+    def __getitem__(self, key):
+        if key == "lien":
+            return self.link
+        if key == "genre":
+            return self.genres
+        if key == "description":
+            return "Aucune description." if self.description is None else self.description
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return self.KEYS
+
+    def to_dict(self):
+        return {key: self[key] for key in self.KEYS}
+
+    copy = to_dict
+
+    def __eq__(self, other):
+        if isinstance(other, FilmRecord):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"FilmRecord({self.to_dict()!r})"
+
+
+def film_json_default(obj):
+    """Fonction `default` de json.dump : sérialise les FilmRecord comme des dictionnaires."""
+    if isinstance(obj, FilmRecord):
+        return obj.to_dict()
+    raise TypeError(f"Objet non sérialisable en JSON : {type(obj).__name__}")
+
+
+def record_size(record):
+    """Estime la mémoire propre d'un film en octets (objet et chaînes qui lui sont propres)."""
+    size = sys.getsizeof(record)
+    if isinstance(record, FilmRecord):
+        # Le préfixe du lien est partagé : il n'est pas compté
+        for value in (record.link_rest, record.description):
+            if value is not None:
+                size += sys.getsizeof(value)
+        return size
+    for value in record.values():
+        size += sys.getsizeof(value)
+        if isinstance(value, list):
+            size += sum(sys.getsizeof(v) for v in value if v not in GENRES)
+    return size
+
+
+def read_films_file(path):
+    """Lit un fichier de films et retourne (films, True si le fichier est au schéma actuel).
+
+    Un fichier au schéma actuel a la forme {"schema_version": N, "films": {...}} ;
+    les anciens fichiers contiennent directement {nom: infos}.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise json.JSONDecodeError("objet JSON attendu", "", 0)
+    if isinstance(data.get("schema_version"), int) and isinstance(data.get("films"), dict):
+        if data["schema_version"] > FILMS_SCHEMA_VERSION:
+            print(f"Le fichier {path} provient d'une version plus récente du bot (schéma {data['schema_version']}).")
+        return data["films"], data["schema_version"] >= FILMS_SCHEMA_VERSION
+    return data, False
+
+def load_films(path=FILMS_FILE):
+    """Charge les données des films depuis le fichier JSON.
+
+    La migration des anciennes structures n'est faite que si le fichier ne
+    porte pas le numéro de schéma actuel ; il est alors réécrit au format
+    actuel, ce qui évite de parcourir tous les films aux chargements suivants.
+    """
+    if os.path.exists(path):
+        try:
+            data, current = read_films_file(path)
+        except json.JSONDecodeError:
+            print(f"Erreur de lecture du fichier {path}. Il est peut-être vide ou corrompu.")
+            return {}
+        if not current:
+            migrate_films(data)
+            save_films(data, path)
+            print(f"Films de {path} migrés vers la structure actuelle (schéma {FILMS_SCHEMA_VERSION}).")
+        return data
+    return {}
+
+def film_records(data, path):
+    """Convertit les films lus dans `path` en FilmRecord.
+
+    Un film à l'ancienne structure (lien seul) dans un fichier au schéma
+    actuel, par exemple modifié à la main, est converti ; un film qui n'est
+    ni un objet ni un lien est ignoré. Un avertissement indique leur nombre.
+    """
+    films = {}
+    converted = 0
+    skipped = 0
+    for name, film_info in data.items():
+        if isinstance(film_info, str):
+            film_info = {"lien": film_info}
+            converted += 1
+        elif not isinstance(film_info, dict):
+            skipped += 1
+            continue
+        films[name] = FilmRecord.from_dict(film_info)
+    if converted:
+        print(f"{converted} film(s) de {path} à l'ancienne structure (lien seul) convertis.")
+    if skipped:
+        print(f"{skipped} film(s) de {path} ignoré(s) : structure invalide.")
+    return films
+
+def save_films(films_data, path=FILMS_FILE):
+    """Sauvegarde les données des films dans le fichier JSON (écriture atomique)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"schema_version": FILMS_SCHEMA_VERSION, "films": films_data}, f, indent=4, default=film_json_default)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def _stat_signature(path):
+    """Retourne (mtime, taille) d'un fichier, ou None s'il n'existe pas."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+# --- Stockage des films ---
+
+class JsonStorage:
+    """Stockage historique : tout le catalogue dans un seul fichier JSON réécrit à chaque mutation."""
+
+    def __init__(self, path):
+        self.path = path
+        self._own_signature = None
+
+    def signature(self):
+        return _stat_signature(self.path)
+
+    def has_external_changes(self):
+        """Indique si le fichier a été modifié par un autre processus depuis notre dernière écriture."""
+        return self.signature() != self._own_signature
+
+    def load(self):
+        films = load_films(self.path)
+        self._own_signature = self.signature()
+        return films
+
+    def snapshot(self, films):
+        # Le fichier entier est réécrit : il faut toujours une copie du catalogue
+        return dict(films)
+
+    def apply(self, ops, films):
+        save_films(films, self.path)
+        self._own_signature = self.signature()
+
+    def close(self):
+        pass
+
+
+class JournalStorage:
+    """Stockage par journal : chaque mutation est ajoutée en une ligne à un fichier journal.
+
+    Le fichier JSON principal sert d'instantané. Quand le journal dépasse
+    `compact_bytes`, il est mis de côté et un nouvel instantané est écrit
+    en arrière-plan, puis l'ancien journal est supprimé. Au démarrage,
+    l'instantané est chargé puis les journaux sont rejoués dans l'ordre.
+    Si un compactage a été interrompu, l'ancien journal n'est pas remplacé
+    au compactage suivant : le journal courant y est ajouté.
+    """
+
+    def __init__(self, path, compact_bytes=JOURNAL_COMPACT_BYTES):
+        self.path = path
+        self.journal_path = f"{os.path.splitext(path)[0]}.journal"
+        self.old_journal_path = f"{self.journal_path}.old"
+        self.compact_bytes = compact_bytes
+        self._lock = threading.Lock()
+        self._compaction = None
+        self._own_signature = None
+        self._journal_size = 0
+        # Le journal se termine par une ligne tronquée (arrêt brutal pendant une écriture)
+        self._journal_truncated = False
+
+    def signature(self):
+        return (
+            _stat_signature(self.path),
+            _stat_signature(self.old_journal_path),
+            _stat_signature(self.journal_path),
+        )
+
+    def has_external_changes(self):
+        with self._lock:
+            return self.signature() != self._own_signature
+
+    def _replay(self, journal_path, films):
+        """Rejoue un journal ; retourne True s'il se termine par une ligne tronquée."""
+        if not os.path.exists(journal_path):
+            return False
+        line = "\n"
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dernière ligne tronquée par un arrêt brutal : on l'ignore
+                    print(f"Entrée de journal illisible ignorée dans {journal_path}.")
+                    continue
+                if record["op"] == "put":
+                    films[record["name"]] = record["data"]
+                elif record["op"] == "delete":
+                    films.pop(record["name"], None)
+        return not line.endswith("\n")
+
+    def load(self):
+        with self._lock:
+            films = load_films(self.path)
+            self._replay(self.old_journal_path, films)
+            # Le journal n'est écrit qu'au format actuel : pas de migration à faire
+            self._journal_truncated = self._replay(self.journal_path, films)
+            self._own_signature = self.signature()
+            self._journal_size = os.path.getsize(self.journal_path) if os.path.exists(self.journal_path) else 0
+        return films
+
+    def snapshot(self, films):
+        """Copie du catalogue, seulement si la prochaine écriture doit compacter le journal.
+
+        Le journal est compacté à l'écriture qui suit celle où il a dépassé
+        `compact_bytes` : les autres écritures n'ajoutent que les mutations.
+        """
+        if self._compaction is None and self._journal_size >= self.compact_bytes:
+            return dict(films)
+        return None
+
+    def apply(self, ops, films):
+        lines = []
+        for op in ops:
+            if op[0] == "put":
+                lines.append(json.dumps({"op": "put", "name": op[1], "data": op[2]}, default=film_json_default))
+            else:
+                lines.append(json.dumps({"op": "delete", "name": op[1]}))
+        with self._lock:
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                # Une ligne tronquée reste seule sur sa ligne au lieu de rendre illisible la suivante
+                f.write(("\n" if self._journal_truncated else "") + "\n".join(lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal_truncated = False
+            self._journal_size = os.path.getsize(self.journal_path)
+            self._own_signature = self.signature()
+            if films is not None and self._journal_size >= self.compact_bytes and self._compaction is None:
+                # Le journal courant devient l'ancien journal ; l'instantané (copie faite
+                # par `snapshot`) en tiendra compte
+                if os.path.exists(self.old_journal_path):
+                    # Compactage précédent interrompu : l'ancien journal n'est peut-être pas dans
+                    # l'instantané, le journal courant lui est ajouté au lieu de le remplacer
+                    with open(self.journal_path, 'rb') as src, open(self.old_journal_path, 'ab') as dst:
+                        dst.write(b"\n")
+                        shutil.copyfileobj(src, dst)
+                        dst.flush()
+                        os.fsync(dst.fileno())
+                    os.remove(self.journal_path)
+                else:
+                    os.replace(self.journal_path, self.old_journal_path)
+                self._journal_size = 0
+                self._own_signature = self.signature()
+                self._compaction = threading.Thread(
+                    target=self._compact, args=(films,), daemon=True
+                )
+                self._compaction.start()
+
+    def _compact(self, snapshot):
+        try:
+            save_films(snapshot, self.path)
+            with self._lock:
+                os.remove(self.old_journal_path)
+                self._own_signature = self.signature()
+        except OSError as e:
+            print(f"Erreur lors du compactage du journal {self.journal_path} : {e}")
+        finally:
+            with self._lock:
+                self._compaction = None
+
+    def wait_for_compaction(self):
+        """Attend la fin d'un éventuel compactage en cours."""
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+
+    def close(self):
+        self.wait_for_compaction()
+
+
+class SqliteStorage:
+    """Stockage SQLite (mode WAL).
+
+    - `films.title` est unique sans tenir compte de la casse (COLLATE NOCASE) ;
+    - `film_genre` associe chaque film à ses genres, dans l'ordre.
+
+    Les recherches (titres, genres, mots-clés) passent par le catalogue en
+    mémoire ; la base ne sert qu'à charger et enregistrer.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS films (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL UNIQUE COLLATE NOCASE,
+            lien TEXT NOT NULL DEFAULT 'N/A',
+            description TEXT NOT NULL DEFAULT 'Aucune description.'
+        );
+        CREATE TABLE IF NOT EXISTS film_genre (
+            film_id INTEGER NOT NULL REFERENCES films(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            genre TEXT NOT NULL,
+            PRIMARY KEY (film_id, position)
+        );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(self.SCHEMA)
+        self._own_data_version = None
+
+    def snapshot(self, films):
+        # Seules les mutations sont écrites : pas de copie du catalogue
+        return None
+
+    def _data_version(self):
+        # Change uniquement lorsqu'une autre connexion a modifié la base
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def has_external_changes(self):
+        with self._lock:
+            return self._data_version() != self._own_data_version
+
+    def load(self):
+        with self._lock:
+            films = {}
+            titles = {}
+            for film_id, title, lien, description in self.conn.execute(
+                "SELECT id, title, lien, description FROM films ORDER BY id"
+            ):
+                films[title] = {"lien": lien, "genre": [], "description": description}
+                titles[film_id] = title
+            for film_id, genre in self.conn.execute(
+                "SELECT film_id, genre FROM film_genre ORDER BY film_id, position"
+            ):
+                films[titles[film_id]]["genre"].append(genre)
+            for film_info in films.values():
+                if not film_info["genre"]:
+                    film_info["genre"] = ["Non spécifié"]
+            self._own_data_version = self._data_version()
+        return films
+
+    def apply(self, ops, films):
+        with self._lock, self.conn:
+            for op in ops:
+                if op[0] == "put":
+                    _, name, info = op
+                    film_id = self.conn.execute(
+                        """INSERT INTO films(title, lien, description) VALUES (?, ?, ?)
+                           ON CONFLICT(title) DO UPDATE SET
+                               title = excluded.title,
+                               lien = excluded.lien,
+                               description = excluded.description
+                           RETURNING id""",
+                        (name, info.get("lien", "N/A"), info.get("description", "Aucune description.")),
+                    ).fetchone()[0]
+                    self.conn.execute("DELETE FROM film_genre WHERE film_id = ?", (film_id,))
+                    self.conn.executemany(
+                        "INSERT INTO film_genre(film_id, position, genre) VALUES (?, ?, ?)",
+                        [(film_id, pos, genre) for pos, genre in enumerate(info.get("genre", []))],
+                    )
+                else:
+                    self.conn.execute("DELETE FROM films WHERE title = ?", (op[1],))
+        with self._lock:
+            self._own_data_version = self._data_version()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def import_json_to_sqlite(json_path, db_path):
+    """Importe un fichier films.json (y compris les anciennes structures) dans une base SQLite."""
+    data, current = read_films_file(json_path)
+    if not current:
+        migrate_films(data)
+    storage = SqliteStorage(db_path)
+    storage.apply([("put", name, info) for name, info in data.items()], data)
+    print(f"{len(data)} film(s) importé(s) de {json_path} vers {db_path}.")
+    return storage
+
+
+def make_storage(path, db_path=FILMS_DB):
+    """Crée le stockage choisi par la variable FILMS_STORAGE ("json", "journal" ou "sqlite")."""
+    if FILMS_STORAGE == "sqlite":
+        if not os.path.exists(db_path) and os.path.exists(path):
+            # Première utilisation : import unique du catalogue JSON existant
+            return import_json_to_sqlite(path, db_path)
+        return SqliteStorage(db_path)
+    if FILMS_STORAGE == "journal":
+        return JournalStorage(path)
+    if FILMS_STORAGE == "json":
+        return JsonStorage(path)
+    raise ValueError(f"Stockage inconnu : {FILMS_STORAGE}")
+
+def normalize_title(text):
+    """Met un texte en minuscules et retire les accents (pour la recherche)."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+# Articles ignorés en début de titre (« Le Parrain » et « Parrain » ont la même clé)
+TITLE_ARTICLES = frozenset({"le", "la", "les", "l", "un", "une", "des", "the", "a", "an"})
+
+
+def title_key(text):
+    """Clé de comparaison d'un titre : minuscules, sans accents, ponctuation ni article initial."""
+    words = "".join(c if c.isalnum() else " " for c in normalize_title(text)).split()
+    if len(words) > 1 and words[0] in TITLE_ARTICLES:
+        del words[0]
+    return " ".join(words)
+
+
+def edit_distance(a, b, max_distance):
+    """Distance de Damerau-Levenshtein (transpositions adjacentes) entre deux textes.
+
+    Seule une bande de largeur 2 * max_distance + 1 autour de la diagonale
+    est calculée ; retourne `max_distance + 1` dès que la distance dépasse
+    `max_distance`.
+    """
+    too_far = max_distance + 1
+    if abs(len(a) - len(b)) > max_distance:
+        return too_far
+    # Début et fin communs : sans effet sur la distance
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if not a or not b:
+        return min(max(len(a), len(b)), too_far)
+
+    previous2 = None
+    previous = [j if j <= max_distance else too_far for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [too_far] * (len(b) + 1)
+        if i <= max_distance:
+            current[0] = i
+        row_min = current[0]
+        char = a[i - 1]
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char != b[j - 1]))
+            if i > 1 and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return too_far
+        previous2, previous = previous, current
+    return min(previous[-1], too_far)
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _ngrams(text):
+    """Sous-chaînes de 1 à 3 caractères d'un texte (clés de l'index des titres)."""
+    return {text[i:i + size] for size in (1, 2, 3) for i in range(len(text) - size + 1)}
+
+
+def _word_start_keys(norm):
+    """1 à 3 premiers caractères de chaque mot, sauf celui qui ouvre le titre (déjà couvert par les préfixes)."""
+    return {norm[i:i + size] for i in range(1, len(norm)) if not norm[i - 1].isalnum() for size in (1, 2, 3)}
+
+
+def _starts_word(norm, query):
+    """Vrai si `query` apparaît dans `norm` au début d'un mot autre que le premier."""
+    pos = norm.find(query, 1)
+    while pos != -1:
+        if not norm[pos - 1].isalnum():
+            return True
+        pos = norm.find(query, pos + 1)
+    return False
+
+
+class TitleIndex:
+    """Index de recherche des titres de films.
+
+    Une liste triée des titres normalisés sert aux préfixes ; les
+    sous-chaînes de 1 à 3 caractères et les débuts de mots renvoient chacun
+    vers une liste de titres gardée dans l'ordre du classement (titres
+    courts d'abord, puis alphabétique). Une recherche lit donc les titres
+    dans l'ordre et s'arrête dès qu'elle en a assez.
+
+    Les titres sont normalisés une seule fois à l'insertion ; l'index est
+    mis à jour incrémentalement à chaque ajout, modification ou suppression.
+    """
+
+    def __init__(self, names=()):
+        self._norm = {name: normalize_title(name) for name in names}
+        self._postings = postings = {}
+        self._word_starts = word_starts = {}
+        # Parcours dans l'ordre du classement : chaque liste est construite déjà triée
+        for _, norm, name in sorted((len(norm), norm, name) for name, norm in self._norm.items()):
+            for key in _ngrams(norm):
+                postings.setdefault(key, []).append(name)
+            for key in _word_start_keys(norm):
+                word_starts.setdefault(key, []).append(name)
+        self._sorted = sorted((norm, name) for name, norm in self._norm.items())
+
+    def __len__(self):
+        return len(self._norm)
+
+    def _order(self, name):
+        # Ordre du classement à l'intérieur d'une catégorie : titres courts d'abord, puis alphabétique
+        norm = self._norm[name]
+        return (len(norm), norm, name)
+
+    def add(self, name):
+        """Ajoute un titre à l'index (sans effet s'il y est déjà)."""
+        if name in self._norm:
+            return
+        norm = normalize_title(name)
+        self._norm[name] = norm
+        for table, keys in ((self._postings, _ngrams(norm)), (self._word_starts, _word_start_keys(norm))):
+            for key in keys:
+                bisect.insort(table.setdefault(key, []), name, key=self._order)
+        bisect.insort(self._sorted, (norm, name))
+
+    def remove(self, name):
+        """Retire un titre de l'index (sans effet s'il n'y est pas)."""
+        norm = self._norm.get(name)
+        if norm is None:
+            return
+        order = self._order(name)
+        for table, keys in ((self._postings, _ngrams(norm)), (self._word_starts, _word_start_keys(norm))):
+            for key in keys:
+                names = table[key]
+                del names[bisect.bisect_left(names, order, key=self._order)]
+                if not names:
+                    del table[key]
+        del self._norm[name]
+        pos = bisect.bisect_left(self._sorted, (norm, name))
+        if pos < len(self._sorted) and self._sorted[pos] == (norm, name):
+            del self._sorted[pos]
+
+    def search(self, query, limit=25):
+        """Retourne au plus `limit` titres contenant `query`, classés par pertinence.
+
+        Les titres qui commencent par `query` viennent d'abord, dans l'ordre
+        alphabétique ; puis ceux où `query` commence un autre mot, puis ceux
+        qui la contiennent ailleurs, titres courts d'abord. Le classement est
+        exact : chaque catégorie est lue dans l'ordre jusqu'à avoir `limit`
+        titres.
+        """
+        query = normalize_title(query.strip())
+        results = self._prefixed(query, limit)
+        if len(results) >= limit or not query:
+            return results
+        # Une catégorie n'est lue que si la précédente est épuisée : `seen` en contient tous les titres
+        seen = set(results)
+        norms = self._norm
+        for name in self._word_starts.get(query[:3], ()):
+            if name not in seen and (len(query) <= 3 or _starts_word(norms[name], query)):
+                results.append(name)
+                if len(results) >= limit:
+                    return results
+                seen.add(name)
+        if len(query) <= 3:
+            candidates = self._postings.get(query, ())
+        else:
+            # Liste la plus courte parmi les trigrammes de `query`
+            candidates = min((self._postings.get(tri, ()) for tri in _trigrams(query)), key=len)
+        for name in candidates:
+            if name not in seen and query in norms[name]:
+                results.append(name)
+                if len(results) >= limit:
+                    break
+        return results
+
+    def _prefixed(self, query, limit):
+        """Retourne au plus `limit` titres commençant par `query`, dans l'ordre alphabétique."""
+        start = bisect.bisect_left(self._sorted, (query,))
+        results = []
+        for norm, name in self._sorted[start:start + limit]:
+            if not norm.startswith(query):
+                break
+            results.append(name)
+        return results
+
+
+class NameResolver:
+    """Résolution des noms de films tolérante aux variantes et aux fautes de frappe.
+
+    Chaque titre est rangé sous sa clé normalisée (`title_key`) dans une
+    table de hachage. Pour les recherches approchées (index construit à la
+    première d'entre elles, ou d'emblée par `build`) :
+    - un index de type SymSpell associe à chaque mot des titres les
+      variantes obtenues en supprimant jusqu'à 2 caractères de son début
+      (PREFIX_LENGTH caractères ; 1 seul pour les mots courts) : les
+      variantes d'un mot de la requête donnent les mots proches (les
+      nombres, eux, doivent être exacts) ;
+    - un index inversé mot -> clés donne les titres contenant, pour chaque
+      mot de la requête, un mot proche ; ils sont enfin départagés par
+      `edit_distance` sur la clé entière (au plus MAX_DISTANCE fautes).
+    """
+
+    MAX_DISTANCE = 2
+    PREFIX_LENGTH = 7
+
+    def __init__(self, names=()):
+        # Clé normalisée -> nom (ou tuple de noms si plusieurs films ont la même clé)
+        self._by_key = {}
+        # Mot -> clé (ou set de clés) ; variante -> mot (ou set de mots). None avant la première recherche approchée
+        self._keys_by_word = None
+        self._deletes = None
+        for name in names:
+            self.add(name)
+
+    @classmethod
+    def build(cls, names):
+        """Construit la table et l'index des recherches approchées (à appeler hors de la boucle)."""
+        resolver = cls(names)
+        resolver._build_fuzzy_index()
+        return resolver
+
+    def __len__(self):
+        return len(self._by_key)
+
+    def _build_fuzzy_index(self):
+        self._keys_by_word = {}
+        self._deletes = {}
+        for key in self._by_key:
+            self._index_key(key)
+
+    def _names(self, key):
+        names = self._by_key.get(key, ())
+        return (names,) if isinstance(names, str) else names
+
+    @staticmethod
+    def _max_distance(text):
+        # Une seule faute tolérée pour les mots et les titres très courts
+        return 1 if len(text) <= 4 else NameResolver.MAX_DISTANCE
+
+    @classmethod
+    def _variants(cls, word, max_distance):
+        """Variantes du début d'un mot à au plus `max_distance` suppressions (le début compris)."""
+        variants = {word[:cls.PREFIX_LENGTH]}
+        frontier = variants
+        for _ in range(max_distance):
+            frontier = {v[:i] + v[i + 1:] for v in frontier for i in range(len(v))}
+            variants |= frontier
+        return variants
+
+    @staticmethod
+    def _link(table, item, value):
+        # Valeur seule tant qu'il n'y en a qu'une, set au-delà : la plupart des entrées n'en ont qu'une
+        values = table.get(item)
+        if values is None:
+            table[item] = value
+        elif isinstance(values, str):
+            if values != value:
+                table[item] = {values, value}
+        else:
+            values.add(value)
+
+    @staticmethod
+    def _unlink(table, item, value):
+        values = table.get(item)
+        if values == value:
+            del table[item]
+        elif isinstance(values, set):
+            values.discard(value)
+            if len(values) == 1:
+                table[item] = values.pop()
+
+    @staticmethod
+    def _values(table, item):
+        values = table.get(item, ())
+        return (values,) if isinstance(values, str) else values
+
+    def _index_key(self, key):
+        for word in set(key.split()):
+            if word not in self._keys_by_word and not word.isdigit():
+                for variant in self._variants(word, self._max_distance(word)):
+                    self._link(self._deletes, variant, word)
+            self._link(self._keys_by_word, word, key)
+
+    def _unindex_key(self, key):
+        for word in set(key.split()):
+            self._unlink(self._keys_by_word, word, key)
+            if word not in self._keys_by_word and not word.isdigit():
+                for variant in self._variants(word, self._max_distance(word)):
+                    self._unlink(self._deletes, variant, word)
+
+    def add(self, name):
+        key = title_key(name)
+        names = self._names(key)
+        if name in names:
+            return
+        self._by_key[key] = names + (name,) if names else name
+        if self._deletes is not None and not names:
+            self._index_key(key)
+
+    def remove(self, name):
+        key = title_key(name)
+        names = self._names(key)
+        if name not in names:
+            return
+        names = tuple(n for n in names if n != name)
+        if not names:
+            del self._by_key[key]
+            if self._deletes is not None:
+                self._unindex_key(key)
+        else:
+            self._by_key[key] = names[0] if len(names) == 1 else names
+
+    def exact(self, text):
+        """Retourne les titres dont la clé normalisée est celle de `text`."""
+        return list(self._names(title_key(text)))
+
+    def _close_words(self, word, expand=True):
+        """Mots des titres à distance tolérée de `word` (lui compris s'il existe).
+
+        Sans `expand`, un mot qui existe tel quel n'est pas élargi à ses voisins.
+        """
+        if word.isdigit() or (not expand and word in self._keys_by_word):
+            # Les nombres (années, numéros de suite) doivent être exacts : « Rocky 2 » n'est pas « Rocky 3 »
+            return {word} if word in self._keys_by_word else set()
+        candidates = set()
+        for variant in self._variants(word, self.MAX_DISTANCE):
+            candidates.update(self._values(self._deletes, variant))
+        return {
+            candidate for candidate in candidates
+            if abs(len(candidate) - len(word)) <= self.MAX_DISTANCE
+            and edit_distance(word, candidate, self._max_distance(candidate)) <= self._max_distance(candidate)
+        }
+
+    def suggest(self, text, limit=5):
+        """Retourne au plus `limit` titres proches de `text`, du plus proche au moins proche."""
+        key = title_key(text)
+        if not key:
+            return []
+        if self._deletes is None:
+            self._build_fuzzy_index()
+
+        # La faute est d'abord cherchée dans les mots qui n'existent pas tels quels,
+        # puis, si rien ne correspond, dans tous les mots
+        scored = self._scored_candidates(key, expand=False) or self._scored_candidates(key, expand=True)
+        return [name for _, _, candidate in scored for name in self._names(candidate)][:limit]
+
+    def _scored_candidates(self, key, expand):
+        # Mots proches de chaque mot de la requête, en commençant par les plus rares
+        close = [self._close_words(word, expand) for word in set(key.split())]
+        if not all(close):
+            return []
+        close.sort(key=lambda words: sum(len(self._values(self._keys_by_word, w)) for w in words))
+        candidates = {k for w in close[0] for k in self._values(self._keys_by_word, w)}
+        for words in close[1:]:
+            candidates = {k for k in candidates if not words.isdisjoint(k.split())}
+
+        max_distance = self._max_distance(key)
+        scored = []
+        for candidate in candidates:
+            distance = edit_distance(key, candidate, max_distance)
+            if distance <= max_distance:
+                scored.append((distance, abs(len(candidate) - len(key)), candidate))
+        scored.sort()
+        return scored
+
+
+def _nth_set_bit(bitmap, n):
+    """Retourne la position du n-ième bit à 1 (à partir de 0) d'un entier."""
+    lo, hi = 0, bitmap.bit_length()
+    # Plus petite position p telle que les bits [0, p] contiennent plus de n bits à 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if (bitmap & ((2 << mid) - 1)).bit_count() > n:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+class GenreIndex:
+    """Index inversé des genres : un bitmap (entier Python) par genre de GENRES.
+
+    Chaque film occupe une position dans les bitmaps, attribuée dans
+    l'ordre d'insertion. Un filtre sur plusieurs genres est une intersection
+    (ET binaire) et un tirage aléatoire choisit directement un bit à 1 de
+    l'intersection, sans construire la liste des films correspondants.
+
+    Les positions des films retirés restent vides jusqu'au compactage, qui
+    renumérote les films (dans le même ordre) lorsqu'elles sont plus
+    nombreuses que les films présents ; `generation` est alors incrémenté
+    pour que les structures indexées par position soient reconstruites.
+    """
+
+    def __init__(self, films=None):
+        self._slot_of = {}
+        self._names = []
+        self._masks = []
+        self._all = 0
+        self._bitmaps = {g: 0 for g in GENRES}
+        self._bit_of_genre = {g: i for i, g in enumerate(GENRES)}
+        # Incrémenté à chaque renumérotation des positions (compactage)
+        self.generation = 0
+        for name, film_info in (films or {}).items():
+            self.add(name, film_info.mask if isinstance(film_info, FilmRecord) else film_info.get("genre", []))
+
+    def __len__(self):
+        return self._all.bit_count()
+
+    def _genre_mask(self, genres):
+        if isinstance(genres, int):
+            # Déjà un masque (FilmRecord.mask) : mêmes positions que GENRES
+            return genres
+        if not isinstance(genres, list):
+            genres = [genres]
+        mask = 0
+        for g in genres:
+            bit = self._bit_of_genre.get(g)
+            if bit is not None:
+                mask |= 1 << bit
+        return mask
+
+    def add(self, name, genres):
+        """Ajoute un film ou met à jour ses genres."""
+        mask = self._genre_mask(genres)
+        slot = self._slot_of.get(name)
+        if slot is None:
+            slot = len(self._names)
+            self._slot_of[name] = slot
+            self._names.append(name)
+            self._masks.append(0)
+            self._all |= 1 << slot
+        self._set_mask(slot, mask)
+
+    def remove(self, name):
+        """Retire un film de l'index (sa position est libérée au prochain compactage)."""
+        slot = self._slot_of.pop(name, None)
+        if slot is None:
+            return
+        self._set_mask(slot, 0)
+        self._names[slot] = None
+        self._all &= ~(1 << slot)
+        if len(self._names) > 2 * len(self._slot_of) + 1000:
+            self._compact()
+
+    def _compact(self):
+        """Renumérote les films présents, dans l'ordre de leurs positions."""
+        self._names = [name for name in self._names if name is not None]
+        self._masks = [self._masks[self._slot_of[name]] for name in self._names]
+        self._slot_of = {name: slot for slot, name in enumerate(self._names)}
+        n = len(self._names)
+        self._all = (1 << n) - 1
+        for i, g in enumerate(GENRES):
+            # Bitmap construit en une fois à partir de son écriture binaire (position 0 à droite)
+            bits = bytes(49 if mask >> i & 1 else 48 for mask in reversed(self._masks))
+            self._bitmaps[g] = int(bits, 2) if n else 0
+        self.generation += 1
+
+    def _set_mask(self, slot, mask):
+        old_mask = self._masks[slot]
+        bit = 1 << slot
+        for i, g in enumerate(GENRES):
+            if (old_mask ^ mask) >> i & 1:
+                self._bitmaps[g] ^= bit
+        self._masks[slot] = mask
+
+    def matching(self, genres):
+        """Retourne le bitmap des films possédant tous les genres demandés."""
+        bitmap = self._all
+        for g in genres:
+            bitmap &= self._bitmaps.get(g, 0)
+        return bitmap
+
+    def names(self, bitmap):
+        """Itère sur les noms des films d'un bitmap, dans l'ordre d'insertion."""
+        bits = bin(bitmap)[:1:-1]
+        slot = bits.find("1")
+        while slot != -1:
+            yield self._names[slot]
+            slot = bits.find("1", slot + 1)
+
+    def sample_many(self, genres, k, rng=random):
+        """Tire au plus `k` films distincts possédant tous les genres demandés."""
+        bitmap = self.matching(genres)
+        count = bitmap.bit_count()
+        return [self._names[_nth_set_bit(bitmap, n)] for n in rng.sample(range(count), min(k, count))]
+
+
+class FenwickTree:
+    """Arbre de Fenwick (somme préfixe) sur des poids entiers, extensible par la fin."""
+
+    def __init__(self, weights=()):
+        self._weights = list(weights)
+        self._tree = [0] + self._weights
+        n = len(self._weights)
+        for i in range(1, n + 1):
+            parent = i + (i & -i)
+            if parent <= n:
+                self._tree[parent] += self._tree[i]
+
+    def __len__(self):
+        return len(self._weights)
+
+    @property
+    def total(self):
+        return self._prefix(len(self._weights))
+
+    def _prefix(self, i):
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def weight(self, index):
+        return self._weights[index]
+
+    def set(self, index, weight):
+        """Modifie le poids de la position `index`."""
+        delta = weight - self._weights[index]
+        self._weights[index] = weight
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def append(self, weight):
+        """Ajoute une position à la fin, en O(log n)."""
+        i = len(self._tree)
+        self._weights.append(weight)
+        self._tree.append(weight + self._prefix(i - 1) - self._prefix(i - (i & -i)))
+
+    def find(self, target):
+        """Retourne la position p telle que somme(poids[:p]) <= target < somme(poids[:p + 1])."""
+        pos = 0
+        step = 1 << len(self._tree).bit_length()
+        while step:
+            nxt = pos + step
+            if nxt < len(self._tree) and self._tree[nxt] <= target:
+                pos = nxt
+                target -= self._tree[nxt]
+            step >>= 1
+        return pos
+
+
+class PickHistory:
+    """Historique des tirages de /random d'un catalogue : derniers films tirés et nombre de tirages."""
+
+    def __init__(self, window=RANDOM_NO_REPEAT, recent=(), counts=None):
+        self.recent = deque(recent, maxlen=window)
+        self.counts = counts or {}
+
+    def record(self, name):
+        self.recent.append(name)
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def forget(self, name):
+        """Oublie un film supprimé ou renommé."""
+        self.counts.pop(name, None)
+        if name in self.recent:
+            self.recent.remove(name)
+
+    @classmethod
+    def load(cls, path, window=RANDOM_NO_REPEAT):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return cls(window)
+        return cls(window, data.get("recent", []), data.get("counts", {}))
+
+    def save(self, path):
+        """Enregistre l'historique (écriture atomique, format compact)."""
+        data = {"recent": list(self.recent), "counts": dict(self.counts)}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(data, separators=(",", ":")))
+        os.replace(tmp_path, path)
+
+
+class RandomPicker:
+    """Tirage aléatoire pour /random, sans répétition récente et éventuellement pondéré.
+
+    Les films tirés parmi les `window` derniers tirages sont exclus (via un
+    bitmap sur les positions de `GenreIndex`). En mode pondéré, le poids
+    d'un film diminue avec son nombre de tirages ; les poids sont rangés
+    dans un arbre de Fenwick indexé par les mêmes positions, ce qui permet
+    un tirage en O(log n) et une mise à jour en O(log n).
+    """
+
+    WEIGHT_SCALE = 2520
+    MAX_REJECTIONS = 64
+
+    def __init__(self, genre_index, history):
+        self.genre_index = genre_index
+        self.history = history
+        self.tree = FenwickTree(
+            0 if name is None else self._weight(name) for name in genre_index._names
+        )
+
+    def _weight(self, name):
+        return max(1, self.WEIGHT_SCALE // (1 + self.history.counts.get(name, 0)))
+
+    def add(self, name):
+        """Met à jour le poids d'un film ajouté ou modifié (après `GenreIndex.add`)."""
+        slot = self.genre_index._slot_of[name]
+        while len(self.tree) <= slot:
+            self.tree.append(0)
+        self.tree.set(slot, self._weight(name))
+
+    def remove(self, name):
+        """Annule le poids d'un film supprimé (avant `GenreIndex.remove`)."""
+        slot = self.genre_index._slot_of.get(name)
+        if slot is not None and slot < len(self.tree):
+            self.tree.set(slot, 0)
+
+    def _recent_mask(self):
+        mask = 0
+        for name in self.history.recent:
+            slot = self.genre_index._slot_of.get(name)
+            if slot is not None:
+                mask |= 1 << slot
+        return mask
+
+    def pick(self, genres, weighted=False, rng=random, exclude=0):
+        """Tire un film possédant tous les genres demandés (None si aucun) et l'enregistre.
+
+        Les films du bitmap `exclude` (liens morts) ne sont tirés que s'il n'y a pas d'autre choix.
+        """
+        matching = self.genre_index.matching(genres)
+        if not matching:
+            return None
+        if matching & ~exclude:
+            matching &= ~exclude
+        candidates = matching & ~self._recent_mask()
+        if not candidates:
+            # Moins de films que la fenêtre sans répétition : on autorise les répétitions
+            candidates = matching
+        if weighted:
+            slot = self._weighted_slot(candidates, rng)
+        else:
+            slot = _nth_set_bit(candidates, rng.randrange(candidates.bit_count()))
+        name = self.genre_index._names[slot]
+        self.history.record(name)
+        self.tree.set(slot, self._weight(name))
+        return name
+
+    def _weighted_slot(self, candidates, rng):
+        total = self.tree.total
+        # Tirage dans tout le catalogue puis rejet : efficace quand le filtre garde beaucoup de films
+        for _ in range(self.MAX_REJECTIONS):
+            slot = self.tree.find(rng.randrange(total))
+            if candidates >> slot & 1:
+                return slot
+        slots = []
+        cumulative = []
+        running = 0
+        bits = bin(candidates)[:1:-1]
+        slot = bits.find("1")
+        while slot != -1:
+            running += self.tree.weight(slot)
+            slots.append(slot)
+            cumulative.append(running)
+            slot = bits.find("1", slot + 1)
+        return slots[bisect.bisect_right(cumulative, rng.randrange(running))]
+
+
+class CatalogStats:
+    """Agrégats du catalogue maintenus incrémentalement (pour /stats).
+
+    Nombre total de films, répartition par genre, films avec lien ou
+    description, et matrice de co-occurrence des genres (paires triées).
+    """
+
+    def __init__(self, films=None):
+        self.total = 0
+        self.with_link = 0
+        self.with_description = 0
+        self.genre_counts = {}
+        self.pair_counts = {}
+        for film_info in (films or {}).values():
+            self.add(film_info)
+
+    @staticmethod
+    def _genres(film_info):
+        return sorted(set(film_info.get("genre", ["Non spécifié"])))
+
+    def _update(self, film_info, delta):
+        self.total += delta
+        if film_info.get("lien", "N/A") != "N/A":
+            self.with_link += delta
+        if film_info.get("description", "Aucune description.") != "Aucune description.":
+            self.with_description += delta
+        genres = self._genres(film_info)
+        for genre in genres:
+            count = self.genre_counts.get(genre, 0) + delta
+            if count:
+                self.genre_counts[genre] = count
+            else:
+                self.genre_counts.pop(genre, None)
+        for pair in itertools.combinations(genres, 2):
+            count = self.pair_counts.get(pair, 0) + delta
+            if count:
+                self.pair_counts[pair] = count
+            else:
+                self.pair_counts.pop(pair, None)
+
+    def add(self, film_info):
+        self._update(film_info, 1)
+
+    def remove(self, film_info):
+        self._update(film_info, -1)
+
+    def sorted_genres(self):
+        """Retourne les (genre, nombre) par nombre décroissant."""
+        return sorted(self.genre_counts.items(), key=lambda item: item[1], reverse=True)
+
+    def top_pairs(self, limit=10):
+        """Retourne les `limit` paires de genres les plus fréquentes."""
+        return heapq.nlargest(limit, self.pair_counts.items(), key=lambda item: item[1])
+
+
+# Mots trop fréquents en français pour être utiles à la recherche
+SEARCH_STOPWORDS = frozenset("""
+    a au aux avec ce ces dans de des du elle en et est il ils je la le les leur lui mais
+    me meme mon ne nous on ou par pas pour qu que qui sa se ses son sur ta te tes ton tu
+    un une vos votre vous y the of and
+""".split())
+_WORD_RE = re.compile(r"\w+")
+
+
+def search_tokens(text):
+    """Découpe un texte en mots normalisés (minuscules, sans accents, sans mots vides)."""
+    return [
+        token for token in _WORD_RE.findall(normalize_title(text))
+        if len(token) > 1 and token not in SEARCH_STOPWORDS
+    ]
+
+
+def _document_checksum(name, film_info):
+    text = f"{name}\0{film_info.get('description', '')}"
+    return zlib.crc32(text.encode("utf-8"))
+
+
+class SearchIndex:
+    """Index inversé plein texte (titres et descriptions) avec un classement BM25.
+
+    Chaque film reçoit un numéro ; les listes de postings sont des tableaux
+    compacts (`array`) de numéros et de fréquences, ce qui permet de les
+    enregistrer et de les relire sans recréer des millions d'objets. Les
+    mots du titre comptent `TITLE_WEIGHT` fois. Un film retiré laisse ses
+    entrées en place (ignorées) jusqu'au prochain compactage.
+
+    Les listes longues (`IMPACT_MIN_POSTINGS` entrées ou plus) reçoivent à
+    la première recherche une copie triée par contribution décroissante au
+    score. La recherche les parcourt en tête et s'arrête dès que la somme
+    des bornes supérieures des mots (contribution à la position courante
+    de chaque liste) ne peut plus dépasser le `limit`-ième meilleur score :
+    le résultat est exact sans lire les listes en entier.
+
+    L'index est enregistré à côté du catalogue ; au chargement, seuls les
+    films dont la somme de contrôle a changé sont réindexés.
+    """
+
+    TITLE_WEIGHT = 3
+    K1 = 1.2
+    B = 0.75
+    FORMAT_VERSION = 1
+    IMPACT_MIN_POSTINGS = 512
+
+    def __init__(self):
+        self._names = []
+        self._doc_of = {}
+        # 1 si le numéro correspond à un film présent, 0 s'il a été retiré
+        self._alive = array("B")
+        # Incrémenté à chaque renumérotation des films (compactage)
+        self.generation = 0
+        self._lengths = array("I")
+        self._checksums = array("I")
+        self._postings = {}
+        self._total_length = 0
+        # Listes triées par contribution : {mot: (taille couverte, longueur moyenne, numéros, poids)}
+        self._impacts = {}
+
+    def __len__(self):
+        return len(self._doc_of)
+
+    def term_counts(self, name, film_info):
+        """Retourne {mot: fréquence} pour un film (mots du titre pondérés)."""
+        counts = {}
+        for token in search_tokens(name):
+            counts[token] = counts.get(token, 0) + self.TITLE_WEIGHT
+        description = film_info.get("description", "Aucune description.")
+        if description != "Aucune description.":
+            for token in search_tokens(description):
+                counts[token] = counts.get(token, 0) + 1
+        return counts
+
+    def idf(self, df):
+        """IDF (variante BM25, toujours positive) d'un mot présent dans `df` films."""
+        n_docs = len(self._doc_of)
+        # `df` compte aussi les entrées des films retirés (jusqu'au compactage) et peut dépasser le
+        # nombre de films : sans borne, l'IDF deviendrait négative et fausserait le classement
+        df = min(df, n_docs)
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def add(self, name, film_info):
+        """Indexe un film (remplace son indexation précédente)."""
+        self.remove(name)
+        counts = self.term_counts(name, film_info)
+        doc_id = len(self._names)
+        length = sum(counts.values())
+        self._names.append(name)
+        self._alive.append(1)
+        self._doc_of[name] = doc_id
+        self._lengths.append(length)
+        self._checksums.append(_document_checksum(name, film_info))
+        self._total_length += length
+        for token, tf in counts.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = (array("I"), array("I"))
+            postings[0].append(doc_id)
+            postings[1].append(tf)
+
+    def remove(self, name):
+        """Retire un film de l'index (sans effet s'il n'y est pas)."""
+        doc_id = self._doc_of.pop(name, None)
+        if doc_id is None:
+            return
+        self._names[doc_id] = None
+        self._alive[doc_id] = 0
+        self._total_length -= self._lengths[doc_id]
+        if len(self._names) > 2 * len(self._doc_of) + 1000:
+            self._compact()
+
+    def _compact(self):
+        """Renumérote les films et purge les entrées des films retirés."""
+        new_ids = array("i", [-1]) * len(self._names)
+        names = []
+        for doc_id, name in enumerate(self._names):
+            if name is not None:
+                new_ids[doc_id] = len(names)
+                names.append(name)
+        live = [doc_id for doc_id, name in enumerate(self._names) if name is not None]
+        self._lengths = array("I", (self._lengths[doc_id] for doc_id in live))
+        self._checksums = array("I", (self._checksums[doc_id] for doc_id in live))
+        postings = {}
+        for token, (ids, tfs) in self._postings.items():
+            kept = [(new_ids[doc_id], tf) for doc_id, tf in zip(ids, tfs) if new_ids[doc_id] >= 0]
+            if kept:
+                postings[token] = (array("I", (i for i, _ in kept)), array("I", (tf for _, tf in kept)))
+        self._names = names
+        self._doc_of = {name: doc_id for doc_id, name in enumerate(names)}
+        self._alive = array("B", [1]) * len(names)
+        self._postings = postings
+        self._impacts = {}
+        self.generation += 1
+
+    def _impact_list(self, token, ids, tfs, avg_length):
+        """Retourne la copie de la liste de `token` triée par contribution décroissante.
+
+        Le poids enregistré est tf / (tf + norme) calculé avec la longueur
+        moyenne du moment. La copie ne couvre que les entrées présentes à sa
+        création (les suivantes sont lues en entier par `search`) ; elle est
+        refaite quand trop d'entrées s'y sont ajoutées ou que la longueur
+        moyenne a trop changé.
+        """
+        cached = self._impacts.get(token)
+        if cached is not None:
+            size, built_avg, _, _ = cached
+            if len(ids) - size <= size // 8 and 0.8 <= avg_length / built_avg <= 1.25:
+                return cached
+        names = self._names
+        lengths = self._lengths
+        k1, b = self.K1, self.B
+        weighted = [
+            (tf / (tf + k1 * (1 - b + b * lengths[doc_id] / avg_length)), doc_id)
+            for doc_id, tf in zip(ids, tfs)
+            if names[doc_id] is not None
+        ]
+        weighted.sort(reverse=True)
+        cached = self._impacts[token] = (
+            len(ids),
+            avg_length,
+            array("I", (doc_id for _, doc_id in weighted)),
+            array("d", (weight for weight, _ in weighted)),
+        )
+        return cached
+
+    def search(self, query, limit=10):
+        """Retourne au plus `limit` paires (titre, score) classées par pertinence."""
+        tokens = set(search_tokens(query))
+        if not tokens or not self._doc_of or limit <= 0:
+            return []
+        n_docs = len(self._doc_of)
+        avg_length = self._total_length / n_docs or 1
+        names = self._names
+        lengths = self._lengths
+        k1, b = self.K1, self.B
+        # Contributions des listes courtes et des entrées récentes, lues en entier
+        scores = {}
+        # Listes longues : [facteur, numéros, fréquences, taille couverte, ordre, poids, dérive, position]
+        heads = []
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            ids, tfs = postings
+            factor = self.idf(len(ids)) * (k1 + 1)
+            start = 0
+            if len(ids) >= self.IMPACT_MIN_POSTINGS:
+                size, built_avg, order, weights = self._impact_list(token, ids, tfs, avg_length)
+                # Un poids calculé avec une moyenne plus petite sous-estime au plus d'un facteur avg/built_avg
+                drift = max(1.0, avg_length / built_avg) * (1 + 1e-9)
+                heads.append([factor, ids, tfs, size, order, weights, drift, 0])
+                start = size
+            for doc_id, tf in zip(itertools.islice(ids, start, None), itertools.islice(tfs, start, None)):
+                if names[doc_id] is None:
+                    continue
+                norm = k1 * (1 - b + b * lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + factor * tf / (tf + norm)
+
+        def head_scores(doc_id):
+            norm = k1 * (1 - b + b * lengths[doc_id] / avg_length)
+            total = 0.0
+            for factor, ids, tfs, size, *_ in heads:
+                i = bisect.bisect_left(ids, doc_id, 0, size)
+                if i < size and ids[i] == doc_id:
+                    tf = tfs[i]
+                    total += factor * tf / (tf + norm)
+            return total
+
+        # Tas (score, numéro) des `limit` meilleurs films, le moins bon en tête
+        best = []
+        for doc_id, score in scores.items():
+            item = (score + head_scores(doc_id), doc_id)
+            if len(best) < limit:
+                heapq.heappush(best, item)
+            elif item[0] > best[0][0]:
+                heapq.heapreplace(best, item)
+        seen = set(scores)
+        bounds = [head[0] * head[5][0] * head[6] if head[4] else 0.0 for head in heads]
+        while heads:
+            threshold = best[0][0] if len(best) >= limit else 0.0
+            total = sum(bounds)
+            if total <= threshold:
+                # Aucun film non lu ne peut plus entrer dans le classement
+                break
+            position = max(range(len(heads)), key=bounds.__getitem__)
+            others = total - bounds[position]
+            runner_up = max((bound for i, bound in enumerate(bounds) if i != position), default=0.0)
+            head = heads[position]
+            factor, _, _, _, order, weights, drift, cursor = head
+            # Lit la liste la plus prometteuse tant qu'elle le reste
+            while cursor < len(order):
+                bound = factor * weights[cursor] * drift
+                if bound < runner_up or bound + others <= threshold:
+                    break
+                doc_id = order[cursor]
+                cursor += 1
+                if doc_id in seen or names[doc_id] is None:
+                    continue
+                seen.add(doc_id)
+                score = head_scores(doc_id)
+                if len(best) < limit:
+                    heapq.heappush(best, (score, doc_id))
+                elif score > best[0][0]:
+                    heapq.heapreplace(best, (score, doc_id))
+                if len(best) >= limit:
+                    threshold = best[0][0]
+            head[7] = cursor
+            bounds[position] = factor * weights[cursor] * drift if cursor < len(order) else 0.0
+        best.sort(key=lambda item: (-item[0], item[1]))
+        return [(names[doc_id], score) for score, doc_id in best]
+
+    def save(self, path):
+        """Enregistre l'index dans un fichier (écriture atomique)."""
+        if len(self._names) != len(self._doc_of):
+            self._compact()
+        data = (
+            self.FORMAT_VERSION,
+            self._names,
+            self._lengths.tobytes(),
+            self._checksums.tobytes(),
+            {token: (ids.tobytes(), tfs.tobytes()) for token, (ids, tfs) in self._postings.items()},
+        )
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            marshal.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _restore(self, data):
+        version, names, lengths, checksums, postings = data
+        if version != self.FORMAT_VERSION:
+            return
+        self._names = names
+        self._doc_of = {name: doc_id for doc_id, name in enumerate(names)}
+        self._alive = array("B", [1]) * len(names)
+        self._lengths = array("I", lengths)
+        self._checksums = array("I", checksums)
+        self._total_length = sum(self._lengths)
+        self._postings = {
+            token: (array("I", ids), array("I", tfs)) for token, (ids, tfs) in postings.items()
+        }
+
+    @classmethod
+    def load_or_build(cls, path, films):
+        """Charge l'index enregistré et le met à jour pour `films` (ou le construit s'il manque)."""
+        index = cls()
+        try:
+            with open(path, 'rb') as f:
+                index._restore(marshal.load(f))
+        except (OSError, EOFError, ValueError, TypeError):
+            index = cls()
+        for name in [name for name in index._doc_of if name not in films]:
+            index.remove(name)
+        for name, film_info in films.items():
+            doc_id = index._doc_of.get(name)
+            if doc_id is None or index._checksums[doc_id] != _document_checksum(name, film_info):
+                index.add(name, film_info)
+        return index
+
+
+class SimilarityIndex:
+    """Recherche des films proches d'un film donné (/similar).
+
+    Le score combine la similarité cosinus des genres (vecteurs binaires
+    sur GENRES) et une similarité TF-IDF calculée avec les postings de
+    l'index de recherche. Les vecteurs de genres sont rangés dans une
+    matrice NumPy indexée par les numéros de l'index de recherche ; comme
+    un film modifié y reçoit un nouveau numéro, la matrice n'est complétée
+    que pour les nouveaux numéros (et reconstruite après un compactage).
+    """
+
+    GENRE_WEIGHT = 0.5
+
+    def __init__(self, search_index):
+        self.search_index = search_index
+        self._genres = np.zeros((0, len(GENRES)), dtype=np.float32)
+        self._rows = 0
+        self._generation = search_index.generation
+
+    def _sync(self, films):
+        index = self.search_index
+        if self._generation != index.generation:
+            self._rows = 0
+            self._generation = index.generation
+        n = len(index._names)
+        if n > len(self._genres):
+            grown = np.zeros((max(n, 2 * len(self._genres)), len(GENRES)), dtype=np.float32)
+            grown[:self._rows] = self._genres[:self._rows]
+            self._genres = grown
+        for doc_id in range(self._rows, n):
+            row = self._genres[doc_id]
+            row[:] = 0
+            name = index._names[doc_id]
+            if name is None:
+                continue
+            mask = films[name].mask
+            for bit in range(len(GENRES)):
+                if mask >> bit & 1:
+                    row[bit] = 1
+            norm = np.sqrt(row.sum())
+            if norm:
+                row /= norm
+        self._rows = n
+
+    def similar(self, name, films, limit=10):
+        """Retourne au plus `limit` paires (titre, score) des films les plus proches de `name`."""
+        index = self.search_index
+        self._sync(films)
+        query = index._doc_of.get(name)
+        if query is None:
+            return []
+        n = len(index._names)
+        alive = np.frombuffer(index._alive, dtype=np.uint8)[:n].astype(bool)
+        alive[query] = False
+
+        genre_scores = self._genres[:n] @ self._genres[query]
+
+        text_scores = np.zeros(n, dtype=np.float32)
+        for token, tf in index.term_counts(name, films[name]).items():
+            postings = index._postings.get(token)
+            if postings is None:
+                continue
+            ids = np.array(postings[0], dtype=np.int64)
+            tfs = np.array(postings[1], dtype=np.float32)
+            idf = index.idf(len(ids))
+            # Un film n'apparaît qu'une fois dans les postings d'un mot : pas de doublons dans `ids`
+            text_scores[ids] += (idf * idf * tf) * tfs
+        lengths = np.array(index._lengths, dtype=np.float32)
+        text_scores /= np.sqrt(np.maximum(lengths, 1))
+        best_text = text_scores[alive].max(initial=0)
+        if best_text > 0:
+            text_scores /= best_text
+
+        scores = self.GENRE_WEIGHT * genre_scores + (1 - self.GENRE_WEIGHT) * text_scores
+        scores[~alive] = -1
+        k = min(limit, int(alive.sum()))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(index._names[doc_id], float(scores[doc_id])) for doc_id in top if scores[doc_id] > 0]
+
+
+class LRUCache:
+    """Petit cache LRU à taille bornée basé sur un OrderedDict."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key]
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+
+class GenreCompleter:
+    """Autocomplétion des genres, y compris dans une liste séparée par des virgules.
+
+    Les genres sont normalisés une fois pour toutes (« comedie » trouve
+    « Comédie »). Les genres déjà saisis sont écartés, les suggestions
+    commençant par la saisie passent en premier, puis les genres les plus
+    fréquents du catalogue. Les listes de suggestions sont mises en cache.
+    """
+
+    def __init__(self, genres, cache_size=1024):
+        self._genres = [(normalize_title(g), g) for g in genres]
+        self._cache = LRUCache(cache_size)
+
+    def complete(self, current, genre_counts=None, multiple=True, limit=25):
+        """Retourne les `app_commands.Choice` pour la saisie `current`."""
+        genre_counts = genre_counts or {}
+        if multiple:
+            parts = tuple(s.strip() for s in current.split(','))
+        else:
+            parts = (current.strip(),)
+        counts = tuple(genre_counts.get(g, 0) for _, g in self._genres)
+        key = (parts, counts)
+        choices = self._cache.get(key)
+        if choices is not None:
+            return choices
+
+        query = normalize_title(parts[-1])
+        already_chosen = {normalize_title(p) for p in parts[:-1]}
+        ranked = []
+        for position, ((norm, g), count) in enumerate(zip(self._genres, counts)):
+            if norm in already_chosen:
+                continue
+            where = norm.find(query)
+            if where == -1:
+                continue
+            ranked.append((where != 0, -count, position, g))
+        ranked.sort()
+
+        choices = []
+        for _, _, _, g in ranked[:limit]:
+            suggested_value = ", ".join(parts[:-1] + (g,))
+            if len(suggested_value) > 100:
+                # Limite de Discord pour le nom et la valeur d'une suggestion
+                continue
+            choices.append(app_commands.Choice(name=suggested_value, value=suggested_value))
+        self._cache.put(key, choices)
+        return choices
+
+
+genre_completer = GenreCompleter(GENRES)
+
+
+class CatalogWriter:
+    """Écrit les mutations du catalogue hors de la boucle d'événements.
+
+    Les mutations reçues pendant `delay` secondes sont regroupées en un seul
+    appel à `storage.apply`, exécuté dans un thread. Un verrou asyncio
+    sérialise les écritures. Hors boucle d'événements (scripts, import),
+    l'écriture est faite immédiatement.
+
+    Les données passées au thread sont une copie faite par `snapshot`, par
+    défaut `storage.snapshot` s'il existe (qui retourne None quand seules
+    les mutations sont écrites), sinon une copie superficielle. Après une
+    erreur d'écriture, les mutations sont gardées et l'écriture est
+    retentée avec un délai croissant.
+    """
+
+    def __init__(self, storage, delay=WRITE_COALESCE_SECONDS, snapshot=None):
+        self.storage = storage
+        self.delay = delay
+        self._snapshot = snapshot or getattr(storage, "snapshot", dict)
+        self._pending = []
+        self._films = None
+        self._lock = None
+        self._flush_task = None
+        self._in_flight = 0
+        # Nombre d'écritures échouées d'affilée
+        self._failures = 0
+
+    @property
+    def busy(self):
+        """Indique si des mutations sont en attente ou en cours d'écriture."""
+        return bool(self._pending) or self._in_flight > 0
+
+    def submit(self, ops, films):
+        self._pending.extend(ops)
+        self._films = films
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush_sync()
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # Boucle tant que des mutations arrivent pendant une écriture en cours
+        while self._pending:
+            if self._failures:
+                await asyncio.sleep(retry_delay(self._failures - 1))
+            else:
+                await asyncio.sleep(self.delay)
+            await self.flush()
+
+    async def flush(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._pending:
+                return
+            ops, self._pending = self._pending, []
+            self._in_flight += 1
+            started = time.perf_counter()
+            try:
+                # Copie : la boucle peut continuer à modifier le catalogue pendant l'écriture
+                snapshot = self._snapshot(self._films)
+                await asyncio.to_thread(self._write, ops, snapshot)
+                metrics.observe("writer", "storage_write", time.perf_counter() - started)
+            except Exception as e:
+                self._write_failed(ops, e)
+            else:
+                self._failures = 0
+            finally:
+                self._in_flight -= 1
+
+    def flush_sync(self):
+        """Écrit immédiatement les mutations en attente (hors boucle d'événements)."""
+        if not self._pending:
+            return
+        ops, self._pending = self._pending, []
+        try:
+            self._write(ops, self._snapshot(self._films))
+        except Exception as e:
+            self._write_failed(ops, e)
+        else:
+            self._failures = 0
+
+    def _write_failed(self, ops, error):
+        # Quelle que soit l'erreur (disque plein, base verrouillée, bogue), les mutations
+        # sont remises en tête de file pour la prochaine tentative plutôt que perdues
+        self._failures += 1
+        print(f"Erreur lors de l'enregistrement des films ({type(error).__name__}) : {error}")
+        self._pending[:0] = ops
+
+    def _write(self, ops, snapshot):
+        try:
+            self.storage.apply(ops, snapshot)
+        except sqlite3.OperationalError:
+            raise
+        except sqlite3.Error:
+            # Une mutation refusée par la base (contrainte, valeur invalide) annule tout le lot : les
+            # mutations sont réécrites une à une pour n'écarter que celles qui sont refusées
+            for op in ops:
+                try:
+                    self.storage.apply([op], snapshot)
+                except sqlite3.OperationalError:
+                    raise
+                except sqlite3.Error as e:
+                    print(f"Mutation refusée par la base, non enregistrée ({op[0]} « {op[1]} ») : {e}")
+
+
+class JsonDocumentStorage:
+    """Document JSON réécrit en entier à chaque enregistrement.
+
+    Sert aux données des membres d'un serveur (listes de films et sondages
+    ouverts) et au cache des métadonnées des films.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def apply(self, ops, data):
+        # Comme JsonStorage : le fichier entier est réécrit à partir de l'instantané
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(data, separators=(",", ":")))
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        pass
+
+
+class Poll:
+    """Sondage /poll : films candidats et vote de chaque membre (un seul vote, modifiable)."""
+
+    __slots__ = ("poll_id", "candidates", "author_id", "message_id", "votes", "counts")
+
+    def __init__(self, poll_id, candidates, author_id, message_id=None, votes=None):
+        self.poll_id = poll_id
+        self.candidates = list(candidates)
+        self.author_id = author_id
+        self.message_id = message_id
+        self.votes = {}
+        self.counts = [0] * len(self.candidates)
+        for user_id, index in (votes or {}).items():
+            if 0 <= index < len(self.candidates):
+                self.votes[int(user_id)] = index
+                self.counts[index] += 1
+
+    def vote(self, user_id, index):
+        """Enregistre le vote d'un membre ; retourne False s'il avait déjà voté pour ce film."""
+        previous = self.votes.get(user_id)
+        if previous == index:
+            return False
+        if previous is not None:
+            self.counts[previous] -= 1
+        self.votes[user_id] = index
+        self.counts[index] += 1
+        return True
+
+    def winners(self):
+        """Retourne les films ayant reçu le plus de votes (plusieurs en cas d'égalité)."""
+        best = max(self.counts, default=0)
+        if best == 0:
+            return []
+        return [name for name, count in zip(self.candidates, self.counts) if count == best]
+
+    def to_dict(self):
+        return {
+            "candidates": self.candidates,
+            "author": self.author_id,
+            "message": self.message_id,
+            "votes": {str(user_id): index for user_id, index in self.votes.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, poll_id, data):
+        return cls(poll_id, data.get("candidates", []), data.get("author"), data.get("message"), data.get("votes"))
+
+
+class MemberData:
+    """Listes de films des membres (« à voir » et « vus ») et sondages /poll ouverts d'un serveur.
+
+    Tout est tenu en mémoire. Chaque modification (un vote, un film ajouté à
+    une liste) est signalée à un `CatalogWriter`, qui regroupe celles reçues
+    pendant MEMBER_DATA_FLUSH_SECONDS secondes en une seule écriture du
+    fichier, dans un thread : un vote massif ne provoque pas une écriture par clic.
+    """
+
+    KINDS = ("watchlist", "seen")
+
+    def __init__(self, storage, delay=MEMBER_DATA_FLUSH_SECONDS):
+        self.storage = storage
+        self.writer = CatalogWriter(storage, delay, snapshot=MemberData.to_dict)
+        data = storage.load()
+        # Par liste : {id du membre: {nom du film: None}} (dictionnaire ordonné utilisé comme ensemble)
+        self.lists = {
+            kind: {int(user_id): dict.fromkeys(names) for user_id, names in data.get(kind, {}).items()}
+            for kind in self.KINDS
+        }
+        self.polls = {poll_id: Poll.from_dict(poll_id, poll) for poll_id, poll in data.get("polls", {}).items()}
+
+    def to_dict(self):
+        data = {
+            kind: {str(user_id): list(names) for user_id, names in users.items() if names}
+            for kind, users in self.lists.items()
+        }
+        data["polls"] = {poll_id: poll.to_dict() for poll_id, poll in self.polls.items()}
+        return data
+
+    def _changed(self, op):
+        self.writer.submit([op], self)
+
+    def names(self, kind, user_id):
+        return list(self.lists[kind].get(user_id, ()))
+
+    def add(self, kind, user_id, name):
+        """Ajoute un film à une liste d'un membre ; retourne False s'il y était déjà."""
+        names = self.lists[kind].setdefault(user_id, {})
+        if name in names:
+            return False
+        names[name] = None
+        self._changed((kind, user_id))
+        return True
+
+    def remove(self, kind, user_id, name):
+        """Retire un film d'une liste d'un membre ; retourne False s'il n'y était pas."""
+        names = self.lists[kind].get(user_id)
+        if not names or name not in names:
+            return False
+        del names[name]
+        self._changed((kind, user_id))
+        return True
+
+    def mark_seen(self, user_id, name):
+        """Passe un film de la liste « à voir » d'un membre à sa liste « vus »."""
+        self.remove("watchlist", user_id, name)
+        return self.add("seen", user_id, name)
+
+    def rename(self, old_name, new_name):
+        """Renomme un film dans les listes de tous les membres (en gardant sa place)."""
+        for users in self.lists.values():
+            for user_id, names in users.items():
+                if old_name in names:
+                    users[user_id] = {new_name if n == old_name else n: None for n in names}
+                    self._changed(("rename", old_name))
+
+    def forget(self, name):
+        """Retire un film supprimé des listes de tous les membres."""
+        for users in self.lists.values():
+            for names in users.values():
+                if name in names:
+                    del names[name]
+                    self._changed(("forget", name))
+
+    def open_poll(self, poll):
+        self.polls[poll.poll_id] = poll
+        self._changed(("poll", poll.poll_id))
+
+    def vote(self, poll, user_id, index):
+        if poll.vote(user_id, index):
+            self._changed(("vote", poll.poll_id))
+
+    def close_poll(self, poll_id):
+        if self.polls.pop(poll_id, None) is not None:
+            self._changed(("close", poll_id))
+
+
+class OpenPollIndex:
+    """Index des sondages /poll ouverts de tous les serveurs.
+
+    Chaque entrée est {id du sondage: [id du serveur, id du message, films
+    candidats]} : de quoi réenregistrer les boutons (`PollView`) de tous les
+    sondages au démarrage, sans charger les catalogues des serveurs. Les
+    écritures sont regroupées par un `CatalogWriter`. Si le fichier n'existe
+    pas encore, l'index est reconstruit une fois à partir des données des
+    membres de chaque serveur.
+    """
+
+    def __init__(self, path, delay=MEMBER_DATA_FLUSH_SECONDS):
+        self.polls = {}
+        self.loaded = False
+        self.writer = CatalogWriter(JsonDocumentStorage(path), delay)
+
+    async def load(self):
+        """Lit l'index dans un thread (une seule fois)."""
+        if self.loaded:
+            return
+        polls, rebuilt = await asyncio.to_thread(self._read)
+        # Les sondages ouverts pendant la lecture sont gardés
+        self.polls = {**polls, **self.polls}
+        self.loaded = True
+        if rebuilt:
+            self.writer.submit([("rebuild", None)], self.polls)
+
+    def _read(self):
+        storage = self.writer.storage
+        if not os.path.exists(storage.path):
+            return self._rebuild(), True
+        polls = {
+            poll_id: entry for poll_id, entry in storage.load().items()
+            if isinstance(entry, list) and len(entry) == 3
+        }
+        return polls, False
+
+    @staticmethod
+    def _rebuild():
+        # Sondages ouverts lus dans les fichiers *.members.json de chaque serveur
+        directories = []
+        if LEGACY_GUILD_ID:
+            directories.append((int(LEGACY_GUILD_ID), os.path.dirname(FILMS_FILE) or "."))
+        if os.path.isdir(FILMS_DIR):
+            directories.extend(
+                (int(entry), os.path.join(FILMS_DIR, entry)) for entry in os.listdir(FILMS_DIR) if entry.isdigit()
+            )
+        polls = {}
+        for guild_id, directory in directories:
+            for entry in os.scandir(directory):
+                if not entry.name.endswith(".members.json"):
+                    continue
+                for poll_id, poll in JsonDocumentStorage(entry.path).load().get("polls", {}).items():
+                    if poll.get("message") is not None:
+                        polls[poll_id] = [guild_id, poll["message"], poll.get("candidates", [])]
+        return polls
+
+    def add(self, guild_id, poll):
+        self.polls[poll.poll_id] = [guild_id, poll.message_id, list(poll.candidates)]
+        self.writer.submit([("poll", poll.poll_id)], self.polls)
+
+    def remove(self, poll_id):
+        if self.polls.pop(poll_id, None) is not None:
+            self.writer.submit([("close", poll_id)], self.polls)
+
+    def close(self):
+        self.writer.flush_sync()
+
+
+class LinkStatus:
+    """Résultat de la vérification d'un lien."""
+
+    __slots__ = ("state", "checked", "etag", "last_modified", "failures")
+
+    def __init__(self, state, checked, etag=None, last_modified=None, failures=0):
+        self.state = state
+        self.checked = checked
+        self.etag = etag
+        self.last_modified = last_modified
+        self.failures = failures
+
+    def to_list(self):
+        return [self.state, self.checked, self.etag, self.last_modified, self.failures]
+
+
+class LinkHealth:
+    """Résultats des vérifications des liens d'un catalogue, par URL."""
+
+    def __init__(self, statuses=None):
+        self.statuses = statuses or {}
+
+    def state(self, link):
+        status = self.statuses.get(link)
+        return None if status is None else status.state
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return cls()
+        return cls({url: LinkStatus(*values) for url, values in data.items()})
+
+    def save(self, path):
+        """Enregistre les résultats (écriture atomique, format compact)."""
+        data = {url: status.to_list() for url, status in self.statuses.items()}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(data, separators=(",", ":")))
+        os.replace(tmp_path, path)
+
+
+def is_checkable_link(link):
+    return link.startswith(("http://", "https://"))
+
+
+def retry_delay(attempt, retry_after=None, backoff=1.0, max_delay=60):
+    """Délai (en secondes) avant une nouvelle tentative : exponentiel avec variation aléatoire, au moins Retry-After."""
+    delay = backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+    if retry_after is not None and retry_after.isdigit():
+        delay = max(delay, int(retry_after))
+    return min(delay, max_delay)
+
+
+def _interleave_hosts(urls):
+    """Ordonne les URL en alternant les sites, pour ne pas bloquer tout le pool sur un seul site."""
+    by_host = {}
+    for url in urls:
+        by_host.setdefault(url.split("/", 3)[2].lower(), []).append(url)
+    queues = list(by_host.values())
+    return [url for group in itertools.zip_longest(*queues) for url in group if url is not None]
+
+
+class LinkChecker:
+    """Vérifie des liens par requêtes HEAD concurrentes.
+
+    `workers` tâches consomment une file d'URL, ordonnée en alternant les
+    sites. Une seule session aiohttp réutilise les connexions et limite les
+    connexions simultanées à `per_host` par site. Les ETag et Last-Modified
+    obtenus précédemment sont renvoyés (requête conditionnelle : un 304
+    confirme le lien sans le retélécharger). Les erreurs temporaires
+    (délai dépassé, connexion refusée, 408, 429, 5xx) sont réessayées avec
+    un délai exponentiel ; un 404, 410 ou autre erreur 4xx rend le lien mort.
+    """
+
+    def __init__(self, workers=LINK_CHECK_WORKERS, per_host=LINK_CHECK_PER_HOST,
+                 timeout=LINK_CHECK_TIMEOUT, retries=LINK_CHECK_RETRIES, backoff=1.0):
+        self.workers = workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    async def check(self, urls, statuses):
+        """Vérifie les URL et enregistre un LinkStatus par URL dans le dictionnaire `statuses`."""
+        queue = deque(_interleave_hosts(urls))
+        if not queue:
+            return
+        connector = aiohttp.TCPConnector(limit=self.workers, limit_per_host=self.per_host, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"User-Agent": "bot-discord-movie (vérification des liens)"},
+        ) as session:
+            await asyncio.gather(*(
+                self._worker(session, queue, statuses) for _ in range(min(self.workers, len(queue)))
+            ))
+
+    async def _worker(self, session, queue, statuses):
+        while queue:
+            url = queue.popleft()
+            statuses[url] = await self.check_one(session, url, statuses.get(url))
+
+    async def check_one(self, session, url, previous=None):
+        """Vérifie une URL et retourne son LinkStatus."""
+        headers = {}
+        if previous is not None and previous.state == "ok":
+            if previous.etag:
+                headers["If-None-Match"] = previous.etag
+            if previous.last_modified:
+                headers["If-Modified-Since"] = previous.last_modified
+        method = "HEAD"
+        attempt = 0
+        while True:
+            retry_after = None
+            try:
+                async with session.request(method, url, headers=headers, allow_redirects=True) as response:
+                    if response.status in (405, 501) and method == "HEAD":
+                        # Site qui refuse HEAD : on retente tout de suite en GET (sans lire le corps)
+                        method = "GET"
+                        continue
+                    if response.status == 304:
+                        # Seule une requête conditionnelle (lien déjà valide) peut confirmer le lien par un 304 ;
+                        # sans elle, la réponse est anormale et traitée comme une erreur temporaire
+                        if headers:
+                            return LinkStatus("ok", time.time(), previous.etag, previous.last_modified)
+                    elif response.status < 400:
+                        return LinkStatus(
+                            "ok", time.time(),
+                            response.headers.get("ETag"), response.headers.get("Last-Modified")
+                        )
+                    elif response.status not in (408, 429) and response.status < 500:
+                        return LinkStatus("dead", time.time())
+                    else:
+                        retry_after = response.headers.get("Retry-After")
+            except aiohttp.InvalidURL:
+                return LinkStatus("dead", time.time())
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+            if attempt >= self.retries:
+                break
+            await asyncio.sleep(retry_delay(attempt, retry_after, self.backoff))
+            attempt += 1
+        failures = (previous.failures if previous is not None else 0) + 1
+        return LinkStatus("dead" if failures >= LINK_CHECK_MAX_FAILURES else "error", time.time(), failures=failures)
+
+
+# Genres des fournisseurs de métadonnées (noms anglais ou variantes) ramenés à GENRES
+GENRE_ALIASES = {
+    "adventure": "Aventure", "comedy": "Comédie", "documentary": "Documentaire", "drama": "Drame",
+    "family": "Familial", "fantasy": "Fantastique", "war": "Guerre", "history": "Histoire",
+    "horror": "Horreur", "mystery": "Mystère", "science fiction": "Science-fiction", "sci-fi": "Science-fiction",
+}
+
+
+def map_genre_names(names):
+    """Ramène des noms de genres (français ou anglais) aux genres de GENRES, sans doublon ; les autres sont ignorés."""
+    genres = []
+    for name in names:
+        genre = GENRES_BY_LOWER.get(name.lower()) or GENRE_ALIASES.get(name.lower())
+        if genre is not None and genre not in genres:
+            genres.append(genre)
+    return genres
+
+
+_TITLE_YEAR_RE = re.compile(r"^(.*\S)\s*\((\d{4})\)$")
+
+
+def split_title_year(title):
+    """Sépare l'année d'un titre de la forme « Titre (2010) » ; retourne (titre, année ou None)."""
+    match = _TITLE_YEAR_RE.match(title.strip())
+    if match is None:
+        return title.strip(), None
+    return match.group(1), int(match.group(2))
+
+
+class FilmMetadata:
+    """Métadonnées d'un film fournies par un fournisseur (genres déjà ramenés à GENRES)."""
+
+    __slots__ = ("description", "year", "poster", "genres")
+
+    def __init__(self, description=None, year=None, poster=None, genres=()):
+        self.description = description
+        self.year = year
+        self.poster = poster
+        self.genres = tuple(genres)
+
+    def to_list(self):
+        return [self.description, self.year, self.poster, list(self.genres)]
+
+
+class MetadataCache:
+    """Cache disque des métadonnées, par clé de titre (`title_key`).
+
+    Chaque entrée est [date de récupération, description, année, affiche,
+    genres], ou [date] pour un film introuvable chez le fournisseur. Une
+    entrée plus ancienne que `ttl` secondes (`miss_ttl` pour un film
+    introuvable) reste utilisable mais doit être redemandée. Les écritures
+    sont regroupées par un `CatalogWriter`.
+    """
+
+    def __init__(self, path, ttl=METADATA_TTL_DAYS * 86400, miss_ttl=METADATA_MISS_TTL_DAYS * 86400):
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.entries = {}
+        self.writer = CatalogWriter(JsonDocumentStorage(path), METADATA_CACHE_FLUSH_SECONDS)
+
+    def load(self):
+        data = self.writer.storage.load()
+        return {key: entry for key, entry in data.items() if isinstance(entry, list) and entry}
+
+    def lookup(self, key, now):
+        """Retourne (métadonnées ou None, True si l'entrée est à jour), ou None si le titre n'a jamais été demandé."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if len(entry) == 1:
+            return None, now - entry[0] < self.miss_ttl
+        return FilmMetadata(*entry[1:]), now - entry[0] < self.ttl
+
+    def put(self, key, metadata, now):
+        self.entries[key] = [now] if metadata is None else [now, *metadata.to_list()]
+        self.writer.submit([("put", key)], self.entries)
+
+    def close(self):
+        self.writer.flush_sync()
+
+
+class FixtureMetadataProvider:
+    """Fournisseur de métadonnées lisant un fichier JSON local (tests, utilisation hors ligne).
+
+    Le fichier a la forme {titre: {"description", "annee", "affiche", "genre"}} ;
+    les titres sont comparés par `title_key`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._by_key = None
+
+    def _load(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {
+            title_key(title): FilmMetadata(
+                info.get("description"), info.get("annee"), info.get("affiche"),
+                map_genre_names(info.get("genre", [])),
+            )
+            for title, info in data.items()
+        }
+
+    async def fetch_many(self, session, titles):
+        """Retourne {titre: FilmMetadata ou None si le titre est introuvable}."""
+        if self._by_key is None:
+            self._by_key = await asyncio.to_thread(self._load)
+        return {title: self._by_key.get(title_key(title)) for title in titles}
+
+
+class TmdbProvider:
+    """Adaptateur de l'API de TMDB (themoviedb.org).
+
+    TMDB n'a pas de recherche groupée : les titres d'un lot sont cherchés
+    par `workers` requêtes simultanées sur la session du lot. Un résultat
+    n'est retenu que si son titre (ou son titre original) a la même clé que
+    le titre cherché ; une année entre parenthèses en fin de titre restreint
+    la recherche. Les réponses 429 et 5xx sont réessayées avec un délai
+    exponentiel qui respecte Retry-After.
+    """
+
+    BASE_URL = "https://api.themoviedb.org/3"
+    POSTER_URL = "https://image.tmdb.org/t/p/w342"
+    # Genres de TMDB ramenés à GENRES (Musique et Téléfilm n'ont pas d'équivalent)
+    GENRE_IDS = {
+        28: "Action", 16: "Animation", 12: "Aventure", 35: "Comédie", 80: "Crime", 99: "Documentaire",
+        18: "Drame", 10751: "Familial", 14: "Fantastique", 10752: "Guerre", 36: "Histoire", 27: "Horreur",
+        9648: "Mystère", 10749: "Romance", 878: "Science-fiction", 53: "Thriller", 37: "Western",
+    }
+
+    def __init__(self, api_key, language="fr-FR", workers=METADATA_WORKERS, retries=LINK_CHECK_RETRIES,
+                 backoff=1.0, base_url=BASE_URL):
+        self.api_key = api_key
+        self.language = language
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+        self.base_url = base_url
+
+    def _auth(self):
+        """Retourne (en-têtes, paramètres) d'authentification."""
+        # Les jetons d'accès (API v4) passent dans l'en-tête, les clés de l'API v3 dans l'URL
+        if self.api_key.startswith("eyJ"):
+            return {"Authorization": f"Bearer {self.api_key}"}, {}
+        return {}, {"api_key": self.api_key}
+
+    async def fetch_many(self, session, titles):
+        """Retourne {titre: FilmMetadata ou None si le titre est introuvable}.
+
+        Les titres en erreur temporaire sont absents du résultat ; une clé
+        refusée interrompt le lot.
+        """
+        results = {}
+        refused = []
+        queue = deque(titles)
+
+        async def worker():
+            while queue:
+                title = queue.popleft()
+                try:
+                    results[title] = await self.search(session, title)
+                except aiohttp.ClientResponseError as e:
+                    if e.status in (401, 403):
+                        queue.clear()
+                        refused.append(e.status)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                    pass
+
+        await asyncio.gather(*(worker() for _ in range(min(self.workers, len(queue)))))
+        if refused:
+            # Sans l'URL de la requête, qui contient la clé
+            raise PermissionError(f"clé TMDB refusée (HTTP {refused[0]})")
+        return results
+
+    async def search(self, session, title):
+        """Cherche un film par titre et retourne ses FilmMetadata, ou None s'il est introuvable."""
+        query, year = split_title_year(title)
+        headers, params = self._auth()
+        params.update(query=query, language=self.language, include_adult="false")
+        if year is not None:
+            params["year"] = str(year)
+        attempt = 0
+        while True:
+            async with session.get(f"{self.base_url}/search/movie", params=params, headers=headers) as response:
+                if (response.status != 429 and response.status < 500) or attempt >= self.retries:
+                    response.raise_for_status()
+                    data = await response.json()
+                    break
+                retry_after = response.headers.get("Retry-After")
+            await asyncio.sleep(retry_delay(attempt, retry_after, self.backoff))
+            attempt += 1
+        key = title_key(query)
+        for result in data.get("results", []):
+            if key in (title_key(result.get("title") or ""), title_key(result.get("original_title") or "")):
+                return self._metadata(result)
+        return None
+
+    def _metadata(self, result):
+        release = result.get("release_date") or ""
+        poster = result.get("poster_path")
+        return FilmMetadata(
+            result.get("overview") or None,
+            int(release[:4]) if release[:4].isdigit() else None,
+            self.POSTER_URL + poster if poster else None,
+            list(dict.fromkeys(self.GENRE_IDS[g] for g in result.get("genre_ids", []) if g in self.GENRE_IDS)),
+        )
+
+
+def make_metadata_provider(name=METADATA_PROVIDER):
+    """Crée le fournisseur de métadonnées choisi (METADATA_PROVIDER), ou None s'il est désactivé."""
+    if name == "tmdb":
+        if not TMDB_API_KEY:
+            print("METADATA_PROVIDER vaut \"tmdb\" mais TMDB_API_KEY n'est pas défini : métadonnées désactivées.")
+            return None
+        return TmdbProvider(TMDB_API_KEY)
+    if name == "fixture":
+        return FixtureMetadataProvider(METADATA_FIXTURE_FILE)
+    if name:
+        print(f"Fournisseur de métadonnées inconnu : {name}")
+    return None
+
+
+class MetadataFetcher:
+    """Métadonnées des films : cache disque d'abord, fournisseur ensuite, par lots.
+
+    `cached` ne fait jamais attendre : il retourne ce que le cache contient
+    (même périmé) et programme en arrière-plan la demande d'un titre absent
+    ou périmé. `fetch` attend les métadonnées d'une liste de titres. Les
+    demandes en cours d'un même titre sont partagées (un seul futur par
+    clé), et les titres demandés pendant `delay` secondes sont envoyés
+    ensemble au fournisseur, par lots de `batch_size`. En cas d'erreur du
+    fournisseur, l'entrée du cache est conservée : le bot continue de
+    fonctionner hors ligne avec ce qu'il a déjà récupéré.
+    """
+
+    def __init__(self, provider, cache, batch_size=METADATA_BATCH_SIZE, delay=0.05, on_update=None):
+        self.provider = provider
+        self.cache = cache
+        self.batch_size = batch_size
+        self.delay = delay
+        # Appelé avec les titres dont les métadonnées viennent d'être récupérées
+        self.on_update = on_update
+        self.loaded = False
+        self._load_task = None
+        self._pending = {}
+        self._queue = {}
+        self._drain_task = None
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self.fetched = 0
+        self.errors = 0
+
+    @property
+    def enabled(self):
+        return self.provider is not None
+
+    async def load(self):
+        """Lit le cache disque dans un thread (une seule fois)."""
+        if self._load_task is None:
+            self._load_task = asyncio.ensure_future(asyncio.to_thread(self.cache.load))
+        entries = await self._load_task
+        if not self.loaded:
+            self.cache.entries = entries
+            self.loaded = True
+
+    def _lookup(self, name, now):
+        """Retourne (clé, métadonnées en cache ou None, True s'il faut les demander au fournisseur)."""
+        key = title_key(name)
+        found = self.cache.lookup(key, now)
+        if found is None:
+            return key, None, self.enabled
+        metadata, fresh = found
+        return key, metadata, self.enabled and not fresh
+
+    def cached(self, name):
+        """Retourne les métadonnées en cache d'un film (ou None) sans attendre le fournisseur."""
+        if not self.loaded:
+            return None
+        key, metadata, stale = self._lookup(name, time.time())
+        if stale:
+            self.misses += 1
+            self._request(key, name)
+        else:
+            self.hits += 1
+        return metadata
+
+    async def fetch(self, names):
+        """Retourne {nom: métadonnées ou None} ; seuls les titres absents du cache ou périmés sont demandés."""
+        await self.load()
+        now = time.time()
+        results = {}
+        waiting = {}
+        for name in names:
+            key, metadata, stale = self._lookup(name, now)
+            if stale:
+                self.misses += 1
+                waiting[name] = self._request(key, name)
+            else:
+                self.hits += 1
+                results[name] = metadata
+        if waiting:
+            await asyncio.gather(*set(waiting.values()))
+            for name, future in waiting.items():
+                results[name] = future.result()
+        return results
+
+    def _request(self, key, name):
+        future = self._pending.get(key)
+        if future is not None:
+            self.deduplicated += 1
+            return future
+        future = self._pending[key] = asyncio.get_running_loop().create_future()
+        self._queue[key] = name
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.create_task(self._drain())
+        return future
+
+    async def _drain(self):
+        try:
+            # Laisse aux demandes simultanées le temps d'arriver pour les envoyer dans le même lot
+            await asyncio.sleep(self.delay)
+            while self._queue:
+                async with aiohttp.ClientSession(
+                    timeout=aiohttp.ClientTimeout(total=LINK_CHECK_TIMEOUT),
+                    headers={"User-Agent": "bot-discord-movie (métadonnées)"},
+                ) as session:
+                    while self._queue:
+                        keys = list(itertools.islice(self._queue, self.batch_size))
+                        titles = [self._queue.pop(key) for key in keys]
+                        await self._fetch_batch(session, keys, titles)
+        except Exception as e:
+            # Les demandes restantes reçoivent ce que le cache contient, plutôt que d'attendre indéfiniment
+            print(f"Erreur lors de la récupération des métadonnées : {e}")
+            now = time.time()
+            for key, future in self._pending.items():
+                if not future.done():
+                    found = self.cache.lookup(key, now)
+                    future.set_result(None if found is None else found[0])
+            self._pending.clear()
+            self._queue.clear()
+
+    async def _fetch_batch(self, session, keys, titles):
+        try:
+            results = await self.provider.fetch_many(session, titles)
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError) as e:
+            print(f"Erreur du fournisseur de métadonnées : {e}")
+            self.errors += 1
+            results = {}
+        now = time.time()
+        for key, title in zip(keys, titles):
+            if title in results:
+                metadata = results[title]
+                self.cache.put(key, metadata, now)
+                self.fetched += 1
+            else:
+                # Pas de réponse pour ce titre : l'ancienne entrée est gardée et sera redemandée
+                found = self.cache.lookup(key, now)
+                metadata = None if found is None else found[0]
+            self._pending.pop(key).set_result(metadata)
+        if self.on_update is not None and results:
+            self.on_update([title for title in titles if title in results])
+
+    def prometheus(self):
+        """Retourne les compteurs au format texte de Prometheus."""
+        return "\n".join([
+            "# HELP bot_metadata_lookups_total Recherches de métadonnées, servies par le cache ou demandées au fournisseur.",
+            "# TYPE bot_metadata_lookups_total counter",
+            f'bot_metadata_lookups_total{{result="hit"}} {self.hits}',
+            f'bot_metadata_lookups_total{{result="miss"}} {self.misses}',
+            "# HELP bot_metadata_deduplicated_total Demandes jointes à une demande du même titre déjà en cours.",
+            "# TYPE bot_metadata_deduplicated_total counter",
+            f"bot_metadata_deduplicated_total {self.deduplicated}",
+            "# HELP bot_metadata_fetched_total Titres obtenus auprès du fournisseur.",
+            "# TYPE bot_metadata_fetched_total counter",
+            f"bot_metadata_fetched_total {self.fetched}",
+            "# HELP bot_metadata_errors_total Lots en erreur chez le fournisseur.",
+            "# TYPE bot_metadata_errors_total counter",
+            f"bot_metadata_errors_total {self.errors}",
+        ]) + "\n"
+
+    def close(self):
+        self.cache.close()
+
+
+def enrichment_ops(films, results, replace_genres=False):
+    """Retourne les mutations qui complètent les films avec leurs métadonnées.
+
+    Une description n'est remplie que si le film n'en a pas ; les genres du
+    fournisseur sont utilisés si le film n'a aucun genre de GENRES, ou
+    remplacent ceux du film si `replace_genres`. Un film déjà complet ne
+    produit aucune mutation.
+    """
+    ops = []
+    for name, metadata in results.items():
+        info = films.get(name)
+        if metadata is None or info is None:
+            continue
+        description = info.description or metadata.description
+        genres = info.genres
+        if metadata.genres and (replace_genres or info.mask == 0):
+            genres = list(metadata.genres)
+            if not replace_genres and info.other_genres:
+                genres.extend(info.other_genres)
+        if description != info.description or set(genres) != set(info.genres):
+            ops.append(("put", name, {
+                "lien": info.link,
+                "genre": genres,
+                "description": description or "Aucune description.",
+            }))
+    return ops
+
+
+def film_checksum(name, film_info):
+    """Empreinte d'un film ; la somme des empreintes (modulo 2**64) identifie le contenu d'un catalogue."""
+    text = "\x1e".join((name, film_info["lien"], "\x1f".join(film_info["genre"]), film_info["description"]))
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def catalog_checksum(films):
+    return sum(film_checksum(name, info) for name, info in films.items()) % 2 ** 64
+
+
+class ChangeFeed:
+    """Flux de modifications versionné d'un catalogue, suivi par d'autres processus (`CatalogReplica`).
+
+    Deux fichiers à côté du catalogue :
+    - `<catalogue>.feed.jsonl`, journal dont la première ligne est
+      {"base": V, "checksum": E} puis une ligne par version publiée :
+      {"v": V, "ops": [["put", nom, infos] ou ["delete", nom], ...], "checksum": E} ;
+    - `<catalogue>.feed.json`, instantané {"version": V, "checksum": E, "films": {...}}
+      du catalogue à la version de base du journal.
+
+    Chaque appel à `FilmCatalog.apply` devient une version. `checksum` est
+    l'empreinte du catalogue après la version (`catalog_checksum`). Les
+    versions sont écrites par un `CatalogWriter`, hors de la boucle
+    d'événements. Quand le journal dépasse `compact_bytes`, ou quand le
+    catalogue chargé ne correspond pas à la dernière version publiée
+    (modifié par un autre processus, ou flux désactivé un temps), un nouvel
+    instantané est écrit et le journal recommence à sa version. Les
+    versions ne font que croître, d'un redémarrage à l'autre.
+    """
+
+    def __init__(self, path, compact_bytes=CHANGE_FEED_COMPACT_BYTES):
+        base = os.path.splitext(path)[0]
+        self.log_path = f"{base}.feed.jsonl"
+        self.snapshot_path = f"{base}.feed.json"
+        self.compact_bytes = compact_bytes
+        # Dernière version publiée et empreinte du catalogue à cette version (lues au premier chargement)
+        self.version = 0
+        self.checksum = None
+        self.log_size = 0
+        self._head_loaded = False
+        # Version de la dernière demande d'instantané pas encore écrite, 0 s'il n'y en a pas
+        self._rebase_version = 0
+        self.writer = CatalogWriter(self, WRITE_COALESCE_SECONDS, snapshot=self._snapshot)
+
+    def load_head(self):
+        """Lit la dernière version publiée dans le journal (une seule fois)."""
+        if self._head_loaded:
+            return
+        try:
+            with open(self.log_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        version, checksum = 0, None
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            version = entry.get("base", entry.get("v"))
+            checksum = entry["checksum"]
+        if data and not data.endswith(b"\n"):
+            # Dernière ligne tronquée par un arrêt brutal : le journal sera réécrit
+            checksum = None
+        self.version, self.checksum, self.log_size = version, checksum, len(data)
+        self._head_loaded = True
+
+    def sync(self, checksum, films):
+        """Après un chargement du catalogue : écrit un nouvel instantané s'il ne correspond pas au flux."""
+        if checksum != self.checksum:
+            self.version += 1
+            self.checksum = checksum
+            self._rebase_version = self.version
+            self.writer.submit([(self.version, None, checksum)], films)
+
+    def publish(self, ops, checksum, films):
+        """Publie les mutations d'un appel à `FilmCatalog.apply` comme une nouvelle version."""
+        self.version += 1
+        self.checksum = checksum
+        self.writer.submit([(self.version, ops, checksum)], films)
+
+    def _snapshot(self, films):
+        # Copie des films seulement si un instantané doit être écrit
+        if self._rebase_version or self.log_size >= self.compact_bytes:
+            return dict(films)
+        return None
+
+    def apply(self, entries, films):
+        """Écrit des versions (appelé par le CatalogWriter, dans un thread)."""
+        version, _, checksum = entries[-1]
+        if films is not None:
+            # L'instantané est l'état après la dernière version : il remplace tout le journal
+            self._write_snapshot(films, version, checksum)
+            if self._rebase_version <= version:
+                self._rebase_version = 0
+            return
+        lines = [
+            json.dumps({"v": v, "ops": [list(op) for op in ops], "checksum": c}, default=film_json_default)
+            for v, ops, c in entries
+        ]
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            # Sans fsync : après un arrêt brutal, l'empreinte ne correspond plus et un instantané est réécrit
+            f.write("\n".join(lines) + "\n")
+            self.log_size = f.tell()
+
+    def _write_snapshot(self, films, version, checksum):
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": version, "checksum": checksum, "films": films}, f,
+                      separators=(",", ":"), default=film_json_default)
+        os.replace(tmp_path, self.snapshot_path)
+        # Le nouveau journal n'apparaît qu'une fois l'instantané en place
+        header = json.dumps({"base": version, "checksum": checksum}) + "\n"
+        tmp_path = f"{self.log_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(header)
+        os.replace(tmp_path, self.log_path)
+        self.log_size = len(header)
+
+    def close(self):
+        self.writer.flush_sync()
+
+
+class CatalogReplica:
+    """Copie en mémoire, en lecture seule, d'un catalogue tenu par un autre processus.
+
+    `poll` lit les versions ajoutées au journal du `ChangeFeed` depuis le
+    dernier appel et applique leurs mutations à `films`. Rattrapage : une
+    copie à la version N (par exemple restaurée par le processus après un
+    redémarrage, avec `films`, `version` et `checksum`) ne relit que les
+    versions suivantes, tant que le journal commence au plus tard à N. Sinon
+    (journal compacté ou recommencé depuis), ou si une version manque ou si
+    l'empreinte obtenue diffère de celle publiée, l'instantané est rechargé
+    puis les versions suivantes appliquées.
+    """
+
+    def __init__(self, path, films=None, version=0, checksum=None):
+        base = os.path.splitext(path)[0]
+        self.log_path = f"{base}.feed.jsonl"
+        self.snapshot_path = f"{base}.feed.json"
+        self.films = {} if films is None else films
+        self.version = version
+        self.checksum = catalog_checksum(self.films) if checksum is None else checksum
+        # Nombre de rechargements de l'instantané
+        self.resyncs = 0
+        self._needs_resync = False
+        self._file = None
+        self._inode = None
+        self._partial = b""
+
+    def _open_log(self):
+        """Ouvre le journal courant ; retourne (version de base, empreinte) lue dans son en-tête."""
+        self.close()
+        self._file = open(self.log_path, 'rb')
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._partial = b""
+        header = json.loads(self._file.readline())
+        return header["base"], header["checksum"]
+
+    def _resync(self):
+        with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.films = data["films"]
+        self.version = data["version"]
+        self.checksum = data["checksum"]
+        self.resyncs += 1
+        self._needs_resync = False
+        # Le journal a pu être remplacé depuis : on relit celui qui accompagne l'instantané
+        self._open_log()
+
+    def _read_entries(self):
+        data = self._partial + self._file.read()
+        lines = data.split(b"\n")
+        # Une ligne sans fin de ligne est en cours d'écriture : elle sera relue au prochain appel
+        self._partial = lines.pop()
+        return [json.loads(line) for line in lines if line]
+
+    def _apply(self, entry):
+        """Applique une version ; retourne False si l'empreinte obtenue diffère de celle publiée."""
+        checksum = self.checksum
+        for op in entry["ops"]:
+            name = op[1]
+            old_info = self.films.pop(name, None)
+            if old_info is not None:
+                checksum -= film_checksum(name, old_info)
+            if op[0] == "put":
+                self.films[name] = op[2]
+                checksum += film_checksum(name, op[2])
+        self.version = entry["v"]
+        self.checksum = checksum % 2 ** 64
+        return self.checksum == entry["checksum"]
+
+    def poll(self):
+        """Applique les versions publiées depuis le dernier appel ; retourne True si la copie a changé."""
+        try:
+            inode = os.stat(self.log_path).st_ino
+        except FileNotFoundError:
+            return False
+        before = (self.version, self.checksum, self.resyncs)
+        if inode != self._inode or self._needs_resync:
+            base, base_checksum = self._open_log()
+            if self._needs_resync or self.version < base or (self.version == base and self.checksum != base_checksum):
+                self._resync()
+        # Au plus deux passes : si une version manque encore juste après un rechargement, on réessaiera au prochain appel
+        for _ in range(2):
+            for entry in self._read_entries():
+                if entry["v"] <= self.version:
+                    continue
+                if entry["v"] != self.version + 1 or not self._apply(entry):
+                    # Version manquante ou copie divergente
+                    self._resync()
+                    break
+            else:
+                break
+        return (self.version, self.checksum, self.resyncs) != before
+
+    async def follow(self, interval=0.5, on_change=None):
+        """Suit le flux indéfiniment (lecture dans un thread) ; `on_change(copie)` après chaque changement."""
+        while True:
+            try:
+                changed = await asyncio.to_thread(self.poll)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Erreur de lecture du flux {self.log_path} : {e}")
+                # Repart de l'instantané au prochain passage
+                self._needs_resync = True
+                changed = False
+            if changed and on_change is not None:
+                on_change(self)
+            await asyncio.sleep(interval)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._inode = None
+
+
+class FilmCatalog:
+    """Catalogue de films résident en mémoire.
+
+    Le stockage n'est relu que s'il a été modifié par un autre processus
+    depuis le dernier chargement. Les mutations sont appliquées tout de
+    suite en mémoire ; leur écriture est regroupée par un `CatalogWriter`
+    et exécutée hors de la boucle d'événements.
+    """
+
+    def __init__(self, storage, change_feed=CHANGE_FEED_ENABLED):
+        self.storage = storage
+        self.writer = CatalogWriter(storage)
+        # Flux de modifications pour les copies en lecture (optionnel) et empreinte courante du catalogue
+        self.feed = ChangeFeed(storage.path) if change_feed else None
+        self.checksum = 0
+        self.films = {}
+        self.title_index = TitleIndex()
+        self.genre_index = GenreIndex()
+        self.stats = CatalogStats()
+        self.search_index = SearchIndex()
+        self.similarity_index = None
+        # Construit dans un thread à la première recherche d'un nom inexact (voir `resolve`)
+        self.name_resolver = None
+        self.search_index_path = f"{os.path.splitext(storage.path)[0]}.search"
+        self.history_path = f"{os.path.splitext(storage.path)[0]}.history.json"
+        self.history = None
+        self.picker = RandomPicker(self.genre_index, PickHistory())
+        self.members_path = f"{os.path.splitext(storage.path)[0]}.members.json"
+        self.members = None
+        self.links_path = f"{os.path.splitext(storage.path)[0]}.links.json"
+        self.link_health = None
+        # Bitmap (positions de GenreIndex) des films dont le lien est mort, évités par /random
+        self.dead_links = 0
+        self.checking_links = False
+        self._history_lock = asyncio.Lock()
+        self._by_lower = {}
+        # Pages de /list déjà rendues, clé : (genre, page, version)
+        self.list_pages = LRUCache(256)
+        # Rendus par film, clé : nom du film, valeur : {type de rendu: rendu} (voir `rendered`)
+        self.render_cache = LRUCache(RENDER_CACHE_SIZE)
+        self.version = 0
+        # Durée du dernier chargement (lecture du stockage et construction des index)
+        self.load_seconds = 0.0
+        self._loaded = False
+
+    @property
+    def busy(self):
+        """Indique si des écritures (catalogue ou données des membres) sont en attente."""
+        return (
+            self.writer.busy
+            or self.checking_links
+            or (self.members is not None and self.members.writer.busy)
+            or (self.feed is not None and self.feed.writer.busy)
+        )
+
+    def _needs_reload(self):
+        if not self._loaded:
+            return True
+        # Nos propres écritures en attente ou en cours ne doivent pas provoquer de rechargement
+        return not self.writer.busy and self.storage.has_external_changes()
+
+    def _load_state(self):
+        """Lit le stockage et construit les index (sans toucher à l'état courant)."""
+        started = time.perf_counter()
+        films = film_records(self.storage.load(), self.storage.path)
+        search_index = SearchIndex.load_or_build(self.search_index_path, films)
+        checksum = 0
+        if self.feed is not None:
+            self.feed.load_head()
+            checksum = catalog_checksum(films)
+        state = (films, TitleIndex(films), GenreIndex(films), CatalogStats(films), search_index, checksum)
+        return state, time.perf_counter() - started
+
+    def _install_state(self, loaded):
+        state, self.load_seconds = loaded
+        self.films, self.title_index, self.genre_index, self.stats, self.search_index, self.checksum = state
+        self.similarity_index = None
+        self.name_resolver = None
+        if self.history is None:
+            self.history = PickHistory.load(self.history_path)
+        if self.members is None:
+            self.members = MemberData(JsonDocumentStorage(self.members_path))
+        if self.link_health is None:
+            self.link_health = LinkHealth.load(self.links_path)
+        self.dead_links = 0
+        for name, info in self.films.items():
+            self._set_link_state(name, info, self.link_health.state(info.link))
+        self.picker = RandomPicker(self.genre_index, self.history)
+        self._by_lower = {name.lower(): name for name in self.films}
+        self.render_cache.clear()
+        if self.feed is not None:
+            self.feed.sync(self.checksum, self.films)
+        self._loaded = True
+        self.version += 1
+
+    def refresh(self):
+        """Recharge le catalogue uniquement si le stockage a changé sur le disque."""
+        if not self._needs_reload():
+            return False
+        self._install_state(self._load_state())
+        return True
+
+    async def refresh_async(self):
+        """Comme `refresh`, mais la lecture et l'indexation se font dans un thread."""
+        if not self._needs_reload():
+            return False
+        version = self.version
+        state = await asyncio.to_thread(self._load_state)
+        if self.version != version and self._loaded:
+            # Une mutation locale a eu lieu pendant la lecture : elle prime sur l'état relu
+            return False
+        self._install_state(state)
+        return True
+
+    def find(self, name):
+        """Retourne le nom exact d'un film à partir d'un nom sans tenir compte de la casse.
+
+        Ne relit pas le stockage : les commandes obtiennent le catalogue par
+        `get_catalog`, qui l'a déjà rafraîchi dans un thread.
+        """
+        return self._by_lower.get(name.lower())
+
+    async def _build_name_resolver(self):
+        names = list(self.films)
+        resolver = await asyncio.to_thread(NameResolver.build, names)
+        # Des films ont pu être ajoutés ou supprimés pendant la construction
+        built, current = set(names), self.films.keys()
+        for name in built - current:
+            resolver.remove(name)
+        for name in current - built:
+            resolver.add(name)
+        self.name_resolver = resolver
+
+    async def resolve(self, name):
+        """Comme `find`, mais accepte aussi un titre aux accents, à la ponctuation ou à l'article près.
+
+        Retourne (nom exact ou None, suggestions de titres proches si le film est introuvable).
+        """
+        found = self.find(name)
+        if found is not None:
+            return found, []
+        if self.name_resolver is None:
+            await self._build_name_resolver()
+        matches = self.name_resolver.exact(name)
+        if len(matches) == 1:
+            return matches[0], []
+        # Plusieurs films ont la même clé : on les propose tous
+        return None, matches or self.name_resolver.suggest(name)
+
+    def rendered(self, name, kind, build):
+        """Retourne le rendu `kind` d'un film, construit par `build(nom, infos)` au premier appel.
+
+        Les rendus d'un film sont invalidés par `apply` dès qu'il est modifié
+        ou supprimé ; les films les moins récemment affichés sont oubliés.
+        """
+        renders = self.render_cache.get(name)
+        if renders is None:
+            renders = {}
+            self.render_cache.put(name, renders)
+        value = renders.get(kind)
+        if value is None:
+            value = renders[kind] = build(name, self.films[name])
+        return value
+
+    def memory_per_film(self, sample=1000):
+        """Estime la mémoire moyenne d'un film (en octets) sur les `sample` premiers films."""
+        records = list(itertools.islice(self.films.values(), sample))
+        if not records:
+            return 0
+        return sum(record_size(record) for record in records) / len(records)
+
+    def has_name(self, name):
+        """Indique si un film porte ce nom, sans tenir compte de la casse (pour les traitements en lot)."""
+        return name.lower() in self._by_lower
+
+    def apply(self, ops):
+        """Applique des mutations ("put", nom, infos) / ("delete", nom) puis les enregistre.
+
+        Avec un flux de modifications, l'appel est publié comme une nouvelle version.
+        """
+        published = []
+        for op in ops:
+            if op[0] == "put":
+                _, name, info = op
+                info = FilmRecord.from_dict(info)
+                old_info = self.films.get(name)
+                if self.feed is not None:
+                    self.checksum += film_checksum(name, info)
+                    if old_info is not None:
+                        self.checksum -= film_checksum(name, old_info)
+                    published.append(("put", name, info))
+                if old_info is not None:
+                    self.stats.remove(old_info)
+                self.films[name] = info
+                self.render_cache.pop(name)
+                self.stats.add(info)
+                self.title_index.add(name)
+                if self.name_resolver is not None:
+                    self.name_resolver.add(name)
+                self.genre_index.add(name, info.mask)
+                if self.link_health is not None:
+                    self._set_link_state(name, info, self.link_health.state(info.link))
+                self.picker.add(name)
+                self.search_index.add(name, info)
+                self._by_lower[name.lower()] = name
+            elif op[0] == "delete":
+                _, name = op
+                old_info = self.films.pop(name, None)
+                if self.feed is not None:
+                    if old_info is not None:
+                        self.checksum -= film_checksum(name, old_info)
+                    published.append(("delete", name))
+                if old_info is not None:
+                    self.stats.remove(old_info)
+                self.render_cache.pop(name)
+                self.title_index.remove(name)
+                if self.name_resolver is not None:
+                    self.name_resolver.remove(name)
+                self.picker.remove(name)
+                generation = self.genre_index.generation
+                self.genre_index.remove(name)
+                if self.genre_index.generation != generation:
+                    self._index_slots()
+                self.picker.history.forget(name)
+                if self.members is not None:
+                    self.members.forget(name)
+                self.search_index.remove(name)
+                if self._by_lower.get(name.lower()) == name:
+                    del self._by_lower[name.lower()]
+            else:
+                raise ValueError(f"Opération inconnue : {op[0]}")
+        self.writer.submit(ops, self.films)
+        if self.feed is not None:
+            self.checksum %= 2 ** 64
+            self.feed.publish(published, self.checksum, self.films)
+        self.version += 1
+
+    async def pick_random(self, genres, weighted=False):
+        """Tire un film au hasard (voir `RandomPicker`) et enregistre l'historique dans un thread."""
+        name = self.picker.pick(genres, weighted, exclude=self.dead_links)
+        if name is not None:
+            history = self.picker.history
+            snapshot = PickHistory(history.recent.maxlen, history.recent, dict(history.counts))
+            async with self._history_lock:
+                try:
+                    await asyncio.to_thread(snapshot.save, self.history_path)
+                except OSError as e:
+                    print(f"Erreur lors de l'enregistrement de l'historique des tirages : {e}")
+        return name
+
+    def _index_slots(self):
+        """Reconstruit les structures indexées par les positions de `genre_index` après leur renumérotation."""
+        self.dead_links = 0
+        for name, info in self.films.items():
+            if info.link_state == "dead":
+                self.dead_links |= 1 << self.genre_index._slot_of[name]
+        self.picker = RandomPicker(self.genre_index, self.picker.history)
+
+    def _set_link_state(self, name, info, state):
+        info.link_state = state
+        bit = 1 << self.genre_index._slot_of[name]
+        if state == "dead":
+            self.dead_links |= bit
+        else:
+            self.dead_links &= ~bit
+
+    async def check_links(self, checker, max_age=0):
+        """Vérifie les liens non vérifiés depuis `max_age` secondes ; retourne (vérifiés, valides, morts).
+
+        Les résultats sont reportés sur les films (`FilmRecord.link_state`)
+        et enregistrés à côté du catalogue.
+        """
+        now = time.time()
+        statuses = self.link_health.statuses
+        links = {info.link for info in self.films.values() if is_checkable_link(info.link)}
+        stale = [
+            link for link in links
+            if link not in statuses or now - statuses[link].checked >= max_age
+        ]
+        self.checking_links = True
+        try:
+            await checker.check(stale, statuses)
+            # Les liens qui ne sont plus utilisés par aucun film sont oubliés
+            links = {info.link for info in self.films.values()}
+            for link in [link for link in statuses if link not in links]:
+                del statuses[link]
+            changed = False
+            for name, info in self.films.items():
+                state = self.link_health.state(info.link)
+                if info.link_state != state:
+                    self._set_link_state(name, info, state)
+                    self.render_cache.pop(name)
+                    changed = True
+            if changed:
+                self.list_pages.clear()
+            snapshot = LinkHealth(dict(statuses))
+            try:
+                await asyncio.to_thread(snapshot.save, self.links_path)
+            except OSError as e:
+                print(f"Erreur lors de l'enregistrement de l'état des liens : {e}")
+        finally:
+            self.checking_links = False
+        valid = sum(1 for link in stale if statuses.get(link) is not None and statuses[link].state == "ok")
+        dead = sum(1 for link in stale if statuses.get(link) is not None and statuses[link].state == "dead")
+        return len(stale), valid, dead
+
+    def similar(self, name, limit=10):
+        """Retourne les films les plus proches de `name` (nécessite NumPy)."""
+        if self.similarity_index is None or self.similarity_index.search_index is not self.search_index:
+            self.similarity_index = SimilarityIndex(self.search_index)
+        return self.similarity_index.similar(name, self.films, limit)
+
+    async def flush(self):
+        """Attend que toutes les mutations en attente soient écrites."""
+        await self.writer.flush()
+        if self.members is not None:
+            await self.members.writer.flush()
+        if self.feed is not None:
+            await self.feed.writer.flush()
+
+    def close(self):
+        """Écrit les mutations en attente et l'index de recherche, puis ferme le stockage."""
+        self.writer.flush_sync()
+        if self.members is not None:
+            self.members.writer.flush_sync()
+        if self.feed is not None:
+            self.feed.close()
+        if self._loaded:
+            try:
+                self.search_index.save(self.search_index_path)
+            except OSError as e:
+                print(f"Erreur lors de l'enregistrement de l'index de recherche : {e}")
+        self.storage.close()
+
+
+class CatalogRegistry:
+    """Catalogues par serveur, chargés à la première utilisation.
+
+    Chaque serveur a son propre stockage (FILMS_DIR/<id>/) et son propre
+    `CatalogWriter`, donc ses écritures ne bloquent pas celles des autres.
+    Au-delà de `maxsize` catalogues en mémoire, les moins récemment
+    utilisés sont déchargés, sauf s'ils ont encore des écritures en attente.
+    """
+
+    def __init__(self, maxsize=MAX_LOADED_GUILDS):
+        self.maxsize = maxsize
+        self._catalogs = OrderedDict()
+        # Fermetures en cours des catalogues déchargés (références gardées jusqu'à leur fin)
+        self._closing = set()
+
+    def __len__(self):
+        return len(self._catalogs)
+
+    def storage_paths(self, guild_id):
+        """Retourne (fichier JSON, base SQLite) du catalogue d'un serveur."""
+        if guild_id is None:
+            # Jamais le catalogue d'un serveur existant : n'importe qui peut écrire au bot en privé
+            raise ValueError("Les catalogues de films n'existent que sur les serveurs, pas en messages privés.")
+        if str(guild_id) == LEGACY_GUILD_ID:
+            return FILMS_FILE, FILMS_DB
+        shard_dir = os.path.join(FILMS_DIR, str(guild_id))
+        return os.path.join(shard_dir, FILMS_FILE), os.path.join(shard_dir, os.path.basename(FILMS_DB))
+
+    def get(self, guild_id):
+        """Retourne le catalogue d'un serveur (ValueError pour None : messages privés)."""
+        film_catalog = self._catalogs.get(guild_id)
+        if film_catalog is not None:
+            self._catalogs.move_to_end(guild_id)
+            return film_catalog
+        path, db_path = self.storage_paths(guild_id)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        film_catalog = FilmCatalog(make_storage(path, db_path))
+        self._catalogs[guild_id] = film_catalog
+        self._evict()
+        return film_catalog
+
+    def _evict(self):
+        # Le catalogue le plus récent (celui qu'on vient de demander) n'est jamais déchargé
+        for guild_id in list(self._catalogs)[:-1]:
+            if len(self._catalogs) <= self.maxsize:
+                break
+            film_catalog = self._catalogs[guild_id]
+            if film_catalog.busy:
+                continue
+            del self._catalogs[guild_id]
+            self._close_later(film_catalog)
+
+    def _close_later(self, film_catalog):
+        """Ferme un catalogue déchargé dans un thread : l'enregistrement de son index ne bloque pas la boucle."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Hors de la boucle d'événements (scripts) : fermeture immédiate
+            film_catalog.close()
+            return
+        task = asyncio.create_task(self._close(film_catalog))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    @staticmethod
+    async def _close(film_catalog):
+        try:
+            await asyncio.to_thread(film_catalog.close)
+        except Exception as e:
+            print(f"Erreur lors de la fermeture d'un catalogue déchargé : {e}")
+
+    def loaded(self):
+        """Retourne les paires (id du serveur, catalogue) des catalogues en mémoire."""
+        return list(self._catalogs.items())
+
+    def forget_renders(self, names):
+        """Oublie les rendus des films `names` dans tous les catalogues (leurs métadonnées ont changé)."""
+        for film_catalog in self._catalogs.values():
+            for name in names:
+                film_catalog.render_cache.pop(name)
+
+    def close_all(self):
+        """Écrit les mutations en attente et les index de tous les catalogues (à l'arrêt du bot)."""
+        for film_catalog in self._catalogs.values():
+            film_catalog.close()
+
+
+catalogs = CatalogRegistry()
+open_polls = OpenPollIndex(OPEN_POLLS_FILE)
+metadata_fetcher = MetadataFetcher(
+    make_metadata_provider(), MetadataCache(METADATA_CACHE_FILE), on_update=catalogs.forget_renders
+)
+
+
+async def get_catalog(interaction):
+    """Retourne le catalogue du serveur de l'interaction, à jour avec son stockage."""
+    with metrics.span("storage_read"):
+        film_catalog = catalogs.get(interaction.guild_id)
+        await film_catalog.refresh_async()
+    return film_catalog
+
+def parse_genres(text):
+    """Retourne les genres connus d'une liste séparée par des virgules (sans tenir compte de la casse)."""
+    with metrics.span("parse"):
+        return [
+            GENRES_BY_LOWER[g_raw.lower()]
+            for g_raw in (s.strip() for s in text.split(','))
+            if g_raw.lower() in GENRES_BY_LOWER
+        ]
+
+
+# --- Rendu des films ---
+
+def format_list_entry(nom, film_info):
+    """Formate la ligne d'un film dans /list."""
+    film_genres = film_info.get("genre", ["Non spécifié"])
+    lien = film_info.get("lien", "N/A")
+
+    entry = f"**{nom}** ({', '.join(film_genres)})"
+    if lien != "N/A":
+        entry += f" : [Lien]({lien})"
+        if film_info.link_state == "dead":
+            entry += " ⚠️ lien mort"
+    return entry
+
+
+def format_search_entry(nom, film_info):
+    """Formate le résultat d'un film dans /search : ligne de /list et début de la description."""
+    entry = format_list_entry(nom, film_info)
+    description = film_info.get("description", "Aucune description.")
+    if description != "Aucune description.":
+        if len(description) > 150:
+            description = description[:149] + "…"
+        entry += f"\n> {description}"
+    return entry
+
+
+def film_not_found_embed(nom, suggestions):
+    """Construit l'embed « Film introuvable », avec les titres proches s'il y en a."""
+    description = f"Le film **{nom}** n'est pas dans la liste."
+    if suggestions:
+        description += "\nVouliez-vous dire : " + ", ".join(f"**{s}**" for s in suggestions) + " ?"
+    return discord.Embed(
+        title="Film introuvable",
+        description=description,
+        color=discord.Color.red()
+    )
+
+
+def _with_metadata(nom, genres, description, metadata):
+    """Complète le titre, les genres et la description affichés d'un film avec ses métadonnées."""
+    title = nom
+    if metadata is None:
+        return title, genres, description
+    if metadata.year and str(metadata.year) not in nom:
+        title = f"{nom} ({metadata.year})"
+    if genres == ["Non spécifié"] and metadata.genres:
+        genres = list(metadata.genres)
+    if description == "Aucune description." and metadata.description:
+        description = metadata.description
+        if len(description) > 1024:
+            description = description[:1023] + "…"
+    return title, genres, description
+
+
+def build_info_embed(nom, film_info, metadata=None):
+    """Construit l'embed de /info d'un film (complété par ses métadonnées en cache s'il y en a)."""
+    lien = film_info.get("lien", "N/A")
+    title, genres, description = _with_metadata(
+        nom, film_info.get("genre", ["Non spécifié"]), film_info.get("description", "Aucune description."), metadata
+    )
+
+    embed = discord.Embed(
+        title=f"Informations sur : {title}",
+        color=discord.Color.gold()
+    )
+    embed.add_field(name="Genre(s)", value=", ".join(genres), inline=True)
+    if lien != "N/A":
+        value = f"[Cliquer ici]({lien})"
+        if film_info.link_state == "dead":
+            value += " ⚠️ lien mort"
+        embed.add_field(name="Lien", value=value, inline=True)
+    embed.add_field(name="Description", value=description, inline=False)
+    if metadata is not None and metadata.poster:
+        embed.set_thumbnail(url=metadata.poster)
+    return embed
+
+
+def build_random_embed(nom, film_info, metadata=None):
+    """Construit l'embed de /random d'un film (complété par ses métadonnées en cache s'il y en a)."""
+    lien_film = film_info.get("lien", "N/A")
+    title, genres, film_description = _with_metadata(
+        nom, film_info.get("genre", ["Non spécifié"]), film_info.get("description", "Aucune description."), metadata
+    )
+    film_genres_display = ", ".join(genres)
+
+    embed = discord.Embed(
+        title="Votre film aléatoire est :",
+        description=f"**{title}** ({film_genres_display})",
+        color=discord.Color.purple()
+    )
+    if lien_film != "N/A":
+        value = f"[Regarder le film]({lien_film})"
+        if film_info.link_state == "dead":
+            # Tiré seulement si aucun autre film ne correspondait
+            value += " ⚠️ lien mort"
+        embed.add_field(name="Lien", value=value, inline=False)
+    if film_description != "Aucune description.":
+        embed.add_field(name="Description", value=film_description, inline=False)
+    if metadata is not None and metadata.poster:
+        embed.set_thumbnail(url=metadata.poster)
+    return embed
+
+
+# --- Pagination de /list ---
+
+def list_page_count(film_catalog, genre):
+    """Retourne (nombre de films, nombre de pages) pour la vue demandée."""
+    if genre:
+        total = film_catalog.genre_index.matching([genre]).bit_count()
+    else:
+        total = len(film_catalog.films)
+    return total, max(1, -(-total // LIST_PAGE_SIZE))
+
+
+def render_list_page(film_catalog, genre, page):
+    """Construit l'embed d'une page de /list ; seules les lignes de cette page sont formatées.
+
+    Les pages rendues sont mises en cache par (genre, page, version du catalogue).
+    """
+    key = (genre, page, film_catalog.version)
+    embed = film_catalog.list_pages.get(key)
+    if embed is not None:
+        return embed
+    with metrics.span("render"):
+        embed = _build_list_page(film_catalog, genre, page)
+    film_catalog.list_pages.put(key, embed)
+    return embed
+
+
+def _build_list_page(film_catalog, genre, page):
+    total, pages = list_page_count(film_catalog, genre)
+    if genre:
+        names = film_catalog.genre_index.names(film_catalog.genre_index.matching([genre]))
+        title_description = f"Liste des films pour le genre : {genre}"
+        footer_text = f"Page {page + 1}/{pages} - Total: {total} film(s) dans ce genre."
+    else:
+        names = iter(film_catalog.films)
+        title_description = "Liste de tous les films"
+        footer_text = f"Page {page + 1}/{pages} - Total: {total} films enregistrés."
+
+    start = page * LIST_PAGE_SIZE
+    film_entries = [
+        film_catalog.rendered(nom, "list", format_list_entry)
+        for nom in itertools.islice(names, start, start + LIST_PAGE_SIZE)
+    ]
+    description_content = "\n".join(film_entries)
+    if len(description_content) > 4096:
+        description_content = description_content[:4095] + "…"
+
+    embed = discord.Embed(
+        title=title_description,
+        description=description_content,
+        color=discord.Color.blue()
+    )
+    embed.set_footer(text=footer_text)
+    return embed
+
+
+class ListPageView(discord.ui.View):
+    """Boutons Précédent/Suivant pour parcourir les pages de /list."""
+
+    def __init__(self, film_catalog, genre, page=0):
+        super().__init__(timeout=300)
+        self.film_catalog = film_catalog
+        self.genre = genre
+        self.page = page
+        self._update_buttons()
+
+    def _update_buttons(self):
+        _, pages = list_page_count(self.film_catalog, self.genre)
+        self.page = min(self.page, pages - 1)
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= pages - 1
+
+    async def _show(self, interaction):
+        # Le catalogue du serveur a pu être déchargé puis rechargé depuis l'envoi du message
+        self.film_catalog = await get_catalog(interaction)
+        self._update_buttons()
+        embed = render_list_page(self.film_catalog, self.genre, self.page)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="◀ Précédent", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page = max(0, self.page - 1)
+        await self._show(interaction)
+
+    @discord.ui.button(label="Suivant ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await self._show(interaction)
+
+
+# --- Sondages /poll ---
+
+def render_poll(poll, closed=False):
+    """Construit l'embed d'un sondage : décompte des votes, puis film choisi une fois clos."""
+    total = len(poll.votes)
+    lines = [
+        f"**{index + 1}. {name}** : {count} vote(s)"
+        for index, (name, count) in enumerate(zip(poll.candidates, poll.counts))
+    ]
+    if closed:
+        winners = poll.winners()
+        if not winners:
+            lines.append("\nAucun vote : pas de film choisi.")
+        elif len(winners) == 1:
+            lines.append(f"\nFilm choisi : **{winners[0]}**")
+        else:
+            lines.append(f"\nÉgalité entre : {', '.join(f'**{name}**' for name in winners)}")
+    embed = discord.Embed(
+        title="Résultats du sondage" if closed else "Sondage : quel film regarder ?",
+        description="\n".join(lines),
+        color=discord.Color.green() if closed else discord.Color.blurple()
+    )
+    embed.set_footer(text=f"{total} votant(s)" + ("" if closed else " - Cliquez sur un film pour voter."))
+    return embed
+
+
+class PollView(discord.ui.View):
+    """Boutons d'un sondage /poll : un bouton par film et un bouton pour clore le sondage.
+
+    La vue est persistante (identifiants fixes, pas d'expiration) : elle est
+    réenregistrée au démarrage pour les sondages encore ouverts. Chaque clic
+    ne modifie que le décompte en mémoire ; le message public est mis à jour
+    au plus une fois toutes les POLL_REFRESH_SECONDS secondes.
+    """
+
+    def __init__(self, poll):
+        super().__init__(timeout=None)
+        self.poll_id = poll.poll_id
+        self._refresh_task = None
+        for index, name in enumerate(poll.candidates):
+            button = discord.ui.Button(
+                label=f"{index + 1}. {name}"[:80],
+                style=discord.ButtonStyle.primary,
+                custom_id=f"poll:{poll.poll_id}:{index}"
+            )
+            button.callback = functools.partial(self._vote, index)
+            self.add_item(button)
+        close_button = discord.ui.Button(
+            label="Clore le sondage",
+            style=discord.ButtonStyle.danger,
+            custom_id=f"poll:{poll.poll_id}:close"
+        )
+        close_button.callback = self._close
+        self.add_item(close_button)
+
+    async def _get_poll(self, interaction):
+        # Le catalogue du serveur a pu être déchargé puis rechargé depuis l'envoi du message
+        catalog = await get_catalog(interaction)
+        poll = catalog.members.polls.get(self.poll_id)
+        if poll is None:
+            # Sondage clos ou perdu : ses boutons ne sont plus réenregistrés
+            open_polls.remove(self.poll_id)
+            embed = discord.Embed(
+                title="Sondage terminé",
+                description="Ce sondage est clos.",
+                color=discord.Color.orange()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        return catalog, poll
+
+    async def _vote(self, index, interaction):
+        catalog, poll = await self._get_poll(interaction)
+        if poll is None:
+            return
+        catalog.members.vote(poll, interaction.user.id, index)
+        await interaction.response.send_message(
+            f"Vote enregistré pour **{poll.candidates[index]}**.", ephemeral=True
+        )
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_later(interaction.message, poll))
+
+    async def _refresh_later(self, message, poll):
+        await asyncio.sleep(POLL_REFRESH_SECONDS)
+        try:
+            await message.edit(embed=render_poll(poll), view=self)
+        except discord.HTTPException as e:
+            print(f"Erreur lors de la mise à jour du sondage {self.poll_id} : {e}")
+
+    async def _close(self, interaction):
+        catalog, poll = await self._get_poll(interaction)
+        if poll is None:
+            return
+        if interaction.user.id != poll.author_id and not interaction.permissions.manage_guild:
+            embed = discord.Embed(
+                title="Action impossible",
+                description="Seul l'auteur du sondage ou un gestionnaire du serveur peut le clore.",
+                color=discord.Color.red()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        catalog.members.close_poll(self.poll_id)
+        open_polls.remove(self.poll_id)
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+        self.stop()
+        await interaction.response.edit_message(embed=render_poll(poll, closed=True), view=None)
+
+
+# --- Import / export ---
+
+class _JsonStreamReader:
+    """Lecture incrémentale d'un texte JSON : le texte est décodé par morceaux.
+
+    Seule la partie pas encore lue du morceau courant est gardée en mémoire,
+    plus la valeur en cours de décodage.
+    """
+
+    _WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+    def __init__(self, stream, chunk_size=IMPORT_CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        # Nombre de caractères déjà retirés du tampon (pour les messages d'erreur)
+        self.offset = 0
+        self.eof = False
+
+    def _read_more(self):
+        # La taille lue double avec le reste du tampon : une grande valeur n'est pas redécodée trop souvent
+        chunk = self.stream.read(max(self.chunk_size, len(self.buffer) - self.pos))
+        if not chunk:
+            self.eof = True
+            return False
+        self.offset += self.pos
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Retourne le prochain caractère hors blancs, sans le consommer ("" en fin de texte)."""
+        while True:
+            self.pos = self._WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read_more():
+                return ""
+
+    def expect(self, chars, message=None):
+        char = self.peek()
+        if not char or char not in chars:
+            expected = " ou ".join(f"« {c} »" for c in chars)
+            raise ValueError(message or f"{expected} attendu à la position {self.offset + self.pos}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Décode la valeur JSON suivante."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                if self._read_more():
+                    continue
+                raise ValueError(f"JSON invalide à la position {self.offset + e.pos} : {e.msg}") from None
+            # Un nombre coupé en fin de morceau se décode sans erreur : on relit avec la suite
+            if end == len(self.buffer) and not self.eof and self._read_more():
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_json_keys(reader):
+    """Itère sur les clés d'un objet JSON ; l'appelant lit chaque valeur avant la clé suivante."""
+    reader.expect("{", "le fichier JSON doit contenir un objet {\"nom du film\": {...}}")
+    if reader.peek() == "}":
+        reader.pos += 1
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        yield name
+        if reader.expect(",}") == "}":
+            return
+
+
+def _iter_json_object(reader):
+    """Itère sur les paires (nom, infos) d'un objet JSON sans construire le dictionnaire complet."""
+    for name in _iter_json_keys(reader):
+        yield name, reader.value()
+
+
+def _iter_csv(stream):
+    # Colonnes : nom, lien, genres (séparés par des virgules), description ; en-tête facultatif
+    for index, row in enumerate(csv.reader(stream)):
+        if not row or not row[0].strip():
+            continue
+        # Seule la première ligne peut être l'en-tête : un film peut s'appeler « Nom »
+        if index == 0 and [cell.strip().lower() for cell in row[:2]] == ["nom", "lien"]:
+            continue
+        row += [""] * (4 - len(row))
+        yield row[0], {"lien": row[1], "genre": row[2], "description": row[3]}
+
+
+def _iter_jsonl(stream):
+    for line in stream:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            yield "", record
+            continue
+        yield record.get("nom", ""), record
+
+
+def iter_import_records(data, filename):
+    """Itère sur les films d'un fichier importé (JSON, CSV ou JSONL selon l'extension).
+
+    Le fichier est décodé au fur et à mesure de l'itération.
+    """
+    stream = io.TextIOWrapper(io.BytesIO(data), encoding="utf-8-sig", newline="")
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == ".csv":
+        return _iter_csv(stream)
+    if extension in (".jsonl", ".ndjson"):
+        return _iter_jsonl(stream)
+    return _iter_films_object(_JsonStreamReader(stream))
+
+
+def _iter_films_object(reader):
+    # Accepte aussi un films.json au format actuel : {"schema_version": N, "films": {...}}
+    schema_version = None
+    for name in _iter_json_keys(reader):
+        if name == "films" and schema_version is not None and reader.peek() == "{":
+            # Catalogue au format actuel : ses films sont lus un à un
+            yield from _iter_json_object(reader)
+            continue
+        info = reader.value()
+        if name == "schema_version" and isinstance(info, int):
+            schema_version = info
+            continue
+        if name == "films" and isinstance(info, dict) and all(isinstance(v, dict) for v in info.values()):
+            yield from info.items()
+            continue
+        yield name, info
+
 
-async def random_autocomplete_genres(
-    interaction: discord.Interaction,
-    current: str
-) -> list[app_commands.Choice[str]]:
-    parts = [s.strip() for s in current.split(',')]
-    last_part = parts[-1] if parts else ""
-    
-    suggestions = []
-    for g in GENRES:
-        if last_part.lower() in g.lower():
-            if len(parts) > 1:
-                suggested_value = ", ".join(parts[:-1] + [g])
-            else:
-                suggested_value = g
-            suggestions.append(app_commands.Choice(name=suggested_value, value=suggested_value))
-    return suggestions[:25]
+def normalize_import_record(info):
+    """Ramène un film importé (éventuellement dans un ancien format) à la structure actuelle.
 
-async def list_autocomplete_genres(
-    interaction: discord.Interaction,
-    current: str
-) -> list[app_commands.Choice[str]]:
-    suggestions = []
-    for g in GENRES:
-        if current.lower() in g.lower():
-            suggestions.append(app_commands.Choice(name=g, value=g))
-    return suggestions[:25]
+    Retourne (infos, nombre de genres inconnus ignorés), ou (None, 0) si un
+    champ n'a pas le bon type (lien ou description qui n'est pas un texte,
+    genres qui ne sont ni un texte ni une liste de textes).
+    """
+    if isinstance(info, str):
+        info = {"lien": info}
+    raw_genres = info.get("genre", [])
+    if isinstance(raw_genres, str):
+        raw_genres = raw_genres.split(',')
+    if (
+        not isinstance(raw_genres, list)
+        or not all(isinstance(g, str) for g in raw_genres)
+        or not all(isinstance(info.get(key), (str, type(None))) for key in ("lien", "description"))
+    ):
+        return None, 0
+    genres = []
+    rejected = 0
+    for g_raw in raw_genres:
+        g_raw = g_raw.strip()
+        if not g_raw:
+            continue
+        found_genre = GENRES_BY_LOWER.get(g_raw.lower())
+        if found_genre and found_genre not in genres:
+            genres.append(found_genre)
+        elif not found_genre:
+            rejected += 1
+    return {
+        "lien": (info.get("lien") or "N/A").strip() or "N/A",
+        "genre": genres or ["Non spécifié"],
+        "description": (info.get("description") or "Aucune description.").strip() or "Aucune description.",
+    }, rejected
 
-async def edit_autocomplete_film_name(
-    interaction: discord.Interaction,
-    current: str
-) -> list[app_commands.Choice[str]]:
-    films = load_films()
-    matching_films = [
-        app_commands.Choice(name=film_name, value=film_name)
-        for film_name in films.keys()
-        if current.lower() in film_name.lower()
-    ]
-    return matching_films[:25]
 
-async def edit_autocomplete_genres(
-    interaction: discord.Interaction,
-    current: str
-) -> list[app_commands.Choice[str]]:
-    parts = [s.strip() for s in current.split(',')]
-    last_part = parts[-1] if parts else ""
-    
-    suggestions = []
-    for g in GENRES:
-        if last_part.lower() in g.lower():
-            if len(parts) > 1:
-                suggested_value = ", ".join(parts[:-1] + [g])
-            else:
-                suggested_value = g
-            suggestions.append(app_commands.Choice(name=suggested_value, value=suggested_value))
-    return suggestions[:25]
+def prepare_import(records):
+    """Valide les films importés par lots et écarte les doublons du fichier (sans tenir compte de la casse).
 
+    Ne lit pas le catalogue : exécutée dans un thread, elle laisse à l'appelant
+    le soin d'écarter, sur la boucle d'événements, les films déjà présents.
+    Retourne (opérations à appliquer, compteurs).
+    """
+    ops = []
+    seen = set()
+    counts = {"ajoutés": 0, "doublons": 0, "invalides": 0, "genres ignorés": 0}
+    while True:
+        batch = list(itertools.islice(records, IMPORT_BATCH_SIZE))
+        if not batch:
+            break
+        for name, info in batch:
+            name = str(name).strip()
+            if not name or not isinstance(info, (dict, str)):
+                counts["invalides"] += 1
+                continue
+            if name.lower() in seen:
+                counts["doublons"] += 1
+                continue
+            film_info, rejected = normalize_import_record(info)
+            if film_info is None:
+                counts["invalides"] += 1
+                continue
+            seen.add(name.lower())
+            counts["genres ignorés"] += rejected
+            ops.append(("put", name, film_info))
+    counts["ajoutés"] = len(ops)
+    return ops, counts
 
-# --- Status bot ---
-@client.event
-async def on_ready():
-    print(f"Bot connecté en tant que {client.user}")
-    try:
-        synced = await tree.sync()
-        print(f"Commandes synchronisées : {len(synced)}")
-    except Exception as e:
-        print(f"Erreur lors de la synchronisation des commandes : {e}")
 
-    await client.change_presence(status=discord.Status.idle) # Statut 'inactif'
-    print("Statut du bot défini.")
+def write_export(films, export_format, f):
+    """Écrit les films dans `f` au format demandé, film par film."""
+    if export_format == "csv":
+        writer = csv.writer(f)
+        writer.writerow(["nom", "lien", "genres", "description"])
+        for name, info in films:
+            writer.writerow([name, info.get("lien", "N/A"), ", ".join(info.get("genre", [])), info.get("description", "")])
+    elif export_format == "jsonl":
+        for name, info in films:
+            f.write(json.dumps({"nom": name, **info}, default=film_json_default) + "\n")
+    else:
+        f.write("{")
+        separator = "\n"
+        for name, info in films:
+            f.write(f"{separator}    {json.dumps(name)}: {json.dumps(info, default=film_json_default)}")
+            separator = ",\n"
+        f.write("\n}\n")
 
-# --- Fonctions utilitaires pour la gestion des films ---
 
-def load_films():
-    """Charge les données des films depuis le fichier JSON."""
-    if os.path.exists(FILMS_FILE):
-        with open(FILMS_FILE, 'r', encoding='utf-8') as f:
-            try:
-                data = json.load(f)
-                migrated = False
-                for film_name, film_info in data.items():
-                    if isinstance(film_info, str): 
-                        data[film_name] = {"lien": film_info, "genre": ["Non spécifié"], "description": "Aucune description."}
-                        migrated = True
-                    else:
-                        if "genre" not in film_info: 
-                            film_info["genre"] = ["Non spécifié"]
-                            migrated = True
-                        elif isinstance(film_info["genre"], str):
-                            genres_list = [g.strip() for g in film_info["genre"].split(',') if g.strip()]
-                            film_info["genre"] = [g for g in genres_list if g in GENRES] or ["Non spécifié"]
-                            migrated = True
-                        
-                        if "description" not in film_info: 
-                            film_info["description"] = "Aucune description."
-                            migrated = True
-                if migrated:
-                    save_films(data) 
-                    print("Anciens films migrés vers la nouvelle structure (genre en liste et description).")
-                return data
-            except json.JSONDecodeError:
-                print(f"Erreur de lecture du fichier {FILMS_FILE}. Il est peut-être vide ou corrompu.")
-                return {}
-    return {}
+def export_to_tempfile(films, export_format):
+    """Exporte les films dans un fichier temporaire et retourne son chemin."""
+    fd, path = tempfile.mkstemp(suffix=f".{export_format}")
+    with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+        write_export(films, export_format, f)
+    return path
 
-def save_films(films_data):
-    """Sauvegarde les données des films dans le fichier JSON."""
-    with open(FILMS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(films_data, f, indent=4)
 
 # --- Commandes du bot ---
 
@@ -191,6 +4445,8 @@ def save_films(films_data):
 )
 @app_commands.autocomplete(genres_str=add_autocomplete_genres)
 @app_commands.default_permissions(manage_guild=True)
+@runner.auto_defer
+@metrics.instrumented
 async def add_command(
     interaction: discord.Interaction,
     nom_film: str,
@@ -199,8 +4455,8 @@ async def add_command(
     description: str = "Aucune description."
 ):
     """Commande pour ajouter un film."""
-    films = load_films()
-    if nom_film.lower() in {k.lower() for k in films.keys()}:
+    catalog = await get_catalog(interaction)
+    if catalog.find(nom_film) is not None:
         embed = discord.Embed(
             title="Film déjà existant",
             description=f"Le film **{nom_film}** est déjà dans la liste.",
@@ -209,21 +4465,12 @@ async def add_command(
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
 
-    parsed_genres = []
-    if genres_str:
-        for g_raw in [s.strip() for s in genres_str.split(',')]:
-            if g_raw:
-                found_genre = next((item for item in GENRES if item.lower() == g_raw.lower()), None)
-                if found_genre:
-                    parsed_genres.append(found_genre)
-                else:
-                    pass 
+    parsed_genres = parse_genres(genres_str) if genres_str else []
     
     if not parsed_genres:
         parsed_genres = ["Non spécifié"]
 
-    films[nom_film] = {"lien": lien_film, "genre": parsed_genres, "description": description}
-    save_films(films)
+    catalog.apply([("put", nom_film, {"lien": lien_film, "genre": parsed_genres, "description": description})])
 
     embed = discord.Embed(
         title="Film ajouté !",
@@ -242,18 +4489,15 @@ async def add_command(
 @app_commands.describe(nom_film="Le nom du film à supprimer.")
 @app_commands.autocomplete(nom_film=remove_autocomplete_film_name)
 @app_commands.default_permissions(manage_guild=True)
+@runner.auto_defer
+@metrics.instrumented
 async def remove_command(interaction: discord.Interaction, nom_film: str):
     """Commande pour supprimer un film."""
-    films = load_films()
-    found_film_name = None
-    for k in films.keys():
-        if k.lower() == nom_film.lower():
-            found_film_name = k
-            break
+    catalog = await get_catalog(interaction)
+    found_film_name, suggestions = await catalog.resolve(nom_film)
 
     if found_film_name:
-        del films[found_film_name]
-        save_films(films)
+        catalog.apply([("delete", found_film_name)])
         embed = discord.Embed(
             title="Film supprimé !",
             description=f"Le film **{found_film_name}** a bien été supprimé de la liste.",
@@ -261,50 +4505,30 @@ async def remove_command(interaction: discord.Interaction, nom_film: str):
         )
         await interaction.response.send_message(embed=embed, ephemeral=True)
     else:
-        embed = discord.Embed(
-            title="Film introuvable",
-            description=f"Le film **{nom_film}** n'est pas dans la liste.",
-            color=discord.Color.red()
-        )
+        embed = film_not_found_embed(nom_film, suggestions)
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
 @tree.command(name="info", description="Affiche les informations détaillées d'un film.")
 @app_commands.describe(nom_film="Le nom du film dont vous voulez les informations.")
 @app_commands.autocomplete(nom_film=info_autocomplete_film_name)
+@runner.auto_defer
+@metrics.instrumented
 async def info_command(interaction: discord.Interaction, nom_film: str):
     """Commande pour afficher les informations d'un film."""
-    films = load_films()
-    film_data = None
-    original_film_name = None
-
-    for name, data in films.items():
-        if name.lower() == nom_film.lower():
-            film_data = data
-            original_film_name = name
-            break
-
-    if film_data:
-        lien = film_data.get("lien", "N/A")
-        genres = film_data.get("genre", ["Non spécifié"])
-        description = film_data.get("description", "Aucune description.")
-
-        embed = discord.Embed(
-            title=f"Informations sur : {original_film_name}",
-            color=discord.Color.gold()
-        )
-        embed.add_field(name="Genre(s)", value=", ".join(genres), inline=True)
-        if lien != "N/A":
-            embed.add_field(name="Lien", value=f"[Cliquer ici]({lien})", inline=True)
-        embed.add_field(name="Description", value=description, inline=False)
+    catalog = await get_catalog(interaction)
+    original_film_name, suggestions = await catalog.resolve(nom_film)
 
+    if original_film_name:
+        # Jamais d'attente du fournisseur : un film absent du cache est demandé en arrière-plan
+        film_metadata = metadata_fetcher.cached(original_film_name)
+        with metrics.span("render"):
+            embed = catalog.rendered(
+                original_film_name, "info", functools.partial(build_info_embed, metadata=film_metadata)
+            )
         await interaction.response.send_message(embed=embed, ephemeral=True)
     else:
-        embed = discord.Embed(
-            title="Film introuvable",
-            description=f"Le film **{nom_film}** n'est pas dans la liste.",
-            color=discord.Color.red()
-        )
+        embed = film_not_found_embed(nom_film, suggestions)
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
@@ -313,11 +4537,12 @@ async def info_command(interaction: discord.Interaction, nom_film: str):
     genre="Filtrez les films par un genre spécifique. Laissez vide pour afficher tous les films."
 )
 @app_commands.autocomplete(genre=list_autocomplete_genres)
+@runner.auto_defer
+@metrics.instrumented
 async def list_command(interaction: discord.Interaction, genre: str = None):
-    """Commande pour afficher tous les films ou filtrer par genre."""
-    films = load_films()
-    
-    embed = None
+    """Commande pour afficher tous les films ou filtrer par genre, page par page."""
+    catalog = await get_catalog(interaction)
+    films = catalog.films
     
     if not films:
         embed = discord.Embed(
@@ -325,93 +4550,47 @@ async def list_command(interaction: discord.Interaction, genre: str = None):
             description="Il n'y a aucun film enregistré pour le moment.",
             color=discord.Color.blue()
         )
-    elif genre:
-        found_genre = next((g for g in GENRES if g.lower() == genre.lower()), None)
-        if not found_genre:
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    display_genre = None
+    if genre:
+        display_genre = next((g for g in GENRES if g.lower() == genre.lower()), None)
+        if not display_genre:
             embed = discord.Embed(
                 title="Genre inconnu",
                 description=f"Le genre **{genre}** n'est pas reconnu. Veuillez choisir parmi les suggestions.",
                 color=discord.Color.orange()
             )
-        else:
-            display_genre = found_genre
-            film_entries = []
-            filtered_films_count = 0
-            for nom, film_info in films.items():
-                film_genres = film_info.get("genre", ["Non spécifié"])
-                if not isinstance(film_genres, list):
-                    film_genres = [film_genres]
-
-                if display_genre in film_genres:
-                    lien = film_info.get("lien", "N/A")
-                    genres_display = ", ".join(film_genres)
-                    # description = film_info.get("description", "Aucune description.") # Ligne supprimée
-
-                    entry = f"**{nom}** ({genres_display})"
-                    if lien != "N/A":
-                        entry += f" : [Lien]({lien})"
-                    # if description != "Aucune description.": # Ligne supprimée
-                    #     entry += f" - Description: {description}" # Ligne supprimée
-                    film_entries.append(entry)
-                    filtered_films_count += 1
-            
-            if not film_entries:
-                embed = discord.Embed(
-                    title="Aucun film trouvé",
-                    description=f"Aucun film trouvé pour le genre : **{display_genre}**.",
-                    color=discord.Color.orange()
-                )
-            else:
-                title_description = f"Liste des films pour le genre : {display_genre}"
-                footer_text = f"Total: {filtered_films_count} film(s) dans ce genre."
-                description_content = "\n".join(film_entries)
-
-                embed = discord.Embed(
-                    title=title_description,
-                    description=description_content,
-                    color=discord.Color.blue()
-                )
-                if filtered_films_count > 5: 
-                    embed.set_footer(text=footer_text)
-
-    else: # Aucun genre n'est fourni, affiche tous les films
-        film_entries = []
-        for nom, film_info in films.items():
-            lien = film_info.get("lien", "N/A")
-            genres_display = ", ".join(film_info.get("genre", ["Non spécifié"]))
-            # description = film_info.get("description", "Aucune description.") # Ligne supprimée
-
-            entry = f"**{nom}** ({genres_display})"
-            if lien != "N/A":
-                entry += f" : [Lien]({lien})"
-            # if description != "Aucune description.": # Ligne supprimée
-            #     entry += f" - Description: {description}" # Ligne supprimée
-            film_entries.append(entry)
-        
-        filtered_films_count = len(films)
-        title_description = "Liste de tous les films"
-        footer_text = f"Total: {filtered_films_count} films enregistrés."
-        description_content = "\n".join(film_entries)
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
 
-        embed = discord.Embed(
-            title=title_description,
-            description=description_content,
-            color=discord.Color.blue()
-        )
-        if filtered_films_count > 5: 
-            embed.set_footer(text=footer_text)
-    
-    if embed: 
+        if not catalog.genre_index.matching([display_genre]):
+            embed = discord.Embed(
+                title="Aucun film trouvé",
+                description=f"Aucun film trouvé pour le genre : **{display_genre}**.",
+                color=discord.Color.orange()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+
+    embed = render_list_page(catalog, display_genre, 0)
+    _, pages = list_page_count(catalog, display_genre)
+    if pages > 1:
+        await interaction.response.send_message(embed=embed, view=ListPageView(catalog, display_genre), ephemeral=True)
+    else:
         await interaction.response.send_message(embed=embed, ephemeral=True)
-    else: 
-        await interaction.response.send_message("Une erreur inattendue est survenue.", ephemeral=True)
 
 
 @tree.command(name="stats", description="Affiche les statistiques sur les films enregistrés.")
-async def stats_command(interaction: discord.Interaction):
+@app_commands.describe(detail="Affiche aussi les liens, descriptions et paires de genres les plus fréquentes.")
+@runner.auto_defer
+@metrics.instrumented
+async def stats_command(interaction: discord.Interaction, detail: bool = False):
     """Commande pour afficher le nombre de films et leur répartition par genre."""
-    films = load_films()
-    total_films = len(films)
+    catalog = await get_catalog(interaction)
+    stats = catalog.stats
+    total_films = stats.total
 
     if total_films == 0:
         embed = discord.Embed(
@@ -422,16 +4601,7 @@ async def stats_command(interaction: discord.Interaction):
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
 
-    genre_counts = {}
-    for film_name, film_info in films.items():
-        film_genres = film_info.get("genre", ["Non spécifié"])
-        if not isinstance(film_genres, list):
-            film_genres = [film_genres]
-
-        for genre in film_genres:
-            genre_counts[genre] = genre_counts.get(genre, 0) + 1
-
-    sorted_genres = sorted(genre_counts.items(), key=lambda item: item[1], reverse=True)
+    sorted_genres = stats.sorted_genres()
 
     stats_description = f"**Nombre total de films :** {total_films}\n\n**Films par genre :**\n"
     if sorted_genres:
@@ -440,23 +4610,39 @@ async def stats_command(interaction: discord.Interaction):
     else:
         stats_description += "Aucun genre n'a pu être identifié."
 
-
     embed = discord.Embed(
         title="Statistiques de la collection de films",
         description=stats_description,
         color=discord.Color.purple()
     )
+    if detail:
+        embed.add_field(name="Films avec lien", value=f"{stats.with_link}/{total_films}", inline=True)
+        embed.add_field(name="Films avec description", value=f"{stats.with_description}/{total_films}", inline=True)
+        embed.add_field(name="Mémoire par film", value=f"~{catalog.memory_per_film():.0f} octets", inline=True)
+        top_pairs = stats.top_pairs()
+        if top_pairs:
+            pairs_text = "\n".join(f"- {g1} + {g2}: {count} film(s)" for (g1, g2), count in top_pairs)
+        else:
+            pairs_text = "Aucun film n'a plusieurs genres."
+        embed.add_field(name="Genres les plus souvent associés", value=pairs_text, inline=False)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
 @tree.command(name="random", description="Affiche un film aléatoire de la liste en fonction des genres.")
 @app_commands.describe(
-    genres="Un ou plusieurs genres séparés par des virgules (ex: 'Action, Comédie'). Laissez vide pour tous les genres."
+    genres="Un ou plusieurs genres séparés par des virgules (ex: 'Action, Comédie'). Laissez vide pour tous les genres.",
+    ponderer="Favorise les films jamais ou rarement tirés (optionnel)."
 )
 @app_commands.autocomplete(genres=random_autocomplete_genres)
-async def random_command(interaction: discord.Interaction, genres: str = None):
-    """Commande pour afficher un film aléatoire, filtré par un ou plusieurs genres."""
-    films = load_films()
+@runner.auto_defer
+@metrics.instrumented
+async def random_command(interaction: discord.Interaction, genres: str = None, ponderer: bool = False):
+    """Commande pour afficher un film aléatoire, filtré par un ou plusieurs genres.
+
+    Les derniers films tirés sur le serveur sont exclus (RANDOM_NO_REPEAT).
+    """
+    catalog = await get_catalog(interaction)
+    films = catalog.films
     if not films:
         embed = discord.Embed(
             title="Liste de films vide",
@@ -466,31 +4652,15 @@ async def random_command(interaction: discord.Interaction, genres: str = None):
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
 
-    requested_genres = []
-    if genres:
-        for g_raw in [s.strip() for s in genres.split(',')]:
-            if g_raw:
-                found_genre = next((item for item in GENRES if item.lower() == g_raw.lower()), None)
-                if found_genre:
-                    requested_genres.append(found_genre)
-                else:
-                    pass 
+    requested_genres = parse_genres(genres) if genres else []
 
     if not requested_genres:
         selected_genre_display = "Tous les genres"
-        filtered_films = films
     else:
         selected_genre_display = ", ".join(requested_genres)
-        filtered_films = {}
-        for nom, film_info in films.items():
-            film_genres = film_info.get("genre", ["Non spécifié"])
-            if not isinstance(film_genres, list):
-                film_genres = [film_genres]
 
-            if all(g in film_genres for g in requested_genres): 
-                filtered_films[nom] = film_info
-
-    if not filtered_films:
+    nom_film = await catalog.pick_random(requested_genres, weighted=ponderer)
+    if nom_film is None:
         embed = discord.Embed(
             title="Aucun film trouvé",
             description=f"Aucun film trouvé pour le(s) genre(s) : **{selected_genre_display}**.",
@@ -499,21 +4669,9 @@ async def random_command(interaction: discord.Interaction, genres: str = None):
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
 
-    nom_film, film_info = random.choice(list(filtered_films.items()))
-    lien_film = film_info.get("lien", "N/A")
-    film_genres_display = ", ".join(film_info.get("genre", ["Non spécifié"]))
-    film_description = film_info.get("description", "Aucune description.")
-
-    embed = discord.Embed(
-        title="Votre film aléatoire est :",
-        description=f"**{nom_film}** ({film_genres_display})",
-        color=discord.Color.purple()
-    )
-    if lien_film != "N/A":
-        embed.add_field(name="Lien", value=f"[Regarder le film]({lien_film})", inline=False)
-    if film_description != "Aucune description.":
-        embed.add_field(name="Description", value=film_description, inline=False)
-
+    film_metadata = metadata_fetcher.cached(nom_film)
+    with metrics.span("render"):
+        embed = catalog.rendered(nom_film, "random", functools.partial(build_random_embed, metadata=film_metadata))
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
@@ -528,6 +4686,8 @@ async def random_command(interaction: discord.Interaction, genres: str = None):
 @app_commands.autocomplete(film_a_modifier=edit_autocomplete_film_name)
 @app_commands.autocomplete(genres=edit_autocomplete_genres)
 @app_commands.default_permissions(manage_guild=True)
+@runner.auto_defer
+@metrics.instrumented
 async def edit_command(
     interaction: discord.Interaction,
     film_a_modifier: str,
@@ -537,22 +4697,12 @@ async def edit_command(
     description: str = None
 ):
     """Commande pour modifier un film."""
-    films = load_films()
-    original_film_name = None
-    film_data = None
-
-    for name, data in films.items():
-        if name.lower() == film_a_modifier.lower():
-            film_data = data
-            original_film_name = name
-            break
+    catalog = await get_catalog(interaction)
+    original_film_name, suggestions = await catalog.resolve(film_a_modifier)
+    film_data = catalog.films[original_film_name] if original_film_name else None
 
     if not film_data:
-        embed = discord.Embed(
-            title="Film introuvable",
-            description=f"Le film **{film_a_modifier}** n'est pas dans la liste.",
-            color=discord.Color.red()
-        )
+        embed = film_not_found_embed(film_a_modifier, suggestions)
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
 
@@ -561,7 +4711,8 @@ async def edit_command(
     updated_film_data = film_data.copy()
 
     if nom and nom != original_film_name: 
-        if nom.lower() in {k.lower() for k in films.keys() if k.lower() != original_film_name.lower()}:
+        existing_name = catalog.find(nom)
+        if existing_name is not None and existing_name != original_film_name:
             embed = discord.Embed(
                 title="Erreur de modification",
                 description=f"Le nouveau nom **{nom}** est déjà utilisé par un autre film.",
@@ -572,23 +4723,13 @@ async def edit_command(
 
         new_film_name = nom
         changes_made.append(f"Nom : `{original_film_name}` -> `{new_film_name}`")
-        if original_film_name != new_film_name: 
-            del films[original_film_name]
 
     if lien is not None and lien != updated_film_data.get("lien"):
         updated_film_data["lien"] = lien
         changes_made.append(f"Lien : `{film_data.get('lien', 'N/A')}` -> `{lien}`")
 
     if genres is not None:
-        parsed_new_genres = []
-        if genres:
-            for g_raw in [s.strip() for s in genres.split(',')]:
-                if g_raw:
-                    found_genre = next((item for item in GENRES if item.lower() == g_raw.lower()), None)
-                    if found_genre:
-                        parsed_new_genres.append(found_genre)
-                    else:
-                        pass
+        parsed_new_genres = parse_genres(genres) if genres else []
         
         if not parsed_new_genres:
             parsed_new_genres = ["Non spécifié"]
@@ -610,8 +4751,13 @@ async def edit_command(
         await interaction.response.send_message(embed=embed, ephemeral=True)
         return
 
-    films[new_film_name] = updated_film_data
-    save_films(films)
+    ops = []
+    if new_film_name != original_film_name:
+        # Les listes des membres suivent le nouveau nom avant que la suppression ne les purge
+        catalog.members.rename(original_film_name, new_film_name)
+        ops.append(("delete", original_film_name))
+    ops.append(("put", new_film_name, updated_film_data))
+    catalog.apply(ops)
 
     embed = discord.Embed(
         title="Film modifié !",
@@ -624,9 +4770,432 @@ async def edit_command(
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
+@tree.command(name="search", description="Recherche des films par titre ou description.")
+@app_commands.describe(recherche="Les mots à rechercher dans les titres et descriptions.")
+@runner.auto_defer
+@metrics.instrumented
+async def search_command(interaction: discord.Interaction, recherche: str):
+    """Commande pour rechercher des films, classés par pertinence."""
+    catalog = await get_catalog(interaction)
+    results = catalog.search_index.search(recherche, limit=10)
+
+    if not results:
+        embed = discord.Embed(
+            title="Aucun résultat",
+            description=f"Aucun film ne correspond à la recherche : **{recherche}**.",
+            color=discord.Color.orange()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    film_entries = [catalog.rendered(nom, "search", format_search_entry) for nom, _ in results]
+
+    embed = discord.Embed(
+        title=f"Résultats pour : {recherche}",
+        description="\n".join(film_entries)[:4096],
+        color=discord.Color.gold()
+    )
+    embed.set_footer(text=f"{len(results)} résultat(s) les plus pertinents.")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@tree.command(name="similar", description="Affiche les films les plus proches d'un film donné.")
+@app_commands.describe(nom_film="Le film dont vous cherchez des films similaires.")
+@app_commands.autocomplete(nom_film=similar_autocomplete_film_name)
+@runner.auto_defer
+@metrics.instrumented
+async def similar_command(interaction: discord.Interaction, nom_film: str):
+    """Commande pour recommander des films proches par leurs genres et leur description."""
+    if np is None:
+        embed = discord.Embed(
+            title="Commande indisponible",
+            description="La recommandation de films nécessite le module NumPy (`pip install numpy`).",
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    catalog = await get_catalog(interaction)
+    original_film_name, suggestions = await catalog.resolve(nom_film)
+    if not original_film_name:
+        embed = film_not_found_embed(nom_film, suggestions)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    results = catalog.similar(original_film_name)
+    if not results:
+        embed = discord.Embed(
+            title="Aucun film similaire",
+            description=f"Aucun film proche de **{original_film_name}** n'a été trouvé.",
+            color=discord.Color.orange()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    film_entries = [catalog.rendered(nom, "list", format_list_entry) for nom, _ in results]
+    embed = discord.Embed(
+        title=f"Films similaires à : {original_film_name}",
+        description="\n".join(film_entries)[:4096],
+        color=discord.Color.gold()
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@tree.command(name="import", description="Importe des films depuis un fichier JSON, CSV ou JSONL.")
+@app_commands.describe(
+    fichier="Fichier JSON (même format que films.json), CSV (nom, lien, genres, description) ou JSONL."
+)
+@app_commands.default_permissions(manage_guild=True)
+@runner.auto_defer
+@metrics.instrumented
+async def import_command(interaction: discord.Interaction, fichier: discord.Attachment):
+    """Commande pour importer des films en une seule écriture."""
+    if fichier.size > IMPORT_MAX_BYTES:
+        embed = discord.Embed(
+            title="Import impossible",
+            description=(
+                f"Le fichier **{fichier.filename}** est trop volumineux "
+                f"({fichier.size / 1024 / 1024:.1f} Mo, maximum {IMPORT_MAX_BYTES / 1024 / 1024:.1f} Mo)."
+            ),
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    catalog = await get_catalog(interaction)
+    data = await fichier.read()
+    try:
+        # Lecture et validation dans un thread ; les doublons du catalogue sont écartés ensuite, sur la boucle
+        ops, counts = await runner.run(prepare_import, iter_import_records(data, fichier.filename))
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        embed = discord.Embed(
+            title="Import impossible",
+            description=f"Le fichier **{fichier.filename}** n'a pas pu être lu : {e}",
+            color=discord.Color.red()
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
+    except Exception as e:
+        # La réponse a été différée : sans message, l'utilisateur resterait sur « réfléchit… »
+        print(f"Erreur inattendue lors de l'import de {fichier.filename} : {e!r}")
+        embed = discord.Embed(
+            title="Import impossible",
+            description=f"Une erreur inattendue est survenue pendant la lecture de **{fichier.filename}**.",
+            color=discord.Color.red()
+        )
+        await interaction.followup.send(embed=embed, ephemeral=True)
+        return
+
+    # Films déjà présents dans le catalogue (y compris ajoutés pendant la lecture du fichier)
+    new_ops = [op for op in ops if not catalog.has_name(op[1])]
+    counts["doublons"] += len(ops) - len(new_ops)
+    ops = new_ops
+    if ops:
+        catalog.apply(ops)
+        await catalog.flush()
+
+    embed = discord.Embed(
+        title="Import terminé",
+        description=f"**{len(ops)}** film(s) importé(s) depuis **{fichier.filename}**.",
+        color=discord.Color.green()
+    )
+    embed.add_field(name="Doublons ignorés", value=str(counts["doublons"]), inline=True)
+    embed.add_field(name="Entrées invalides", value=str(counts["invalides"]), inline=True)
+    embed.add_field(name="Genres inconnus ignorés", value=str(counts["genres ignorés"]), inline=True)
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+
+@tree.command(name="export", description="Exporte la liste des films dans un fichier.")
+@app_commands.describe(format="Format du fichier exporté (JSON par défaut).")
+@app_commands.choices(format=[
+    app_commands.Choice(name="JSON", value="json"),
+    app_commands.Choice(name="CSV", value="csv"),
+    app_commands.Choice(name="JSONL", value="jsonl"),
+])
+@app_commands.default_permissions(manage_guild=True)
+@runner.auto_defer
+@metrics.instrumented
+async def export_command(interaction: discord.Interaction, format: str = "json"):
+    """Commande pour exporter tous les films."""
+    catalog = await get_catalog(interaction)
+    if not catalog.films:
+        embed = discord.Embed(
+            title="Liste de films vide",
+            description="Il n'y a aucun film à exporter.",
+            color=discord.Color.blue()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    path = await runner.run(export_to_tempfile, list(catalog.films.items()), format)
+    try:
+        await interaction.followup.send(
+            content=f"{len(catalog.films)} film(s) exporté(s).",
+            file=discord.File(path, filename=f"films.{format}"),
+            ephemeral=True
+        )
+    finally:
+        os.remove(path)
+
+
+@tree.command(name="poll", description="Lance un vote pour choisir le film à regarder.")
+@app_commands.describe(
+    titres="Films proposés, séparés par des points-virgules (ex: 'Alien; Heat'). Laissez vide pour un tirage au sort.",
+    genres="Genres des films tirés au sort, séparés par des virgules (optionnel).",
+    candidats="Nombre de films tirés au sort (4 par défaut)."
+)
+@app_commands.autocomplete(genres=random_autocomplete_genres)
+@runner.auto_defer(ephemeral=False)
+@metrics.instrumented
+async def poll_command(
+    interaction: discord.Interaction,
+    titres: str = None,
+    genres: str = None,
+    candidats: app_commands.Range[int, 2, POLL_MAX_CANDIDATES] = 4
+):
+    """Commande pour lancer un sondage public avec un bouton par film."""
+    catalog = await get_catalog(interaction)
+    if titres:
+        candidates = []
+        unknown = []
+        for title in (t.strip() for t in titres.split(';')):
+            if not title:
+                continue
+            found = catalog.find(title)
+            if found is None:
+                unknown.append(title)
+            elif found not in candidates:
+                candidates.append(found)
+        if unknown:
+            embed = discord.Embed(
+                title="Film introuvable",
+                description=f"Ces films ne sont pas dans la liste : {', '.join(f'**{t}**' for t in unknown)}.",
+                color=discord.Color.red()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+            return
+        candidates = candidates[:POLL_MAX_CANDIDATES]
+    else:
+        requested_genres = parse_genres(genres) if genres else []
+        with metrics.span("compute"):
+            candidates = catalog.genre_index.sample_many(requested_genres, candidats)
+
+    if len(candidates) < 2:
+        embed = discord.Embed(
+            title="Pas assez de films",
+            description="Un sondage doit proposer au moins deux films.",
+            color=discord.Color.orange()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    poll = Poll(str(interaction.id), candidates, interaction.user.id)
+    catalog.members.open_poll(poll)
+    await interaction.response.send_message(embed=render_poll(poll), view=PollView(poll))
+    message = await interaction.original_response()
+    poll.message_id = message.id
+    # L'identifiant du message sert à réenregistrer les boutons après un redémarrage
+    catalog.members.open_poll(poll)
+    open_polls.add(interaction.guild_id, poll)
+
+
+@tree.command(name="watchlist", description="Gère votre liste de films à voir et de films vus.")
+@app_commands.describe(
+    action="Ce que vous voulez faire (afficher vos listes par défaut).",
+    nom_film="Le film concerné (sauf pour afficher)."
+)
+@app_commands.choices(action=[
+    app_commands.Choice(name="Afficher mes listes", value="afficher"),
+    app_commands.Choice(name="Ajouter à voir", value="ajouter"),
+    app_commands.Choice(name="Marquer comme vu", value="vu"),
+    app_commands.Choice(name="Retirer", value="retirer"),
+])
+@app_commands.autocomplete(nom_film=watchlist_autocomplete_film_name)
+@runner.auto_defer
+@metrics.instrumented
+async def watchlist_command(interaction: discord.Interaction, action: str = "afficher", nom_film: str = None):
+    """Commande pour gérer les listes « à voir » et « vus » du membre qui l'appelle."""
+    catalog = await get_catalog(interaction)
+    members = catalog.members
+    user_id = interaction.user.id
+
+    if action == "afficher":
+        embed = discord.Embed(title="Vos listes de films", color=discord.Color.blue())
+        for kind, label in (("watchlist", "À voir"), ("seen", "Vus")):
+            names = members.names(kind, user_id)
+            value = "\n".join(f"- {name}" for name in names) or "Aucun film."
+            if len(value) > 1024:
+                value = value[:1023] + "…"
+            embed.add_field(name=f"{label} ({len(names)})", value=value, inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    found_film_name = catalog.find(nom_film) if nom_film else None
+    if found_film_name is None:
+        embed = discord.Embed(
+            title="Film introuvable",
+            description=f"Le film **{nom_film or ''}** n'est pas dans la liste.",
+            color=discord.Color.red()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    if action == "ajouter":
+        changed = members.add("watchlist", user_id, found_film_name)
+        message = "ajouté à votre liste à voir" if changed else "déjà dans votre liste à voir"
+    elif action == "vu":
+        changed = members.mark_seen(user_id, found_film_name)
+        message = "marqué comme vu" if changed else "déjà marqué comme vu"
+    else:
+        changed = members.remove("watchlist", user_id, found_film_name)
+        changed = members.remove("seen", user_id, found_film_name) or changed
+        message = "retiré de vos listes" if changed else "absent de vos listes"
+
+    embed = discord.Embed(
+        description=f"Le film **{found_film_name}** est {message}.",
+        color=discord.Color.green() if changed else discord.Color.blue()
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@tree.command(name="links", description="Vérifie maintenant tous les liens des films.")
+@app_commands.default_permissions(manage_guild=True)
+@runner.auto_defer
+@metrics.instrumented
+async def links_command(interaction: discord.Interaction):
+    """Commande pour lancer la vérification de tous les liens du catalogue."""
+    catalog = await get_catalog(interaction)
+    if catalog.checking_links:
+        embed = discord.Embed(
+            title="Vérification en cours",
+            description="Les liens sont déjà en cours de vérification, réessayez dans quelques minutes.",
+            color=discord.Color.orange()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    started = time.perf_counter()
+    with metrics.span("compute"):
+        checked, valid, dead = await catalog.check_links(LinkChecker())
+    dead_names = [name for name, info in catalog.films.items() if info.link_state == "dead"]
+
+    embed = discord.Embed(
+        title="Vérification des liens",
+        description=(
+            f"{checked} lien(s) vérifié(s) en {time.perf_counter() - started:.0f} s : "
+            f"{valid} valide(s), {dead} mort(s), {checked - valid - dead} injoignable(s) pour le moment."
+        ),
+        color=discord.Color.green() if not dead_names else discord.Color.orange()
+    )
+    if dead_names:
+        value = "\n".join(f"- {name}" for name in dead_names[:20])
+        if len(dead_names) > 20:
+            value += f"\n… et {len(dead_names) - 20} autre(s)"
+        embed.add_field(name=f"Films au lien mort ({len(dead_names)})", value=value[:1024], inline=False)
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+
+@tree.command(name="enrich", description="Complète les descriptions et les genres des films depuis une base de films en ligne.")
+@app_commands.describe(
+    remplacer_genres="Remplace aussi les genres déjà saisis par ceux de la base de films (non par défaut)."
+)
+@app_commands.default_permissions(manage_guild=True)
+@runner.auto_defer
+@metrics.instrumented
+async def enrich_command(interaction: discord.Interaction, remplacer_genres: bool = False):
+    """Commande pour compléter les films avec les métadonnées du fournisseur."""
+    catalog = await get_catalog(interaction)
+    if not metadata_fetcher.enabled:
+        embed = discord.Embed(
+            title="Métadonnées désactivées",
+            description="Ajoutez `METADATA_PROVIDER=tmdb` et `TMDB_API_KEY` au fichier `.env` pour compléter les films.",
+            color=discord.Color.orange()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    started = time.perf_counter()
+    with metrics.span("compute"):
+        results = await metadata_fetcher.fetch(list(catalog.films))
+        # Les films ont pu changer pendant la récupération : les mutations partent de l'état courant
+        ops = enrichment_ops(catalog.films, results, remplacer_genres)
+    if ops:
+        catalog.apply(ops)
+    found = sum(1 for film_metadata in results.values() if film_metadata is not None)
+
+    embed = discord.Embed(
+        title="Films complétés",
+        description=(
+            f"{found} film(s) sur {len(results)} trouvé(s) en {time.perf_counter() - started:.1f} s, "
+            f"**{len(ops)}** film(s) complété(s)."
+        ),
+        color=discord.Color.green()
+    )
+    missing = [name for name, film_metadata in results.items() if film_metadata is None]
+    if missing:
+        value = "\n".join(f"- {name}" for name in missing[:20])
+        if len(missing) > 20:
+            value += f"\n… et {len(missing) - 20} autre(s)"
+        embed.add_field(name=f"Films introuvables ({len(missing)})", value=value[:1024], inline=False)
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+
+@tree.command(name="metrics", description="Affiche les temps de réponse des commandes (administrateurs).")
+@app_commands.default_permissions(administrator=True)
+async def metrics_command(interaction: discord.Interaction):
+    """Commande pour afficher les durées mesurées par commande et par phase."""
+    if not metrics.enabled:
+        embed = discord.Embed(
+            title="Métriques désactivées",
+            description="Ajoutez `METRICS_ENABLED=1` au fichier `.env` pour mesurer les commandes.",
+            color=discord.Color.orange()
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return
+
+    by_command = {}
+    for (command, phase), histogram in metrics.histograms.items():
+        by_command.setdefault(command, {})[phase] = histogram
+
+    embed = discord.Embed(title="Temps de réponse des commandes", color=discord.Color.purple())
+    if not by_command:
+        embed.description = "Aucune commande mesurée pour le moment."
+    # 25 champs au plus par embed : le dernier est réservé à l'exécution des commandes
+    for command, phases in sorted(by_command.items())[:24]:
+        total = phases.get("total") or next(iter(phases.values()))
+        lines = [f"{total.count} appel(s), p50 ≤ {total.quantile(0.5) * 1000:g} ms, p95 ≤ {total.quantile(0.95) * 1000:g} ms"]
+        for phase in ("parse", "storage_read", "compute", "render", "send", "storage_write"):
+            histogram = phases.get(phase)
+            if histogram is not None and histogram.count:
+                lines.append(f"- {phase} : {histogram.sum / histogram.count * 1000:.2f} ms en moyenne")
+        if command == "writer":
+            label = "Écritures du stockage"
+        elif command.endswith("_choices"):
+            label = f"Autocomplétion ({command})"
+        else:
+            label = f"/{command}"
+        embed.add_field(name=label, value="\n".join(lines), inline=False)
+    embed.add_field(
+        name="Exécution des commandes",
+        value=(
+            f"{runner.deferred} commande(s) différée(s), {runner.deadline_misses} réponse(s) hors délai\n"
+            f"Pool de calcul : {runner.queue_depth} tâche(s) en cours (max {runner.max_queue_depth}, "
+            f"{runner.workers} thread(s))"
+        ),
+        inline=False
+    )
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
 # --- Démarrage du bot ---
 if __name__ == "__main__":
-    if not os.path.exists(FILMS_FILE):
-        with open(FILMS_FILE, 'w', encoding='utf-8') as f:
-            json.dump({}, f, indent=4)
-    client.run(DISCORD_BOT_TOKEN)
+    try:
+        client.run(DISCORD_BOT_TOKEN)
+    finally:
+        # Écrit les mutations encore en attente à l'arrêt du bot
+        catalogs.close_all()
+        metadata_fetcher.close()
+        open_polls.close()
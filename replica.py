@@ -0,0 +1,68 @@
+"""Copie en lecture seule d'un catalogue du bot, servie en HTTP.
+
+Exemple de processus de lecture (tableau de bord, autre processus) : la
+copie suit le flux de modifications du catalogue (`CHANGE_FEED=1` côté
+bot) et n'applique que les nouvelles versions, sans jamais relire ni
+écrire le fichier du catalogue lui-même.
+
+    GET /version        {"version": N, "films": nombre de films}
+    GET /films          {nom: infos}
+    GET /films/{nom}    infos d'un film (404 s'il n'existe pas)
+
+Exemples :
+    python replica.py films.json
+    python replica.py guilds/123456789/films.json --port 8081 --interval 0.2
+"""
+
+import argparse
+import asyncio
+
+from aiohttp import web
+
+import bot
+
+
+def make_app(replica):
+    async def version(request):
+        return web.json_response({"version": replica.version, "films": len(replica.films)})
+
+    async def films(request):
+        return web.json_response(replica.films)
+
+    async def film(request):
+        info = replica.films.get(request.match_info["nom"])
+        if info is None:
+            raise web.HTTPNotFound()
+        return web.json_response(info)
+
+    app = web.Application()
+    app.router.add_get("/version", version)
+    app.router.add_get("/films", films)
+    app.router.add_get("/films/{nom}", film)
+    return app
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("catalogue", help="fichier du catalogue suivi (ex : guilds/<id du serveur>/films.json)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--interval", type=float, default=0.5, help="intervalle (en secondes) entre deux lectures du flux")
+    args = parser.parse_args()
+
+    replica = bot.CatalogReplica(args.catalogue)
+    await asyncio.to_thread(replica.poll)
+    print(f"Copie de {args.catalogue} : version {replica.version}, {len(replica.films)} film(s).")
+
+    runner = web.AppRunner(make_app(replica), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, args.host, args.port).start()
+    print(f"Copie servie sur http://{args.host}:{args.port}/films")
+    await replica.follow(
+        args.interval,
+        on_change=lambda r: print(f"Version {r.version} : {len(r.films)} film(s)."),
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Les catalogues des tests sont écrits dans un dossier temporaire, jamais dans celui du bot
+os.environ.setdefault("FILMS_DIR", tempfile.mkdtemp(prefix="tests_films_"))
+os.environ.setdefault("FILMS_STORAGE", "json")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
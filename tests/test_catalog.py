@@ -0,0 +1,60 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import bot
+
+
+def make_catalog(tmp_path, films):
+    path = tmp_path / "films.json"
+    path.write_text(json.dumps({"schema_version": bot.FILMS_SCHEMA_VERSION, "films": films}), encoding="utf-8")
+    catalog = bot.FilmCatalog(bot.JsonStorage(str(path)), change_feed=False)
+    catalog.refresh()
+    return catalog
+
+
+def test_legacy_and_invalid_records_do_not_break_loading(tmp_path, capsys):
+    catalog = make_catalog(tmp_path, {
+        "Alien": {"lien": "https://example.org/alien", "genre": ["Horreur"], "description": "Un huitième passager."},
+        "Heat": "https://example.org/heat",
+        "Cassé": 42,
+    })
+    assert sorted(catalog.films) == ["Alien", "Heat"]
+    assert catalog.films["Heat"].to_dict() == {
+        "lien": "https://example.org/heat", "genre": ["Non spécifié"], "description": "Aucune description.",
+    }
+    assert catalog.title_index.search("heat") == ["Heat"]
+    output = capsys.readouterr().out
+    assert "1 film(s)" in output and "ancienne structure" in output
+    assert "ignoré(s)" in output
+
+
+def test_evicted_catalogs_are_closed_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(bot, "FILMS_DIR", str(tmp_path))
+    closed = []
+    monkeypatch.setattr(bot.FilmCatalog, "close", lambda self: closed.append(threading.current_thread()))
+    registry = bot.CatalogRegistry(maxsize=1)
+
+    async def scenario():
+        registry.get(1)
+        registry.get(2)
+        assert len(registry) == 1
+        await asyncio.gather(*registry._closing)
+
+    asyncio.run(scenario())
+    assert len(closed) == 1 and closed[0] is not threading.main_thread()
+    # Hors de la boucle d'événements, la fermeture est immédiate
+    registry.get(3)
+    assert closed[-1] is threading.main_thread()
+
+
+def test_direct_messages_never_reach_a_guild_catalog(monkeypatch):
+    monkeypatch.setattr(bot, "LEGACY_GUILD_ID", "123")
+    registry = bot.CatalogRegistry()
+    with pytest.raises(ValueError):
+        registry.get(None)
+    assert registry.storage_paths(123) == (bot.FILMS_FILE, bot.FILMS_DB)
+    contexts = bot.tree.allowed_contexts
+    assert contexts.guild and not contexts.dm_channel and not contexts.private_channel
@@ -0,0 +1,171 @@
+import json
+import random
+
+import bot
+
+
+def film(i, genre="Drame"):
+    return {"lien": f"https://example.com/{i}", "genre": [genre], "description": "d" * 40}
+
+
+def open_catalog(tmp_path, compact_bytes=bot.CHANGE_FEED_COMPACT_BYTES):
+    catalog = bot.FilmCatalog(bot.JsonStorage(str(tmp_path / "films.json")), change_feed=True)
+    catalog.feed.compact_bytes = compact_bytes
+    catalog.refresh()
+    return catalog
+
+
+def expected(catalog):
+    """Oracle : contenu et empreinte recalculés à partir du catalogue du bot."""
+    films = {name: info.to_dict() for name, info in catalog.films.items()}
+    return films, bot.catalog_checksum(films)
+
+
+def assert_in_sync(replica, catalog):
+    films, checksum = expected(catalog)
+    assert replica.films == films
+    assert replica.checksum == checksum == catalog.checksum
+    assert replica.version == catalog.feed.version
+
+
+def log_base(catalog):
+    with open(catalog.feed.log_path, encoding="utf-8") as f:
+        return json.loads(f.readline())["base"]
+
+
+def random_ops(rng, count):
+    ops = []
+    for _ in range(count):
+        i = rng.randrange(30)
+        if rng.random() < 0.3:
+            ops.append(("delete", f"Film {i}"))
+        else:
+            ops.append(("put", f"Film {i}", film(rng.randrange(1000), rng.choice(bot.GENRES))))
+    return ops
+
+
+def apply_random(catalog, rng, versions):
+    for _ in range(versions):
+        ops = [op for op in random_ops(rng, rng.randint(1, 4))
+               if op[0] == "put" or op[1] in catalog.films]
+        if ops:
+            catalog.apply(ops)
+
+
+def test_replica_follows_each_version(tmp_path):
+    catalog = open_catalog(tmp_path)
+    replica = bot.CatalogReplica(catalog.storage.path)
+    replica.poll()
+    assert_in_sync(replica, catalog)
+
+    rng = random.Random(1)
+    for _ in range(20):
+        apply_random(catalog, rng, 3)
+        replica.poll()
+        assert_in_sync(replica, catalog)
+    assert replica.resyncs == 1
+    assert not replica.poll()
+    catalog.close()
+    replica.close()
+
+
+def test_restarted_replica_catches_up_with_deltas_only(tmp_path):
+    catalog = open_catalog(tmp_path)
+    replica = bot.CatalogReplica(catalog.storage.path)
+    apply_random(catalog, random.Random(2), 10)
+    replica.poll()
+    saved = (dict(replica.films), replica.version, replica.checksum)
+    replica.close()
+
+    apply_random(catalog, random.Random(3), 10)
+    restarted = bot.CatalogReplica(catalog.storage.path, *saved)
+    restarted.poll()
+    assert_in_sync(restarted, catalog)
+    assert restarted.resyncs == 0
+    catalog.close()
+    restarted.close()
+
+
+def test_lagging_replica_reloads_the_snapshot_after_compaction(tmp_path):
+    catalog = open_catalog(tmp_path, compact_bytes=2000)
+    lagging = bot.CatalogReplica(catalog.storage.path)
+    lagging.poll()
+    base = log_base(catalog)
+
+    apply_random(catalog, random.Random(4), 60)
+    assert log_base(catalog) > base
+    lagging.poll()
+    assert_in_sync(lagging, catalog)
+    assert lagging.resyncs == 2
+    catalog.close()
+    lagging.close()
+
+
+def test_diverged_replica_resyncs_on_checksum_mismatch(tmp_path):
+    catalog = open_catalog(tmp_path)
+    apply_random(catalog, random.Random(5), 5)
+    replica = bot.CatalogReplica(catalog.storage.path)
+    replica.poll()
+    resyncs = replica.resyncs
+
+    # La copie diverge (par exemple modifiée par erreur) : la version suivante ne correspond plus
+    replica.films["Intrus"] = film(0)
+    replica.checksum = (replica.checksum + bot.film_checksum("Intrus", film(0))) % 2 ** 64
+    catalog.apply([("put", "Nouveau", film(1))])
+    replica.poll()
+    assert_in_sync(replica, catalog)
+    assert "Intrus" not in replica.films
+    assert replica.resyncs == resyncs + 1
+    catalog.close()
+    replica.close()
+
+
+def test_external_edit_rebases_the_feed(tmp_path):
+    catalog = open_catalog(tmp_path)
+    apply_random(catalog, random.Random(6), 5)
+    replica = bot.CatalogReplica(catalog.storage.path)
+    replica.poll()
+    version = catalog.feed.version
+    catalog.close()
+
+    # Le catalogue est modifié par un autre processus, flux désactivé
+    with open(catalog.storage.path, encoding="utf-8") as f:
+        data = json.load(f)
+    data["films"]["Externe"] = film(2, "Western")
+    with open(catalog.storage.path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+    catalog = open_catalog(tmp_path)
+    assert catalog.feed.version == version + 1
+    assert log_base(catalog) == version + 1
+    replica.poll()
+    assert_in_sync(replica, catalog)
+    assert "Externe" in replica.films
+
+    # Redémarrage sans modification : pas de nouvelle version
+    catalog.close()
+    catalog = open_catalog(tmp_path)
+    assert catalog.feed.version == version + 1
+    catalog.close()
+    replica.close()
+
+
+def test_partial_line_is_applied_once_complete(tmp_path):
+    catalog = open_catalog(tmp_path)
+    replica = bot.CatalogReplica(catalog.storage.path)
+    replica.poll()
+    catalog.apply([("put", "Alien", film(1))])
+    with open(catalog.feed.log_path, "rb") as f:
+        log = f.read()
+    last = log.rstrip(b"\n").rsplit(b"\n", 1)[1] + b"\n"
+    # Le processus du bot n'a écrit que la moitié de la dernière ligne
+    with open(catalog.feed.log_path, "wb") as f:
+        f.write(log[:-len(last)] + last[:len(last) // 2])
+    replica.poll()
+    assert "Alien" not in replica.films
+    with open(catalog.feed.log_path, "ab") as f:
+        f.write(last[len(last) // 2:])
+    replica.poll()
+    assert_in_sync(replica, catalog)
+    catalog.close()
+    replica.close()
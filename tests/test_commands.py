@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+import bot
+
+
+class FakeResponse:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, *args, **kwargs):
+        self.sent.append(kwargs)
+
+    async def defer(self, *args, **kwargs):
+        pass
+
+
+class FakeInteraction:
+    """Remplace `discord.Interaction` : seuls les attributs utilisés par les commandes existent."""
+
+    def __init__(self, guild_id):
+        self.guild_id = guild_id
+        self.response = FakeResponse()
+
+
+FILMS = {
+    "Le Seigneur des anneaux": {"lien": "N/A", "genre": ["Aventure", "Fantastique"], "description": "Un anneau unique."},
+    "Le Hobbit": {"lien": "N/A", "genre": ["Aventure", "Fantastique"], "description": "Un anneau et un dragon."},
+    "Heat": {"lien": "N/A", "genre": ["Crime", "Thriller"], "description": "Un braqueur et un policier."},
+}
+
+
+def run_similar(guild_id, nom_film):
+    film_catalog = bot.catalogs.get(guild_id)
+    bot.save_films(FILMS, film_catalog.storage.path)
+    interaction = FakeInteraction(guild_id)
+
+    async def scenario():
+        await film_catalog.refresh_async()
+        await bot.similar_command.callback(interaction, nom_film)
+
+    asyncio.run(scenario())
+    return interaction.response.sent[-1]["embed"]
+
+
+@pytest.mark.skipif(bot.np is None, reason="/similar nécessite NumPy")
+def test_similar_accepts_title_variants():
+    embed = run_similar("similar-variant", "seigneur des anneaux")
+    assert embed.title == "Films similaires à : Le Seigneur des anneaux"
+    assert "Le Hobbit" in embed.description
+
+
+@pytest.mark.skipif(bot.np is None, reason="/similar nécessite NumPy")
+def test_similar_suggests_close_titles():
+    embed = run_similar("similar-typo", "Le Hobit")
+    assert embed.title == "Film introuvable"
+    assert "Vouliez-vous dire : **Le Hobbit** ?" in embed.description
@@ -0,0 +1,84 @@
+import json
+import random
+
+import pytest
+
+import bot
+
+
+LINKS = ["N/A", "https://example.com/films/alien", "https://example.com/", "sans-slash", "https://a/b/c?d=e/f"]
+DESCRIPTIONS = ["Aucune description.", "Huit passagers.", "", "é" * 50]
+
+
+def random_film(rng):
+    genres = rng.sample(bot.GENRES, rng.randint(0, 4))
+    if rng.random() < 0.2:
+        genres.append("Policier")
+    return {
+        "lien": rng.choice(LINKS),
+        "genre": genres or ["Non spécifié"],
+        "description": rng.choice(DESCRIPTIONS),
+    }
+
+
+def canonical(film_info):
+    """Oracle : genres de GENRES dans l'ordre de GENRES, puis les autres dans leur ordre d'origine."""
+    known = [g for g in bot.GENRES if g in film_info["genre"]]
+    others = [g for g in film_info["genre"] if g not in bot.GENRES and g != "Non spécifié"]
+    return {**film_info, "genre": known + others or ["Non spécifié"]}
+
+
+def test_round_trip_through_dict_and_json():
+    rng = random.Random(0)
+    for _ in range(500):
+        film_info = random_film(rng)
+        record = bot.FilmRecord.from_dict(film_info)
+        assert record.to_dict() == canonical(film_info)
+        assert record == canonical(film_info)
+        assert bot.FilmRecord.from_dict(record.to_dict()) == record
+        dumped = json.dumps(record, default=bot.film_json_default)
+        assert bot.FilmRecord.from_dict(json.loads(dumped)) == record
+
+
+def test_reads_like_a_dict():
+    record = bot.FilmRecord.from_dict({"lien": "https://example.com/alien", "genre": ["Horreur"]})
+    assert record["lien"] == "https://example.com/alien"
+    assert record.get("description") == "Aucune description."
+    assert record.get("inconnu", 42) == 42
+    assert dict(record) == record.copy() == record.to_dict()
+    with pytest.raises(KeyError):
+        record["inconnu"]
+    copy = record.copy()
+    copy["genre"].append("Drame")
+    assert record["genre"] == ["Horreur"]
+
+
+def test_defaults_are_stored_as_none():
+    record = bot.FilmRecord.from_dict({"lien": "N/A", "genre": ["Non spécifié"], "description": "Aucune description."})
+    assert (record.mask, record.link_prefix, record.description, record.other_genres) == (0, None, None, None)
+    assert bot.FilmRecord.from_dict({}).to_dict() == {
+        "lien": "N/A", "genre": ["Non spécifié"], "description": "Aucune description.",
+    }
+
+
+def test_link_prefix_is_shared():
+    first = bot.FilmRecord.from_dict({"lien": "https://example.com/films/" + "alien"})
+    second = bot.FilmRecord.from_dict({"lien": "https://example.com/films/" + "heat"})
+    assert first.link_prefix is second.link_prefix
+    assert (first.link, second.link) == ("https://example.com/films/alien", "https://example.com/films/heat")
+
+
+def test_duplicate_and_string_genres():
+    record = bot.FilmRecord.from_dict({"genre": ["Drame", "Action", "Drame", "Policier", "Policier"]})
+    assert record["genre"] == ["Action", "Drame", "Policier"]
+    assert bot.FilmRecord.from_dict({"genre": "Western"})["genre"] == ["Western"]
+
+
+def test_link_state_is_not_saved(tmp_path):
+    record = bot.FilmRecord.from_dict({"lien": "https://example.com/alien"})
+    record.link_state = "dead"
+    path = str(tmp_path / "films.json")
+    bot.save_films({"Alien": record}, path)
+    assert bot.load_films(path) == {
+        "Alien": {"lien": "https://example.com/alien", "genre": ["Non spécifié"], "description": "Aucune description."},
+    }
@@ -0,0 +1,37 @@
+import random
+
+import bot
+
+
+def test_removed_slots_are_reclaimed_by_compaction():
+    index = bot.GenreIndex()
+    for i in range(3000):
+        index.add(f"Film {i}", ["Action"] if i % 2 else ["Drame", "Horreur"])
+    for i in range(2900):
+        index.remove(f"Film {i}")
+    assert index.generation == 1
+    assert len(index._names) < 3000
+    assert len(index) == 100
+    assert list(index.names(index.matching(["Action"]))) == [f"Film {i}" for i in range(2901, 3000, 2)]
+    assert list(index.names(index.matching(["Drame", "Horreur"]))) == [f"Film {i}" for i in range(2900, 3000, 2)]
+    # Les films ajoutés après le compactage prennent les positions suivantes
+    index.add("Nouveau", ["Action"])
+    assert list(index.names(index.matching(["Action"])))[-1] == "Nouveau"
+    assert index.sample_many(["Comédie"], 3) == []
+
+
+def test_catalog_rebuilds_slot_structures_after_compaction(tmp_path):
+    catalog = bot.FilmCatalog(bot.JsonStorage(str(tmp_path / "films.json")), change_feed=False)
+    catalog.refresh()
+    catalog.apply([
+        ("put", f"Film {i}", {"lien": f"https://example.org/{i}", "genre": ["Action"], "description": "x"})
+        for i in range(2500)
+    ])
+    catalog._set_link_state("Film 2499", catalog.films["Film 2499"], "dead")
+    catalog.apply([("delete", f"Film {i}") for i in range(2400)])
+    assert catalog.genre_index.generation == 1
+    assert catalog.dead_links == 1 << catalog.genre_index._slot_of["Film 2499"]
+    rng = random.Random(0)
+    picks = {catalog.picker.pick(["Action"], weighted=True, rng=rng, exclude=catalog.dead_links) for _ in range(200)}
+    assert picks <= {f"Film {i}" for i in range(2400, 2499)}
+    catalog.writer.flush_sync()
@@ -0,0 +1,248 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+import bot
+
+
+def records(text, filename="films.json"):
+    return list(bot.iter_import_records(text.encode("utf-8"), filename))
+
+
+def reader(text, chunk_size=bot.IMPORT_CHUNK_SIZE):
+    return bot._JsonStreamReader(io.StringIO(text), chunk_size)
+
+
+# --- _iter_json_object / _iter_films_object ---
+
+def test_json_object_pairs_in_order():
+    text = '{"Alien": {"lien": "N/A"}, "Heat": "https://example.com/heat", "Vide": {}}'
+    assert list(bot._iter_json_object(reader(text))) == [
+        ("Alien", {"lien": "N/A"}),
+        ("Heat", "https://example.com/heat"),
+        ("Vide", {}),
+    ]
+    assert list(bot._iter_json_object(reader(" { } "))) == []
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7])
+def test_json_object_values_split_across_chunks(chunk_size):
+    films = {
+        "Alien": {"lien": "N/A", "genre": ["Horreur"], "description": "é" * 20},
+        "Nombre": 123456789,
+        "Vrai": True,
+    }
+    text = json.dumps(films, ensure_ascii=False, indent=2)
+    assert dict(bot._iter_json_object(reader(text, chunk_size))) == films
+
+
+@pytest.mark.parametrize("text", ["[1, 2]", '{"Alien" {}}', '{"Alien": {}', '{"Alien": {} "Heat": {}}', ""])
+def test_json_object_rejects_malformed_input(text):
+    with pytest.raises(ValueError):
+        list(bot._iter_json_object(reader(text)))
+
+
+def test_legacy_json_shape():
+    text = json.dumps({
+        "Alien": "https://example.com/alien",
+        "Heat": {"lien": "N/A", "genre": "Action, Crime"},
+    })
+    assert records(text) == [
+        ("Alien", "https://example.com/alien"),
+        ("Heat", {"lien": "N/A", "genre": "Action, Crime"}),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [5, bot.IMPORT_CHUNK_SIZE])
+def test_current_json_shape_is_read_film_by_film(monkeypatch, chunk_size):
+    monkeypatch.setattr(bot, "IMPORT_CHUNK_SIZE", chunk_size)
+    films = {f"Film {i}": {"lien": "N/A", "genre": ["Drame"], "description": "x"} for i in range(50)}
+    text = json.dumps({"schema_version": bot.FILMS_SCHEMA_VERSION, "films": films})
+    assert records(text) == list(films.items())
+
+
+def test_films_key_without_schema_version_is_a_wrapper_only_if_every_value_is_an_object():
+    # Un ancien fichier peut contenir un film nommé « films »
+    assert records('{"films": "https://example.com/films"}') == [("films", "https://example.com/films")]
+    assert records('{"films": {"Alien": {"lien": "N/A"}}}') == [("Alien", {"lien": "N/A"})]
+
+
+def test_utf8_bom_is_ignored():
+    data = "﻿{\"Amélie\": {}}".encode("utf-8")
+    assert list(bot.iter_import_records(data, "films.json")) == [("Amélie", {})]
+
+
+# --- _iter_csv ---
+
+def test_csv_with_header():
+    text = "nom,lien,genres,description\nAlien,N/A,\"Horreur, Science-fiction\",Huit passagers\n"
+    assert records(text, "films.csv") == [
+        ("Alien", {"lien": "N/A", "genre": "Horreur, Science-fiction", "description": "Huit passagers"}),
+    ]
+
+
+def test_csv_without_header_and_short_rows():
+    text = "Alien,https://example.com/alien\n\n,ignoré\nHeat\n"
+    assert records(text, "films.csv") == [
+        ("Alien", {"lien": "https://example.com/alien", "genre": "", "description": ""}),
+        ("Heat", {"lien": "", "genre": "", "description": ""}),
+    ]
+
+
+def test_csv_header_is_only_the_first_row():
+    # Régression : une ligne « Nom, Lien » après la première est un film
+    text = "Alien,N/A\nNom,Lien\n"
+    assert [name for name, _ in records(text, "films.csv")] == ["Alien", "Nom"]
+
+
+def test_csv_multiline_description():
+    text = 'Alien,N/A,Horreur,"ligne 1\r\nligne 2"\r\n'
+    assert records(text, "films.csv") == [
+        ("Alien", {"lien": "N/A", "genre": "Horreur", "description": "ligne 1\r\nligne 2"}),
+    ]
+
+
+# --- _iter_jsonl ---
+
+def test_jsonl_skips_blank_lines_and_keeps_non_objects_as_invalid():
+    text = '{"nom": "Alien", "genre": "Horreur"}\n\n[1]\n{"lien": "N/A"}\n'
+    assert records(text, "films.jsonl") == [
+        ("Alien", {"nom": "Alien", "genre": "Horreur"}),
+        ("", [1]),
+        ("", {"lien": "N/A"}),
+    ]
+
+
+def test_jsonl_malformed_line_raises():
+    with pytest.raises(ValueError):
+        records('{"nom": "Alien"}\n{"nom": \n', "films.ndjson")
+
+
+# --- normalize_import_record ---
+
+def test_normalize_legacy_link_only():
+    assert bot.normalize_import_record("https://example.com/alien") == (
+        {"lien": "https://example.com/alien", "genre": ["Non spécifié"], "description": "Aucune description."},
+        0,
+    )
+
+
+def test_normalize_genres_and_defaults():
+    info, rejected = bot.normalize_import_record({
+        "lien": "  ",
+        "genre": "horreur, Inconnu, HORREUR, , science-fiction",
+        "description": None,
+    })
+    assert info == {"lien": "N/A", "genre": ["Horreur", "Science-fiction"], "description": "Aucune description."}
+    assert rejected == 1
+
+
+@pytest.mark.parametrize("info", [
+    {"genre": ["Horreur", 3]},
+    {"genre": [None]},
+    {"genre": 42},
+    {"lien": 42},
+    {"description": ["x"]},
+])
+def test_normalize_rejects_mistyped_fields(info):
+    # Régression : des genres qui ne sont pas des textes faisaient échouer tout l'import
+    assert bot.normalize_import_record(info) == (None, 0)
+
+
+# --- prepare_import ---
+
+def test_prepare_import_counts_duplicates_and_invalid_entries():
+    entries = [
+        ("Alien", {"genre": "Horreur, Inconnu"}),
+        ("ALIEN", {"genre": "Drame"}),
+        ("  ", {}),
+        ("Heat", 42),
+        ("Ronin", {"genre": [1]}),
+        (" Heat ", "https://example.com/heat"),
+    ]
+    ops, counts = bot.prepare_import(iter(entries))
+    assert [op[1] for op in ops] == ["Alien", "Heat"]
+    assert ops[0][2]["genre"] == ["Horreur"]
+    assert counts == {"ajoutés": 2, "doublons": 1, "invalides": 3, "genres ignorés": 1}
+
+
+def test_prepare_import_batches_large_inputs(monkeypatch):
+    monkeypatch.setattr(bot, "IMPORT_BATCH_SIZE", 3)
+    entries = ((f"Film {i % 7}", {}) for i in range(20))
+    ops, counts = bot.prepare_import(entries)
+    assert len(ops) == 7
+    assert counts["doublons"] == 13
+
+
+# --- /import ---
+
+class FakeAttachment:
+    def __init__(self, filename, data, size=None):
+        self.filename = filename
+        self.data = data
+        self.size = len(data) if size is None else size
+
+    async def read(self):
+        return self.data
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, *args, **kwargs):
+        self.sent.append(kwargs)
+
+
+class FakeResponse:
+    def __init__(self):
+        self.sent = []
+        self.deferred = False
+
+    async def send_message(self, *args, **kwargs):
+        self.sent.append(kwargs)
+
+    async def defer(self, *args, **kwargs):
+        self.deferred = True
+
+
+class FakeInteraction:
+    def __init__(self, guild_id):
+        self.guild_id = guild_id
+        self.response = FakeResponse()
+        self.followup = FakeFollowup()
+
+
+def run_import(guild_id, attachment):
+    interaction = FakeInteraction(guild_id)
+
+    async def scenario():
+        await bot.import_command.callback(interaction, attachment)
+        await bot.catalogs.get(guild_id).flush()
+
+    asyncio.run(scenario())
+    return interaction
+
+
+def test_import_skips_films_already_in_the_catalog():
+    guild_id = "import-dedupe"
+    catalog = bot.catalogs.get(guild_id)
+    bot.save_films({"Alien": {"lien": "N/A", "genre": ["Horreur"], "description": "x"}}, catalog.storage.path)
+    asyncio.run(catalog.refresh_async())
+    data = json.dumps({"alien": {}, "Heat": {"genre": "Crime"}}).encode("utf-8")
+    interaction = run_import(guild_id, FakeAttachment("films.json", data))
+    embed = interaction.followup.sent[-1]["embed"]
+    assert embed.title == "Import terminé"
+    assert embed.fields[0].value == "1"
+    assert sorted(catalog.films) == ["Alien", "Heat"]
+
+
+def test_import_rejects_files_over_the_size_limit():
+    guild_id = "import-too-large"
+    attachment = FakeAttachment("films.json", b"{}", size=bot.IMPORT_MAX_BYTES + 1)
+    interaction = run_import(guild_id, attachment)
+    assert not interaction.response.deferred
+    assert interaction.response.sent[-1]["embed"].title == "Import impossible"
+    assert "trop volumineux" in interaction.response.sent[-1]["embed"].description
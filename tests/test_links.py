@@ -0,0 +1,229 @@
+import asyncio
+import contextlib
+from collections import Counter
+
+import aiohttp
+from aiohttp import web
+
+import bot
+
+
+class StubSite:
+    """Serveur HTTP local : /ok/{n}, /dead/{n}, /slow/{n}, /flaky/{n} (503 puis 200), /busy/{n} (429),
+    /unchanged/{n} (304, même sans requête conditionnelle)."""
+
+    def __init__(self, slow_seconds=1.0, flaky_failures=2):
+        self.slow_seconds = slow_seconds
+        self.flaky_failures = flaky_failures
+        self.requests = []
+        self.port = None
+
+    async def handle(self, request):
+        kind = request.match_info["kind"]
+        self.requests.append((request.method, request.path, dict(request.headers)))
+        if kind == "dead":
+            return web.Response(status=404)
+        if kind == "slow":
+            await asyncio.sleep(self.slow_seconds)
+        if kind == "busy":
+            return web.Response(status=429, headers={"Retry-After": "7"})
+        if kind == "unchanged":
+            return web.Response(status=304)
+        if kind == "flaky" and sum(path == request.path for _, path, _ in self.requests) <= self.flaky_failures:
+            return web.Response(status=503)
+        etag = f'"{request.match_info["n"]}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304)
+        return web.Response(headers={"ETag": etag, "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+
+    def url(self, kind, n=1):
+        return f"http://127.0.0.1:{self.port}/{kind}/{n}"
+
+
+@contextlib.asynccontextmanager
+async def stub_site(**kwargs):
+    site = StubSite(**kwargs)
+    app = web.Application()
+    app.router.add_route("*", "/{kind}/{n}", site.handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    tcp_site = web.TCPSite(runner, "127.0.0.1", 0)
+    await tcp_site.start()
+    site.port = tcp_site._server.sockets[0].getsockname()[1]
+    try:
+        yield site
+    finally:
+        await runner.cleanup()
+
+
+def no_wait(monkeypatch):
+    """Remplace le délai entre deux tentatives par 0 et retourne la liste des (tentative, Retry-After) demandés."""
+    delays = []
+
+    def fake_retry_delay(attempt, retry_after=None, backoff=1.0, max_delay=60):
+        delays.append((attempt, retry_after))
+        return 0
+
+    monkeypatch.setattr(bot, "retry_delay", fake_retry_delay)
+    return delays
+
+
+def test_ok_link_keeps_validators():
+    async def scenario():
+        async with stub_site() as site:
+            statuses = {}
+            await bot.LinkChecker().check([site.url("ok")], statuses)
+            return site, statuses[site.url("ok")]
+
+    site, status = asyncio.run(scenario())
+    assert status.state == "ok"
+    assert status.etag == '"1"'
+    assert status.last_modified == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert [method for method, _, _ in site.requests] == ["HEAD"]
+
+
+def test_not_modified_link_is_confirmed_with_conditional_request():
+    async def scenario():
+        async with stub_site() as site:
+            url = site.url("ok")
+            statuses = {url: bot.LinkStatus("ok", 0, '"1"', "Mon, 01 Jan 2024 00:00:00 GMT")}
+            await bot.LinkChecker().check([url], statuses)
+            return site, statuses[url]
+
+    site, status = asyncio.run(scenario())
+    _, _, headers = site.requests[0]
+    assert headers["If-None-Match"] == '"1"'
+    assert headers["If-Modified-Since"] == "Mon, 01 Jan 2024 00:00:00 GMT"
+    assert status.state == "ok"
+    assert status.checked > 0
+    assert status.etag == '"1"'
+
+
+def test_unsolicited_not_modified_is_not_a_valid_link(monkeypatch):
+    delays = no_wait(monkeypatch)
+    previous_states = [None, bot.LinkStatus("error", 0, '"1"', failures=1), bot.LinkStatus("dead", 0, '"1"')]
+
+    async def scenario():
+        async with stub_site() as site:
+            url = site.url("unchanged")
+            results = []
+            for previous in previous_states:
+                statuses = {} if previous is None else {url: previous}
+                await bot.LinkChecker(retries=1).check([url], statuses)
+                results.append(statuses[url])
+            return site, results
+
+    site, (new, error, dead) = asyncio.run(scenario())
+    # Aucune requête conditionnelle : un 304 ne confirme rien et compte comme une erreur temporaire
+    assert all("If-None-Match" not in headers for _, _, headers in site.requests)
+    assert (new.state, new.failures, new.etag) == ("error", 1, None)
+    assert (error.state, error.failures) == ("error", 2)
+    assert dead.state == "error"
+    assert len(delays) == 3
+
+
+def test_not_found_link_is_dead_without_retry(monkeypatch):
+    delays = no_wait(monkeypatch)
+
+    async def scenario():
+        async with stub_site() as site:
+            statuses = {}
+            await bot.LinkChecker().check([site.url("dead")], statuses)
+            return site, statuses[site.url("dead")]
+
+    site, status = asyncio.run(scenario())
+    assert status.state == "dead"
+    assert len(site.requests) == 1
+    assert delays == []
+
+
+def test_timeout_counts_as_failure_until_max_failures(monkeypatch):
+    delays = no_wait(monkeypatch)
+    checker = bot.LinkChecker(timeout=0.1, retries=1)
+
+    async def scenario(previous):
+        async with stub_site(slow_seconds=1.0) as site:
+            statuses = {} if previous is None else {site.url("slow"): previous}
+            await checker.check([site.url("slow")], statuses)
+            return statuses[site.url("slow")]
+
+    status = asyncio.run(scenario(None))
+    assert status.state == "error"
+    assert status.failures == 1
+    assert delays == [(0, None)]
+
+    previous = bot.LinkStatus("error", 0, failures=bot.LINK_CHECK_MAX_FAILURES - 1)
+    assert asyncio.run(scenario(previous)).state == "dead"
+
+
+def test_server_errors_are_retried_with_backoff(monkeypatch):
+    delays = no_wait(monkeypatch)
+
+    async def scenario():
+        async with stub_site(flaky_failures=2) as site:
+            statuses = {}
+            await bot.LinkChecker(retries=3).check([site.url("flaky"), site.url("busy")], statuses)
+            return statuses[site.url("flaky")], statuses[site.url("busy")]
+
+    flaky, busy = asyncio.run(scenario())
+    assert flaky.state == "ok"
+    assert busy.state == "error"
+    # 503 deux fois puis 200 ; 429 à chaque tentative, avec Retry-After transmis
+    assert Counter(delays) == Counter([(0, None), (1, None), (0, "7"), (1, "7"), (2, "7")])
+
+
+def test_retry_delay_is_exponential_and_bounded():
+    for attempt in range(4):
+        delay = bot.retry_delay(attempt, backoff=1.0)
+        assert 0.5 * 2 ** attempt <= delay <= 1.5 * 2 ** attempt
+    assert bot.retry_delay(0, "30", backoff=0.01) == 30
+    assert bot.retry_delay(0, "3600") == 60
+    assert bot.retry_delay(10, backoff=1.0, max_delay=5) == 5
+
+
+def test_invalid_url_is_dead():
+    async def scenario():
+        async with aiohttp.ClientSession() as session:
+            return await bot.LinkChecker().check_one(session, "http://")
+
+    assert asyncio.run(scenario()).state == "dead"
+
+
+class FakeCatalog:
+    def __init__(self, result):
+        self.result = result
+        self.checking_links = False
+        self.calls = 0
+
+    async def check_links(self, checker, max_age):
+        self.calls += 1
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class StopLoop(Exception):
+    pass
+
+
+def test_periodic_check_survives_a_failing_catalog(monkeypatch, capsys):
+    broken = FakeCatalog(OSError("disque plein"))
+    healthy = FakeCatalog((3, 2, 1))
+    monkeypatch.setattr(bot.catalogs, "loaded", lambda: [(1, broken), (2, healthy)])
+    passes = []
+
+    async def fake_sleep(delay):
+        passes.append(delay)
+        if len(passes) == 2:
+            raise StopLoop
+
+    monkeypatch.setattr(bot.asyncio, "sleep", fake_sleep)
+    try:
+        asyncio.run(bot.check_links_periodically())
+    except StopLoop:
+        pass
+    # Deux passages complets : le catalogue en erreur est repris au passage suivant
+    assert (broken.calls, healthy.calls) == (2, 2)
+    output = capsys.readouterr().out
+    assert "Erreur lors de la vérification des liens du serveur 1 (OSError) : disque plein" in output
+    assert "Liens du serveur 2 : 3 vérifié(s)" in output
@@ -0,0 +1,148 @@
+import asyncio
+import json
+
+import pytest
+
+import bot
+
+FIXTURE = {
+    "Le Lorax": {"description": "Ted part à la recherche d'un arbre.", "annee": 2012, "genre": ["Animation", "Family"]},
+    "Prisoners": {"description": "Deux fillettes disparaissent.", "annee": 2013, "genre": ["Crime", "Drama", "Thriller"]},
+    "Alien": {"description": "Un huitième passager.", "annee": 1979, "genre": ["Horror", "Science Fiction", "Musique"]},
+}
+
+
+class CountingProvider(bot.FixtureMetadataProvider):
+    """Fournisseur de test qui retient les titres demandés."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.requested = []
+
+    async def fetch_many(self, session, titles):
+        self.requested.extend(titles)
+        return await super().fetch_many(session, titles)
+
+
+@pytest.fixture
+def fixture_path(tmp_path):
+    path = tmp_path / "fixture.json"
+    path.write_text(json.dumps(FIXTURE), encoding="utf-8")
+    return str(path)
+
+
+def make_fetcher(provider, cache_path):
+    return bot.MetadataFetcher(provider, bot.MetadataCache(cache_path), delay=0)
+
+
+def test_genre_aliases_are_mapped_to_catalog_genres():
+    assert bot.map_genre_names(["Drama", "science fiction", "Sci-Fi", "Comédie", "Musique", "drama"]) == [
+        "Drame", "Science-fiction", "Comédie",
+    ]
+    assert bot.map_genre_names(["ACTION", "Horror"]) == ["Action", "Horreur"]
+
+
+def test_fixture_provider_matches_titles_by_key(fixture_path):
+    provider = bot.FixtureMetadataProvider(fixture_path)
+    results = asyncio.run(provider.fetch_many(None, ["le lorax", "ALIEN", "Inconnu"]))
+    assert results["le lorax"].year == 2012
+    assert results["le lorax"].genres == ("Animation", "Familial")
+    assert results["ALIEN"].genres == ("Horreur", "Science-fiction")
+    assert results["Inconnu"] is None
+
+
+def test_cache_miss_then_hit(fixture_path, tmp_path):
+    cache_path = str(tmp_path / "metadata.json")
+    provider = CountingProvider(fixture_path)
+    fetcher = make_fetcher(provider, cache_path)
+
+    async def scenario():
+        first = await fetcher.fetch(["Prisoners", "Inconnu"])
+        second = await fetcher.fetch(["Prisoners", "Inconnu"])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert sorted(provider.requested) == ["Inconnu", "Prisoners"]
+    assert (fetcher.misses, fetcher.hits) == (2, 2)
+    assert first["Prisoners"].genres == ("Crime", "Drame", "Thriller")
+    assert second["Prisoners"].description == "Deux fillettes disparaissent."
+    # Un film introuvable est retenu comme tel et n'est pas redemandé
+    assert first["Inconnu"] is None and second["Inconnu"] is None
+
+    # Le cache enregistré est relu par un nouveau processus sans interroger le fournisseur
+    fetcher.close()
+    provider = CountingProvider(fixture_path)
+    fetcher = make_fetcher(provider, cache_path)
+    results = asyncio.run(fetcher.fetch(["prisoners"]))
+    assert provider.requested == []
+    assert results["prisoners"].year == 2013
+
+
+def test_stale_entries_are_requested_again(fixture_path, tmp_path):
+    provider = CountingProvider(fixture_path)
+    fetcher = make_fetcher(provider, str(tmp_path / "metadata.json"))
+    fetcher.cache.ttl = fetcher.cache.miss_ttl = 0
+
+    async def scenario():
+        await fetcher.fetch(["Alien"])
+        return await fetcher.fetch(["Alien"])
+
+    results = asyncio.run(scenario())
+    assert provider.requested == ["Alien", "Alien"]
+    assert results["Alien"].year == 1979
+
+
+def test_concurrent_requests_for_a_title_are_shared(fixture_path, tmp_path):
+    provider = CountingProvider(fixture_path)
+    fetcher = make_fetcher(provider, str(tmp_path / "metadata.json"))
+
+    async def scenario():
+        return await asyncio.gather(fetcher.fetch(["Alien"]), fetcher.fetch(["alien"]))
+
+    first, second = asyncio.run(scenario())
+    assert provider.requested == ["Alien"]
+    assert fetcher.deduplicated == 1
+    assert first["Alien"].year == second["alien"].year == 1979
+
+
+def record(genres, description="Aucune description."):
+    return bot.FilmRecord.from_dict({"lien": "N/A", "genre": genres, "description": description})
+
+
+def test_enrichment_fills_missing_fields_only():
+    films = {
+        "Alien": record(["Non spécifié"]),
+        "Prisoners": record(["Drame"], "Déjà décrit."),
+        "Inconnu": record(["Action"]),
+    }
+    results = {
+        "Alien": bot.FilmMetadata("Un huitième passager.", genres=["Horreur", "Science-fiction"]),
+        "Prisoners": bot.FilmMetadata("Deux fillettes disparaissent.", genres=["Crime", "Thriller"]),
+        "Inconnu": None,
+    }
+    ops = bot.enrichment_ops(films, results)
+    assert ops == [("put", "Alien", {
+        "lien": "N/A", "genre": ["Horreur", "Science-fiction"], "description": "Un huitième passager.",
+    })]
+
+
+def test_enrichment_replaces_genres_when_asked():
+    films = {
+        "Prisoners": record(["Drame", "Film noir"], "Déjà décrit."),
+        "Alien": record(["Film culte"]),
+    }
+    results = {
+        "Prisoners": bot.FilmMetadata(genres=["Crime", "Thriller"]),
+        "Alien": bot.FilmMetadata(genres=["Horreur"]),
+    }
+    # Sans remplacer_genres, seuls les films sans genre de GENRES reçoivent ceux du fournisseur
+    assert bot.enrichment_ops(films, results) == [
+        ("put", "Alien", {"lien": "N/A", "genre": ["Horreur", "Film culte"], "description": "Aucune description."}),
+    ]
+    assert bot.enrichment_ops(films, results, replace_genres=True) == [
+        ("put", "Prisoners", {"lien": "N/A", "genre": ["Crime", "Thriller"], "description": "Déjà décrit."}),
+        ("put", "Alien", {"lien": "N/A", "genre": ["Horreur"], "description": "Aucune description."}),
+    ]
+    # Mêmes genres dans un autre ordre : rien à écrire
+    same = {"Prisoners": bot.FilmMetadata(genres=["Drame"])}
+    assert bot.enrichment_ops({"Prisoners": record(["Drame"], "x")}, same, replace_genres=True) == []
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import os
+
+import bot
+
+
+def load(index):
+    async def scenario():
+        await index.load()
+        await index.writer.flush()
+
+    asyncio.run(scenario())
+    return index
+
+
+def write_members(path, polls):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"watchlist": {}, "polls": polls}, f)
+
+
+def test_index_is_kept_across_restarts(tmp_path):
+    path = str(tmp_path / "open_polls.json")
+    index = load(bot.OpenPollIndex(path, delay=0))
+    # Hors boucle d'événements, chaque modification est écrite immédiatement
+    index.add(1, bot.Poll("a", ["Alien", "Heat"], 10, message_id=100))
+    index.add(2, bot.Poll("b", ["Ça", "Heat"], 20, message_id=200))
+    index.remove("a")
+    index.remove("inconnu")
+    restarted = load(bot.OpenPollIndex(path))
+    assert restarted.polls == {"b": [2, 200, ["Ça", "Heat"]]}
+
+
+def test_missing_index_is_rebuilt_from_member_files(tmp_path, monkeypatch):
+    films_dir = tmp_path / "guilds"
+    monkeypatch.setattr(bot, "FILMS_DIR", str(films_dir))
+    monkeypatch.setattr(bot, "LEGACY_GUILD_ID", None)
+    write_members(str(films_dir / "111" / "films.members.json"), {
+        "a": {"candidates": ["Alien", "Heat"], "author": 1, "message": 100, "votes": {"5": 0}},
+        # Message jamais envoyé : pas de boutons à réenregistrer
+        "b": {"candidates": ["Alien", "Heat"], "author": 1, "message": None, "votes": {}},
+    })
+    write_members(str(films_dir / "222" / "films.members.json"), {
+        "c": {"candidates": ["Ça", "Heat"], "author": 2, "message": 300, "votes": {}},
+    })
+    os.makedirs(films_dir / "pas-un-serveur")
+    path = str(tmp_path / "open_polls.json")
+    index = load(bot.OpenPollIndex(path))
+    expected = {"a": [111, 100, ["Alien", "Heat"]], "c": [222, 300, ["Ça", "Heat"]]}
+    assert index.polls == expected
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == expected
+
+
+def test_every_open_poll_is_restored_without_loading_catalogs(tmp_path, monkeypatch):
+    path = str(tmp_path / "open_polls.json")
+    index = bot.OpenPollIndex(path, delay=0)
+    for guild_id in range(5):
+        index.add(guild_id, bot.Poll(f"p{guild_id}", ["Alien", "Heat", "Ça"], 1, message_id=1000 + guild_id))
+    monkeypatch.setattr(bot, "open_polls", bot.OpenPollIndex(path))
+    monkeypatch.setattr(bot.catalogs, "maxsize", 1)
+    registered = {}
+    monkeypatch.setattr(bot.client, "add_view", lambda view, message_id: registered.setdefault(message_id, view))
+    loaded = len(bot.catalogs)
+
+    asyncio.run(bot.restore_poll_views())
+    assert sorted(registered) == [1000, 1001, 1002, 1003, 1004]
+    view = registered[1003]
+    assert view.poll_id == "p3"
+    assert [item.custom_id for item in view.children] == ["poll:p3:0", "poll:p3:1", "poll:p3:2", "poll:p3:close"]
+    assert len(bot.catalogs) == loaded
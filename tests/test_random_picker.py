@@ -0,0 +1,172 @@
+import random
+from collections import Counter
+
+import pytest
+
+import bot
+
+
+# --- FenwickTree ---
+
+def brute_find(weights, target):
+    """Oracle : position p telle que somme(poids[:p]) <= target < somme(poids[:p + 1])."""
+    running = 0
+    for position, weight in enumerate(weights):
+        running += weight
+        if target < running:
+            return position
+    raise AssertionError("cible hors de la somme des poids")
+
+
+def assert_matches_brute_force(tree, weights):
+    assert len(tree) == len(weights)
+    assert tree.total == sum(weights)
+    for i in range(len(weights) + 1):
+        assert tree._prefix(i) == sum(weights[:i])
+    for target in range(sum(weights)):
+        assert tree.find(target) == brute_find(weights, target)
+
+
+def test_fenwick_tree_matches_brute_force():
+    rng = random.Random(0)
+    weights = [rng.choice([0, 0, 1, 2, 5, 30]) for _ in range(37)]
+    tree = bot.FenwickTree(weights)
+    assert_matches_brute_force(tree, weights)
+    for _ in range(200):
+        if rng.random() < 0.3:
+            weights.append(rng.randrange(10))
+            tree.append(weights[-1])
+        else:
+            index = rng.randrange(len(weights))
+            weights[index] = rng.randrange(10)
+            tree.set(index, weights[index])
+        assert tree.weight(len(weights) - 1) == weights[-1]
+    assert_matches_brute_force(tree, weights)
+
+
+def test_fenwick_tree_built_by_appends_equals_bulk_build():
+    weights = [(i * 7) % 11 for i in range(100)]
+    tree = bot.FenwickTree()
+    for weight in weights:
+        tree.append(weight)
+    assert tree._tree == bot.FenwickTree(weights)._tree
+
+
+# --- RandomPicker ---
+
+class CyclingRandom:
+    """Faux générateur : `randrange(n)` parcourt 0, 1, …, n - 1 puis recommence (tirage exhaustif)."""
+
+    def __init__(self):
+        self.next = {}
+
+    def randrange(self, n):
+        value = self.next.get(n, 0)
+        self.next[n] = (value + 1) % n
+        return value
+
+
+def make_picker(genres_by_name, window=0, counts=None):
+    index = bot.GenreIndex()
+    for name, genres in genres_by_name.items():
+        index.add(name, genres)
+    return bot.RandomPicker(index, bot.PickHistory(window, counts=dict(counts or {})))
+
+
+def slot_weights(picker, slots):
+    return {picker.genre_index._names[slot]: picker.tree.weight(slot) for slot in slots}
+
+
+def weighted_setup():
+    films = {f"Film {i}": ["Action"] if i % 3 else ["Drame"] for i in range(12)}
+    picker = make_picker(films, counts={f"Film {i}": i for i in range(12)})
+    candidates = picker.genre_index.matching(["Action"])
+    return picker, candidates, slot_weights(picker, [slot for slot in range(12) if candidates >> slot & 1])
+
+
+def test_weighted_slot_exact_path_is_proportional_to_weights(monkeypatch):
+    # Sans rejet, seul le tirage exact parmi les candidats est utilisé : tirage exhaustif des valeurs
+    monkeypatch.setattr(bot.RandomPicker, "MAX_REJECTIONS", 0)
+    picker, candidates, weights = weighted_setup()
+    rng = CyclingRandom()
+    picks = Counter(
+        picker.genre_index._names[picker._weighted_slot(candidates, rng)] for _ in range(sum(weights.values()))
+    )
+    assert picks == weights
+
+
+def test_weighted_slot_rejection_path_is_proportional_to_weights(monkeypatch):
+    # Rejet seul (jamais de repli sur le tirage exact) : fréquences comparées aux poids
+    monkeypatch.setattr(bot.RandomPicker, "MAX_REJECTIONS", 10 ** 6)
+    picker, candidates, weights = weighted_setup()
+    rng = random.Random(0)
+    draws = 30000
+    picks = Counter(picker.genre_index._names[picker._weighted_slot(candidates, rng)] for _ in range(draws))
+    assert set(picks) == set(weights)
+    total = sum(weights.values())
+    for name, weight in weights.items():
+        assert picks[name] / draws == pytest.approx(weight / total, abs=0.01)
+
+
+def test_weighted_pick_frequencies_follow_pick_counts():
+    films = {f"Film {i}": ["Action"] for i in range(4)}
+    picker = make_picker(films, counts={"Film 0": 0, "Film 1": 1, "Film 2": 3, "Film 3": 11})
+    expected = {name: picker._weight(name) for name in films}
+    assert expected == {"Film 0": 2520, "Film 1": 1260, "Film 2": 630, "Film 3": 210}
+    rng = random.Random(1)
+    counts = picker.history.counts
+    picks = Counter()
+    for _ in range(20000):
+        name = picker.pick(["Action"], weighted=True, rng=rng)
+        picks[name] += 1
+        # Remet le compteur à sa valeur de départ : les poids restent fixes pendant l'échantillonnage
+        counts[name] -= 1
+        picker.add(name)
+    total = sum(expected.values())
+    for name, weight in expected.items():
+        assert picks[name] / 20000 == pytest.approx(weight / total, abs=0.015)
+
+
+def test_picked_films_get_lighter():
+    picker = make_picker({"Alien": ["Horreur"], "Heat": ["Crime"]})
+    before = picker.tree.weight(picker.genre_index._slot_of["Alien"])
+    assert picker.pick(["Horreur"], weighted=True) == "Alien"
+    assert picker.tree.weight(picker.genre_index._slot_of["Alien"]) == before // 2
+
+
+@pytest.mark.parametrize("weighted", [False, True])
+def test_no_repeat_within_the_window(weighted):
+    films = {f"Film {i}": ["Action"] for i in range(12)}
+    picker = make_picker(films, window=10)
+    rng = random.Random(2)
+    picks = [picker.pick(["Action"], weighted, rng) for _ in range(500)]
+    for i in range(len(picks)):
+        window = picks[max(0, i - 10):i]
+        assert picks[i] not in window
+
+
+def test_repeats_allowed_when_fewer_films_than_the_window():
+    picker = make_picker({"Alien": ["Horreur"], "Heat": ["Crime"]}, window=10)
+    picks = [picker.pick(["Horreur"], rng=random.Random(i)) for i in range(3)]
+    assert picks == ["Alien"] * 3
+
+
+def test_dead_links_only_when_nothing_else_matches():
+    picker = make_picker({"Alien": ["Horreur"], "Ça": ["Horreur"], "Heat": ["Crime"]})
+    slot_of = picker.genre_index._slot_of
+    dead = 1 << slot_of["Alien"]
+    rng = random.Random(3)
+    assert {picker.pick(["Horreur"], rng=rng, exclude=dead) for _ in range(50)} == {"Ça"}
+    assert picker.pick(["Horreur"], rng=rng, exclude=dead | 1 << slot_of["Ça"]) in {"Alien", "Ça"}
+    assert picker.pick(["Western"], rng=rng) is None
+
+
+def test_removed_films_are_never_picked():
+    films = {f"Film {i}": ["Action"] for i in range(20)}
+    picker = make_picker(films)
+    for i in range(0, 20, 2):
+        picker.remove(f"Film {i}")
+        picker.genre_index.remove(f"Film {i}")
+    rng = random.Random(4)
+    picks = {picker.pick(["Action"], weighted, rng) for weighted in (False, True) for _ in range(300)}
+    assert picks == {f"Film {i}" for i in range(1, 20, 2)}
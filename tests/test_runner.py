@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import threading
+
+import bot
+
+
+class FakeResponse:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def send_message(self, *args, **kwargs):
+        self.calls.append(("send_message", kwargs))
+
+    async def defer(self, *args, **kwargs):
+        # Aller-retour vers Discord : le followup ne doit pas partir avant la fin du defer
+        await asyncio.sleep(0.01)
+        self.calls.append(("defer", kwargs))
+
+    async def edit_message(self, *args, **kwargs):
+        self.calls.append(("edit_message", kwargs))
+
+
+class FakeFollowup:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def send(self, *args, **kwargs):
+        self.calls.append(("followup", kwargs))
+
+
+class FakeInteraction:
+    def __init__(self):
+        self.calls = []
+        self.response = FakeResponse(self.calls)
+        self.followup = FakeFollowup(self.calls)
+        self.guild_id = 1
+
+
+def run_command(runner, command, **options):
+    interaction = FakeInteraction()
+    asyncio.run(runner.auto_defer(command, **options)(interaction))
+    return interaction.calls
+
+
+def test_fast_command_answers_directly():
+    runner = bot.CommandRunner(budget=0.05)
+
+    async def command(interaction):
+        await interaction.response.send_message(content="ok", view=None)
+
+    assert run_command(runner, command) == [("send_message", {"content": "ok", "view": None})]
+    assert runner.deferred == 0 and runner.deadline_misses == 0
+
+
+def test_slow_command_is_deferred_and_answers_in_followup():
+    runner = bot.CommandRunner(budget=0.02)
+
+    async def command(interaction):
+        await asyncio.sleep(0.05)
+        await interaction.response.send_message(content="ok", view=None, ephemeral=True)
+
+    calls = run_command(runner, command, ephemeral=False)
+    # followup.send refuse view=None : les arguments None sont retirés
+    assert calls == [
+        ("defer", {"ephemeral": False, "thinking": True}),
+        ("followup", {"content": "ok", "ephemeral": True}),
+    ]
+    assert runner.deferred == 1
+
+
+def test_answer_during_the_automatic_defer_waits_for_it():
+    runner = bot.CommandRunner(budget=0.01)
+
+    async def command(interaction):
+        # Réponse prête pendant que le defer automatique est en route vers Discord
+        await asyncio.sleep(0.015)
+        await interaction.response.send_message(content="ok")
+
+    assert [name for name, _ in run_command(runner, command)] == ["defer", "followup"]
+
+
+def test_command_that_defers_itself_is_not_deferred_again():
+    runner = bot.CommandRunner(budget=0.02)
+
+    async def command(interaction):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        await asyncio.sleep(0.05)
+        await interaction.followup.send(content="ok")
+
+    calls = run_command(runner, command)
+    assert [name for name, _ in calls] == ["defer", "followup"]
+    assert runner.deferred == 0
+
+
+def test_explicit_defer_after_the_automatic_one_is_not_sent_twice():
+    runner = bot.CommandRunner(budget=0.01)
+
+    async def command(interaction):
+        await asyncio.sleep(0.03)
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        await interaction.followup.send(content="ok")
+
+    assert [name for name, _ in run_command(runner, command)] == ["defer", "followup"]
+    assert runner.deferred == 1
+
+
+def test_other_response_methods_pass_through():
+    runner = bot.CommandRunner(budget=0.05)
+
+    async def command(interaction):
+        await interaction.response.edit_message(content="modifié")
+
+    assert run_command(runner, command) == [("edit_message", {"content": "modifié"})]
+
+
+def test_late_first_response_counts_as_a_deadline_miss():
+    runner = bot.CommandRunner(budget=1.0)
+    runner.DEADLINE = 0.02
+
+    async def command(interaction):
+        await asyncio.sleep(0.04)
+        await interaction.response.send_message(content="trop tard")
+
+    run_command(runner, command)
+    assert runner.deadline_misses == 1 and runner.deferred == 0
+
+
+def test_disabled_budget_leaves_the_command_unwrapped():
+    runner = bot.CommandRunner(budget=0)
+
+    async def command(interaction):
+        pass
+
+    assert runner.auto_defer(command) is command
+
+
+def test_run_uses_the_pool_and_keeps_the_context():
+    runner = bot.CommandRunner(workers=2)
+    current = contextvars.ContextVar("current", default=None)
+    started = threading.Barrier(2, timeout=5)
+
+    def work(value):
+        started.wait()
+        return value, current.get(), threading.current_thread().name
+
+    async def scenario():
+        current.set("commande")
+        return await asyncio.gather(runner.run(work, 1), runner.run(work, 2))
+
+    results = asyncio.run(scenario())
+    assert [value for value, _, _ in results] == [1, 2]
+    assert all(context == "commande" for _, context, _ in results)
+    assert all(name.startswith("commande") for _, _, name in results)
+    assert runner.max_queue_depth == 2 and runner.queue_depth == 0
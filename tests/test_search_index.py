@@ -0,0 +1,152 @@
+import math
+import random
+
+import pytest
+
+import bot
+
+WORDS = [f"mot{chr(97 + i // 26)}{chr(97 + i % 26)}" for i in range(60)]
+
+
+def random_film(rng, i):
+    # Distribution de Zipf : quelques mots très fréquents (listes longues), beaucoup de mots rares
+    words = rng.choices(WORDS, weights=[1 / (rank + 1) for rank in range(len(WORDS))], k=rng.randint(3, 25))
+    title = f"Film {i} " + " ".join(rng.sample(WORDS, 2))
+    return title, {"lien": "N/A", "genre": ["Drame"], "description": " ".join(words)}
+
+
+def bm25_scores(index, films, query):
+    """Oracle : score BM25 de chaque film, calculé à partir des films sans passer par l'index."""
+    counts = {name: index.term_counts(name, info) for name, info in films.items()}
+    n_docs = len(films)
+    avg_length = sum(sum(c.values()) for c in counts.values()) / n_docs or 1
+    tokens = set(bot.search_tokens(query))
+    df = {token: sum(1 for c in counts.values() if token in c) for token in tokens}
+    scores = {}
+    for name, c in counts.items():
+        norm = index.K1 * (1 - index.B + index.B * sum(c.values()) / avg_length)
+        score = sum(
+            math.log(1 + (n_docs - df[token] + 0.5) / (df[token] + 0.5)) * (index.K1 + 1) * c[token] / (c[token] + norm)
+            for token in tokens if token in c
+        )
+        if score > 0:
+            scores[name] = score
+    return scores
+
+
+def exhaustive_scores(index, query):
+    """Oracle : score de chaque film présent, en lisant toutes les entrées des listes (sans élagage).
+
+    Les entrées des films retirés comptent dans la fréquence des mots jusqu'au
+    compactage, comme dans `SearchIndex.search`.
+    """
+    avg_length = index._total_length / len(index) or 1
+    scores = {}
+    for token in set(bot.search_tokens(query)):
+        if token not in index._postings:
+            continue
+        ids, tfs = index._postings[token]
+        factor = index.idf(len(ids)) * (index.K1 + 1)
+        for doc_id, tf in zip(ids, tfs):
+            name = index._names[doc_id]
+            if name is not None:
+                norm = index.K1 * (1 - index.B + index.B * index._lengths[doc_id] / avg_length)
+                scores[name] = scores.get(name, 0.0) + factor * tf / (tf + norm)
+    return scores
+
+
+def assert_matches(results, scores, limit):
+    expected = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+    assert [score for _, score in results] == pytest.approx([score for _, score in expected])
+    for name, score in results:
+        assert score == pytest.approx(scores[name])
+    if len(expected) == limit:
+        # Les films nettement au-dessus du dernier score retenu sont forcément présents (ex aequo mis à part)
+        cutoff = expected[-1][1] * (1 + 1e-9)
+        assert {name for name, score in expected if score > cutoff} <= {name for name, _ in results}
+
+
+def assert_matches_oracle(index, query, limit):
+    assert_matches(index.search(query, limit), exhaustive_scores(index, query), limit)
+
+
+@pytest.fixture
+def small_impact_lists(monkeypatch):
+    # Listes triées dès 16 entrées : l'élagage est exercé sur un petit corpus
+    monkeypatch.setattr(bot.SearchIndex, "IMPACT_MIN_POSTINGS", 16)
+
+
+def build(rng, count):
+    films = dict(random_film(rng, i) for i in range(count))
+    index = bot.SearchIndex()
+    for name, info in films.items():
+        index.add(name, info)
+    return index, films
+
+
+def queries(rng, count):
+    for _ in range(count):
+        yield " ".join(rng.sample(WORDS[:20], rng.randint(1, 3)) + rng.sample(WORDS, rng.randint(0, 2)))
+
+
+@pytest.mark.parametrize("limit", [1, 5, 25])
+def test_pruned_search_matches_exhaustive_scorer(small_impact_lists, limit):
+    rng = random.Random(limit)
+    index, films = build(rng, 400)
+    for query in queries(rng, 40):
+        assert_matches(index.search(query, limit), bm25_scores(index, films, query), limit)
+
+
+def test_idf_stays_positive_with_removed_entries():
+    index = bot.SearchIndex()
+    for i in range(10):
+        index.add(f"Film {i}", {"description": "motaa"})
+    for i in range(9):
+        index.add(f"Film {i}", {"description": "motaa motab"})
+    # Les anciennes entrées des films modifiés restent dans la liste de « motaa » jusqu'au compactage
+    assert len(index._postings["motaa"][0]) > len(index)
+    assert index.idf(len(index._postings["motaa"][0])) > 0
+    assert [name for name, _ in index.search("motaa motab", 20)][-1] == "Film 9"
+
+
+def test_pruned_search_after_additions_and_removals(small_impact_lists):
+    rng = random.Random(7)
+    index, films = build(rng, 300)
+    for query in queries(rng, 10):
+        assert_matches_oracle(index, query, 10)
+    # Listes triées déjà construites : entrées récentes, films retirés et longueur moyenne qui dérive
+    for i in range(300, 450):
+        name, info = random_film(rng, i)
+        info["description"] += " " + " ".join(rng.choices(WORDS[:5], k=30))
+        films[name] = info
+        index.add(name, info)
+    for name in rng.sample(sorted(films), 120):
+        del films[name]
+        index.remove(name)
+    for query in queries(rng, 40):
+        assert_matches_oracle(index, query, 10)
+
+
+def test_search_after_compaction(small_impact_lists):
+    rng = random.Random(8)
+    index, films = build(rng, 1500)
+    generation = index.generation
+    names = iter(sorted(films))
+    while index.generation == generation:
+        name = next(names)
+        del films[name]
+        index.remove(name)
+    # Juste après le compactage, l'index ne garde plus aucune entrée de film retiré : BM25 exact
+    for query in queries(rng, 20):
+        assert_matches(index.search(query, 5), bm25_scores(index, films, query), 5)
+
+
+def test_save_and_load_keep_results(tmp_path, small_impact_lists):
+    rng = random.Random(9)
+    index, films = build(rng, 200)
+    path = str(tmp_path / "films.search")
+    index.save(path)
+    films["Nouveau"] = {"lien": "N/A", "genre": ["Drame"], "description": "motaa motab"}
+    reloaded = bot.SearchIndex.load_or_build(path, films)
+    for query in queries(rng, 10):
+        assert_matches_oracle(reloaded, query, 10)
@@ -0,0 +1,170 @@
+import json
+import os
+
+import bot
+
+
+def film(lien="N/A", genres=("Action",), description="Aucune description."):
+    return {"lien": lien, "genre": list(genres), "description": description}
+
+
+def test_sqlite_round_trip_keeps_genre_order(tmp_path):
+    storage = bot.SqliteStorage(str(tmp_path / "films.db"))
+    storage.apply([
+        ("put", "Alien", film("https://example.com/alien", ["Science-fiction", "Horreur"], "Huit passagers.")),
+        ("put", "Heat", film(genres=[])),
+    ], {})
+    storage.close()
+
+    storage = bot.SqliteStorage(str(tmp_path / "films.db"))
+    assert storage.load() == {
+        "Alien": film("https://example.com/alien", ["Science-fiction", "Horreur"], "Huit passagers."),
+        "Heat": film(genres=["Non spécifié"]),
+    }
+    storage.close()
+
+
+def test_sqlite_titles_are_unique_ignoring_case(tmp_path):
+    storage = bot.SqliteStorage(str(tmp_path / "films.db"))
+    storage.apply([("put", "alien", film())], {})
+    # Renommer en changeant la casse met à jour la même ligne
+    storage.apply([("put", "Alien", film(genres=["Horreur"]))], {})
+    assert storage.load() == {"Alien": film(genres=["Horreur"])}
+    storage.apply([("delete", "ALIEN")], {})
+    assert storage.load() == {}
+    storage.close()
+
+
+def test_sqlite_schema_has_no_search_tables(tmp_path):
+    storage = bot.SqliteStorage(str(tmp_path / "films.db"))
+    names = {row[0] for row in storage.conn.execute("SELECT name FROM sqlite_master")}
+    storage.close()
+    assert {"films", "film_genre"} <= names
+    assert not any("fts" in name for name in names)
+
+
+def test_sqlite_import_migrates_legacy_json(tmp_path):
+    json_path = tmp_path / "films.json"
+    json_path.write_text(json.dumps({
+        "Alien": "https://example.com/alien",
+        "Heat": {"lien": "N/A", "genre": "Action, Crime"},
+    }), encoding="utf-8")
+    storage = bot.import_json_to_sqlite(str(json_path), str(tmp_path / "films.db"))
+    assert storage.load() == {
+        "Alien": film("https://example.com/alien", ["Non spécifié"]),
+        "Heat": film(genres=["Action", "Crime"]),
+    }
+    storage.close()
+
+
+# --- JournalStorage ---
+
+def journal_storage(tmp_path, compact_bytes=10 ** 9):
+    storage = bot.JournalStorage(str(tmp_path / "films.json"), compact_bytes=compact_bytes)
+    storage.load()
+    return storage
+
+
+def write(storage, films, ops):
+    """Applique `ops` à `films` (en mémoire) puis au stockage, comme le CatalogWriter."""
+    for op in ops:
+        if op[0] == "put":
+            films[op[1]] = op[2]
+        else:
+            films.pop(op[1], None)
+    storage.apply(ops, storage.snapshot(films))
+    storage.wait_for_compaction()
+
+
+def reopen(tmp_path):
+    return bot.JournalStorage(str(tmp_path / "films.json")).load()
+
+
+def test_journal_replays_puts_and_deletes_in_order(tmp_path):
+    storage = journal_storage(tmp_path)
+    films = {}
+    write(storage, films, [("put", "Alien", film()), ("put", "Heat", film())])
+    write(storage, films, [("delete", "Alien"), ("put", "Heat", film(genres=["Crime"]))])
+    write(storage, films, [("put", "Alien", film(description="Retour"))])
+    assert not (tmp_path / "films.json").exists()
+    assert reopen(tmp_path) == films
+
+
+def test_journal_ignores_a_truncated_last_line(tmp_path, capsys):
+    storage = journal_storage(tmp_path)
+    films = {}
+    write(storage, films, [("put", "Alien", film())])
+    with open(storage.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "put", "name": "Heat", "da')
+    assert reopen(tmp_path) == films
+    assert "illisible" in capsys.readouterr().out
+
+
+def test_journal_writes_after_a_truncated_line_are_kept(tmp_path):
+    storage = journal_storage(tmp_path)
+    films = {}
+    write(storage, films, [("put", "Alien", film())])
+    with open(storage.journal_path, "a", encoding="utf-8") as f:
+        f.write('{"op": "put", "name": "Heat", "da')
+    storage = journal_storage(tmp_path)
+    write(storage, films, [("put", "Ronin", film())])
+    assert reopen(tmp_path) == films
+
+
+def test_journal_compaction_writes_a_snapshot(tmp_path):
+    storage = journal_storage(tmp_path, compact_bytes=300)
+    films = {}
+    for i in range(20):
+        write(storage, films, [("put", f"Film {i}", film(f"https://example.com/{i}"))])
+        if i % 3 == 0:
+            write(storage, films, [("delete", f"Film {i}")])
+    assert (tmp_path / "films.json").exists()
+    assert not (tmp_path / "films.journal.old").exists()
+    assert os.path.getsize(storage.journal_path) < 300 + 200
+    assert reopen(tmp_path) == films
+
+
+def test_journal_crash_after_snapshot_before_removing_old_journal(tmp_path, monkeypatch):
+    storage = journal_storage(tmp_path, compact_bytes=300)
+    films = {}
+    remove = os.remove
+
+    def crash(path):
+        if path == storage.old_journal_path:
+            raise OSError("arrêt brutal")
+        remove(path)
+
+    monkeypatch.setattr(bot.os, "remove", crash)
+    for i in range(6):
+        write(storage, films, [("put", f"Film {i}", film())])
+    assert (tmp_path / "films.json").exists() and (tmp_path / "films.journal.old").exists()
+    # L'ancien journal, déjà dans l'instantané, est rejoué une seconde fois sans effet
+    write(storage, films, [("delete", "Film 0")])
+    assert reopen(tmp_path) == films
+
+
+def test_journal_crash_before_snapshot_keeps_every_mutation(tmp_path, monkeypatch):
+    storage = journal_storage(tmp_path, compact_bytes=300)
+    films = {}
+    save_films = bot.save_films
+
+    def crash(*args, **kwargs):
+        raise OSError("arrêt brutal")
+
+    monkeypatch.setattr(bot, "save_films", crash)
+    for i in range(6):
+        write(storage, films, [("put", f"Film {i}", film())])
+    assert (tmp_path / "films.journal.old").exists() and not (tmp_path / "films.json").exists()
+    assert reopen(tmp_path) == films
+
+    # Redémarrage puis nouvelle compaction interrompue : l'ancien journal non fusionné ne doit pas être écrasé
+    storage = journal_storage(tmp_path, compact_bytes=300)
+    for i in range(6, 12):
+        write(storage, films, [("put", f"Film {i}", film())])
+    assert reopen(tmp_path) == films
+
+    monkeypatch.setattr(bot, "save_films", save_films)
+    for i in range(12, 18):
+        write(storage, films, [("put", f"Film {i}", film())])
+    assert not (tmp_path / "films.journal.old").exists()
+    assert reopen(tmp_path) == films
@@ -0,0 +1,78 @@
+import random
+
+import bot
+
+
+def test_prefix_matches_come_first_in_alphabetical_order():
+    index = bot.TitleIndex(["Le retour de l'Alien", "Aliens", "Alien 2", "Alien", "Balien"])
+    assert index.search("alien") == ["Alien", "Alien 2", "Aliens", "Le retour de l'Alien", "Balien"]
+    assert index.search("ALIÉN", limit=2) == ["Alien", "Alien 2"]
+
+
+def test_substring_matches_prefer_word_starts_then_short_titles():
+    index = bot.TitleIndex(["Mon amour perdu", "Glamour", "Amour", "Un amour"])
+    assert index.search("mour") == ["Amour", "Glamour", "Un amour", "Mon amour perdu"]
+    assert index.search("amour") == ["Amour", "Un amour", "Mon amour perdu", "Glamour"]
+
+
+def brute_force_search(names, query, limit=25):
+    """Oracle : préfixes dans l'ordre alphabétique, puis débuts de mots, puis ailleurs (titres courts d'abord)."""
+    query = bot.normalize_title(query.strip())
+    norms = {name: bot.normalize_title(name) for name in names}
+    prefixed = sorted((norm, name) for name, norm in norms.items() if norm.startswith(query))
+    others = []
+    for name, norm in norms.items():
+        if query in norm and not norm.startswith(query):
+            word_start = any(
+                norm.startswith(query, pos) and not norm[pos - 1].isalnum() for pos in range(1, len(norm))
+            )
+            others.append((0 if word_start else 1, len(norm), norm, name))
+    return ([name for _, name in prefixed] + [name for *_, name in sorted(others)])[:limit]
+
+
+def random_titles(rng, count):
+    words = ["amour", "mour", "glamour", "la", "le", "ma", "nuit", "ami", "lune", "alien", "an", "x"]
+    return {" ".join(rng.choices(words, k=rng.randint(1, 4))) + f" {i}" * rng.randint(0, 1) for i in range(count)}
+
+
+def test_search_matches_brute_force_ranking():
+    rng = random.Random(0)
+    names = random_titles(rng, 3000)
+    index = bot.TitleIndex(names)
+    queries = ["a", "m", "x", "1", "am", "ou", "ur", "e ", "an", "mour", "amo", "lune", "mi", "zz", "nuit 1", "r g"]
+    for query in queries:
+        for limit in (1, 25, 200):
+            assert index.search(query, limit) == brute_force_search(names, query, limit), (query, limit)
+
+
+def test_search_stays_exact_after_updates():
+    rng = random.Random(1)
+    names = random_titles(rng, 1000)
+    index = bot.TitleIndex(names)
+    for name in rng.sample(sorted(names), 400):
+        index.remove(name)
+        names.discard(name)
+    for name in random_titles(random.Random(2), 500):
+        index.add(name)
+        names.add(name)
+    for query in ["a", "l", "an", "ou", "mou", "glam", "lune a"]:
+        assert index.search(query, 50) == brute_force_search(names, query, 50), query
+
+
+def test_all_candidates_are_ranked_before_truncation():
+    # Titres plus courts ajoutés en dernier : ils doivent sortir en tête quel que soit l'ordre des sets
+    names = [f"Un très long titre de film numéro {i}" for i in range(3000)] + ["Le film", "Film court"]
+    index = bot.TitleIndex(names)
+    assert index.search("ilm", limit=2) == ["Le film", "Film court"]
+    assert index.search("fi", limit=2) == ["Film court", "Le film"]
+    assert len(index.search("ilm", limit=25)) == 25
+
+
+def test_add_and_remove_keep_the_index_up_to_date():
+    index = bot.TitleIndex(["Alien"])
+    index.add("Aliens")
+    index.remove("Alien")
+    assert index.search("alien") == ["Aliens"]
+    assert index.search("al") == ["Aliens"]
+    index.remove("Aliens")
+    assert index.search("alien") == []
@@ -0,0 +1,136 @@
+import asyncio
+import sqlite3
+
+import bot
+
+
+class FlakyStorage:
+    """Stockage de test : échoue sur les mutations listées dans `failures` (une fois chacune)."""
+
+    def __init__(self, failures=()):
+        self.failures = dict(failures)
+        self.applied = []
+
+    def apply(self, ops, films):
+        for op in ops:
+            error = self.failures.get(op[1])
+            if error is not None:
+                if isinstance(error, sqlite3.OperationalError):
+                    del self.failures[op[1]]
+                raise error
+        self.applied.extend(ops)
+
+
+def put(name):
+    return ("put", name, {"lien": "N/A", "genre": ["Action"], "description": "x"})
+
+
+def test_transient_errors_requeue_the_batch():
+    storage = FlakyStorage({"B": sqlite3.OperationalError("database is locked")})
+    writer = bot.CatalogWriter(storage, delay=0)
+
+    async def scenario():
+        writer.submit([put("A"), put("B")], {})
+        await writer.flush()
+        assert writer.busy
+        await writer.flush()
+
+    asyncio.run(scenario())
+    assert [op[1] for op in storage.applied] == ["A", "B"]
+    assert not writer.busy
+
+
+def test_rejected_mutations_are_dropped_and_the_rest_written(capsys):
+    storage = FlakyStorage({"B": sqlite3.IntegrityError("NOT NULL constraint failed")})
+    writer = bot.CatalogWriter(storage, delay=0)
+
+    async def scenario():
+        writer.submit([put("A"), put("B"), ("delete", "C")], {})
+        await writer.flush()
+
+    asyncio.run(scenario())
+    assert [op[1] for op in storage.applied] == ["A", "C"]
+    assert not writer.busy
+    assert "« B »" in capsys.readouterr().out
+
+
+def test_sqlite_storage_rejection_keeps_valid_films(tmp_path):
+    storage = bot.SqliteStorage(str(tmp_path / "films.db"))
+    writer = bot.CatalogWriter(storage)
+    writer.submit([
+        put("Alien"),
+        ("put", "Invalide", {"lien": None, "genre": ["Action"], "description": "x"}),
+        put("Heat"),
+    ], {})
+    assert sorted(storage.load()) == ["Alien", "Heat"]
+    storage.close()
+
+
+def test_unexpected_errors_requeue_the_batch(capsys):
+    storage = FlakyStorage({"B": TypeError("Object of type set is not JSON serializable")})
+    writer = bot.CatalogWriter(storage, delay=0)
+
+    async def scenario():
+        writer.submit([put("A"), put("B")], {})
+        await writer.flush()
+        assert writer.busy and writer._failures == 1
+        storage.failures.clear()
+        await writer.flush()
+
+    asyncio.run(scenario())
+    assert [op[1] for op in storage.applied] == ["A", "B"]
+    assert not writer.busy and writer._failures == 0
+    assert "TypeError" in capsys.readouterr().out
+
+
+class RecordingStorage:
+    """Enveloppe un stockage et note si chaque écriture a reçu une copie du catalogue."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.snapshots = []
+
+    def snapshot(self, films):
+        return self.storage.snapshot(films)
+
+    def apply(self, ops, films):
+        self.snapshots.append(films is not None)
+        self.storage.apply(ops, films)
+
+
+def test_sqlite_writes_never_copy_the_catalog(tmp_path):
+    storage = RecordingStorage(bot.SqliteStorage(str(tmp_path / "films.db")))
+    writer = bot.CatalogWriter(storage, delay=0)
+    films = {}
+
+    async def scenario():
+        for name in ("Alien", "Heat"):
+            films[name] = put(name)[2]
+            writer.submit([put(name)], films)
+            await writer.flush()
+
+    asyncio.run(scenario())
+    assert storage.snapshots == [False, False]
+    assert sorted(storage.storage.load()) == ["Alien", "Heat"]
+    storage.storage.close()
+
+
+def test_journal_copies_the_catalog_only_to_compact(tmp_path):
+    journal = bot.JournalStorage(str(tmp_path / "films.json"), compact_bytes=200)
+    journal.load()
+    storage = RecordingStorage(journal)
+    writer = bot.CatalogWriter(storage, delay=0)
+    films = {}
+
+    async def scenario():
+        for i in range(4):
+            name = f"Film {i}"
+            films[name] = put(name)[2]
+            writer.submit([put(name)], films)
+            await writer.flush()
+            journal.wait_for_compaction()
+
+    asyncio.run(scenario())
+    # Chaque ligne fait ~90 octets : le journal dépasse 200 octets à la 3e écriture, la 4e compacte
+    assert storage.snapshots == [False, False, False, True]
+    assert bot.JournalStorage(str(tmp_path / "films.json")).load() == films